@@ -0,0 +1,256 @@
+import numpy as np
+from scipy.signal import resample_poly
+from abc import ABC, abstractmethod
+from collections import deque
+from math import gcd
+import os
+import threading
+import time
+
+from audio.loader import load_wav
+
+# -------------> AUDIO_ANALYZER_BACKEND=virtual wymusza wirtualne urządzenia (CI, serwer bez karty dźwiękowej)
+BACKEND_ENV = 'AUDIO_ANALYZER_BACKEND'
+# -------------> Lista plików WAV (rozdzielona os.pathsep) udostępnianych jako wirtualne mikrofony
+VIRTUAL_FILES_ENV = 'AUDIO_ANALYZER_VIRTUAL_FILES'
+
+_default_backend = None
+
+
+class SoundDeviceBackend:
+    """Backend korzystający z prawdziwych urządzeń audio przez bibliotekę sounddevice (PortAudio)."""
+    name = 'sounddevice'
+
+    def __init__(self):
+        # -------------> Import tutaj - bez PortAudio rzuca OSError, a reszta aplikacji ma działać dalej
+        import sounddevice as sd
+        self.sd = sd
+
+    def query_input_devices(self):
+        return [dict(dev) for dev in self.sd.query_devices() if dev['max_input_channels'] > 0]
+
+    def default_input_device_name(self):
+        return self.sd.query_devices(kind='input')['name']
+
+    def device_name(self, device):
+        return self.sd.query_devices(device)['name']
+
+    def open_input_stream(self, samplerate, channels, callback, device=None, blocksize=0):
+        return self.sd.InputStream(samplerate=samplerate, channels=channels, callback=callback,
+                                   dtype=np.float32, device=device, blocksize=blocksize)
+
+    def open_output_stream(self, samplerate, channels, callback, device=None, blocksize=0):
+        return self.sd.OutputStream(samplerate=samplerate, channels=channels, callback=callback,
+                                    dtype=np.float32, device=device, blocksize=blocksize)
+
+
+class _StreamThread(ABC):
+    """
+    Wątek wywołujący callback blokami o stałej długości w tempie czasu rzeczywistego
+    (speed=1.0), szybciej (speed > 1) lub bez ograniczeń (speed=None). Jitter opóźnia
+    losowe bloki - kolejne są wtedy dostarczane seriami, jak przy prawdziwym sterowniku.
+    Podklasy (wejście, wyjście) implementują _process_block - obsługę jednego bloku.
+    """
+
+    def __init__(self, samplerate, channels, blocksize, speed, jitter, seed):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize or 512
+        self.speed = speed
+        self.jitter = jitter
+        self._rng = np.random.default_rng(seed)
+        self._running = False
+        self._thread = None
+        self.blocks_delivered = 0
+
+    @abstractmethod
+    def _process_block(self, frames):
+        """Dostarcza (wejście) lub pobiera (wyjście) jeden blok frames próbek przez callback."""
+
+    def _run(self):
+        next_time = time.perf_counter()
+        while self._running:
+            self._process_block(self.blocksize)
+            self.blocks_delivered += 1
+            if self.speed:
+                next_time += self.blocksize / self.samplerate / self.speed
+                delay = next_time - time.perf_counter()
+                if self.jitter:
+                    delay += self._rng.uniform(0.0, self.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+
+    @property
+    def active(self):
+        return self._running
+
+
+class VirtualInputStream(_StreamThread):
+    """Strumień wejściowy z wirtualnego urządzenia - ten sam kontrakt callbacku co sounddevice.InputStream."""
+
+    def __init__(self, device, source, samplerate, channels, callback, blocksize, speed, jitter, seed):
+        super().__init__(samplerate, channels, blocksize, speed, jitter, seed)
+        self.device = device
+        self.source = source
+        self.callback = callback
+
+    def _process_block(self, frames):
+        block = np.asarray(self.source(frames), dtype=np.float32)
+        if block.ndim == 1:
+            block = block[:, np.newaxis]
+        if block.shape[1] != self.channels:
+            block = np.repeat(block[:, :1], self.channels, axis=1)
+        self.callback(block, frames, None, None)
+
+
+class VirtualOutputStream(_StreamThread):
+    """Strumień wyjściowy, który zamiast na głośnik oddaje próbki do wirtualnej pętli zwrotnej."""
+
+    def __init__(self, backend, samplerate, channels, callback, blocksize, speed, jitter, seed):
+        super().__init__(samplerate, channels, blocksize, speed, jitter, seed)
+        self.backend = backend
+        self.callback = callback
+        self.device = None
+
+    def _process_block(self, frames):
+        outdata = np.zeros((frames, self.channels), dtype=np.float32)
+        self.callback(outdata, frames, None, None)
+        self.backend.write_loopback(outdata.mean(axis=1))
+
+
+class _FileSource:
+    """Odtwarza plik WAV w pętli, z konwersją częstotliwości próbkowania."""
+
+    def __init__(self, filepath, samplerate):
+        samples, file_fs, _ = load_wav(filepath)
+        if file_fs != samplerate:
+            divisor = gcd(int(file_fs), int(samplerate))
+            samples = resample_poly(samples, int(samplerate) // divisor, int(file_fs) // divisor)
+        self.samples = np.asarray(samples, dtype=np.float32)
+        self.position = 0
+
+    def __call__(self, frames):
+        if self.samples.size == 0:
+            return np.zeros(frames, dtype=np.float32)
+        indices = (self.position + np.arange(frames)) % len(self.samples)
+        self.position = (self.position + frames) % len(self.samples)
+        return self.samples[indices]
+
+
+class VirtualBackend:
+    """
+    Backend bez sprzętu audio: urządzenia wejściowe generują sygnały syntetyczne, odtwarzają pliki WAV
+    albo zwracają to, co zostało wysłane na wirtualne wyjście (pętla zwrotna).
+    Pozwala testować i profilować ścieżkę czasu rzeczywistego na maszynie bez karty dźwiękowej.
+    """
+    name = 'virtual'
+
+    def __init__(self, sources=None, blocksize=512, speed=1.0, jitter=0.0, seed=None, samplerate=44100):
+        """
+        sources: lista par (nazwa, źródło), gdzie źródło to ścieżka do pliku WAV
+        albo funkcja frames -> tablica próbek. Domyślnie: sinus 440 Hz, szum różowy, pliki
+        z AUDIO_ANALYZER_VIRTUAL_FILES i pętla zwrotna.
+        """
+        self.blocksize = blocksize
+        self.speed = speed
+        self.jitter = jitter
+        self.seed = seed
+        self.samplerate = samplerate
+        self._loopback = deque()
+        self._loopback_frames = 0
+        self._loopback_lock = threading.Lock()
+
+        if sources is None:
+            sources = self._default_sources()
+        self.sources = list(sources) + [("Wirtualny: pętla zwrotna", self.read_loopback)]
+
+    def _default_sources(self):
+        # -------------> Import lokalny - generator sam korzysta z backendów
+        from audio.generator import ToneGenerator
+
+        sine = ToneGenerator(self.samplerate, backend=self)
+        pink = ToneGenerator(self.samplerate, backend=self)
+        pink.set_waveform('pink')
+        sources = [("Wirtualny: sinus 440 Hz", sine.render), ("Wirtualny: szum różowy", pink.render)]
+        for filepath in filter(None, os.environ.get(VIRTUAL_FILES_ENV, '').split(os.pathsep)):
+            sources.append((f"Wirtualny: {os.path.basename(filepath)}", filepath))
+        return sources
+
+    def query_input_devices(self):
+        return [{'name': name, 'index': index, 'max_input_channels': 2, 'default_samplerate': self.samplerate}
+                for index, (name, _) in enumerate(self.sources)]
+
+    def default_input_device_name(self):
+        return self.sources[0][0]
+
+    def device_name(self, device):
+        return self.sources[device if device is not None else 0][0]
+
+    def open_input_stream(self, samplerate, channels, callback, device=None, blocksize=0):
+        device = 0 if device is None else device
+        source = self.sources[device][1]
+        if isinstance(source, str):
+            source = _FileSource(source, samplerate)
+        return VirtualInputStream(device, source, samplerate, channels, callback, blocksize or self.blocksize,
+                                  self.speed, self.jitter, self.seed)
+
+    def open_output_stream(self, samplerate, channels, callback, device=None, blocksize=0):
+        return VirtualOutputStream(self, samplerate, channels, callback, blocksize or self.blocksize,
+                                   self.speed, self.jitter, self.seed)
+
+    def write_loopback(self, block):
+        with self._loopback_lock:
+            self._loopback.append(np.asarray(block, dtype=np.float32))
+            self._loopback_frames += len(block)
+            # -------------> Nikt nie czyta pętli - trzymamy najwyżej 10 s
+            while self._loopback_frames > 10 * self.samplerate:
+                self._loopback_frames -= len(self._loopback.popleft())
+
+    def read_loopback(self, frames):
+        """Zwraca frames próbek z pętli zwrotnej, dopełniając ciszą przy niedoborze."""
+        out = np.zeros(frames, dtype=np.float32)
+        filled = 0
+        with self._loopback_lock:
+            while filled < frames and self._loopback:
+                chunk = self._loopback[0]
+                take = min(frames - filled, len(chunk))
+                out[filled:filled + take] = chunk[:take]
+                filled += take
+                if take < len(chunk):
+                    self._loopback[0] = chunk[take:]
+                else:
+                    self._loopback.popleft()
+            self._loopback_frames -= filled
+        return out
+
+
+def get_default_backend():
+    """
+    Zwraca współdzielony backend audio: sounddevice, a gdy jest niedostępny (brak PortAudio)
+    lub wybrano AUDIO_ANALYZER_BACKEND=virtual - backend wirtualny.
+    """
+    global _default_backend
+    if _default_backend is None:
+        if os.environ.get(BACKEND_ENV, '').lower() == 'virtual':
+            _default_backend = VirtualBackend()
+        else:
+            try:
+                _default_backend = SoundDeviceBackend()
+            except OSError as e:
+                print(f"Biblioteka sounddevice niedostępna ({e}) - używam wirtualnych urządzeń audio")
+                _default_backend = VirtualBackend()
+    return _default_backend
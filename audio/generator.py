@@ -0,0 +1,180 @@
+import numpy as np
+from scipy.signal import lfilter
+from collections import deque
+import threading
+
+from audio.backends import get_default_backend
+
+WAVEFORMS = ['sine', 'sweep', 'white', 'pink']
+
+# -------------> Filtr "różowiący" Paula Kelleta (-3 dB/oktawę) dla szumu białego
+_PINK_B = np.array([0.049922035, -0.095993537, 0.050612699, -0.004408786])
+_PINK_A = np.array([1.0, -2.494956002, 2.017265875, -0.522189400])
+
+
+class ToneGenerator:
+    """
+    Generator sygnałów testowych syntetyzowanych na bieżąco w callbacku OutputStream.
+    Sinus i sweep korzystają z tablicy falowej i akumulatora fazy, więc zmiana częstotliwości
+    w trakcie odtwarzania nie powoduje nieciągłości fazy. Nie blokuje wątku GUI.
+    """
+
+    def __init__(self, fs=44100, amplitude=0.5, table_size=4096, history_seconds=5.0, backend=None):
+        self.fs = fs
+        # -------------> Backend pobierany dopiero przy starcie - render() działa bez urządzeń audio
+        self.backend = backend
+        self.amplitude = amplitude
+        self.waveform = 'sine'
+        self.frequency = 440.0
+        self.sweep_start = 20.0
+        self.sweep_end = 20000.0
+        self.sweep_seconds = 5.0
+
+        # -------------> Tablica falowa z jedną próbką zapasu do interpolacji liniowej
+        self.table_size = table_size
+        self.table = np.sin(2 * np.pi * np.arange(table_size + 1) / table_size).astype(np.float32)
+
+        self.stream = None
+        self.playing = False
+        self.lock = threading.Lock()
+
+        # -------------> Podwójne buforowanie jak w AudioRecorder - dla analizy generowanego sygnału.
+        # -------------> Bloki są kopiowane tylko przy podłączonym odbiorcy (set_capture), bo bufor
+        # -------------> opróżnia dopiero get_full_recording - bez odbiorcy rósłby bez końca.
+        self.capture = False
+        self.write_buffer = []
+        self.history_chunks = deque()
+        self.history_frames = int(history_seconds * fs)
+        self._buffered_frames = 0
+        self.total_frames = 0
+        self.reset()
+
+    def reset(self):
+        """Zeruje fazę, pozycję sweepa i stan filtrów szumu."""
+        self._phase = 0.0
+        self._increment = self.frequency / self.fs
+        self._sweep_position = 0
+        self._pink_zi = np.zeros(len(_PINK_A) - 1)
+        self._rng = np.random.default_rng()
+
+    def set_frequency(self, frequency):
+        """Zmienia częstotliwość tonu. Bezpieczne w trakcie odtwarzania - zmiana wchodzi z następnym blokiem."""
+        self.frequency = float(frequency)
+
+    def set_waveform(self, waveform):
+        if waveform not in WAVEFORMS:
+            raise ValueError(f"Nieznany kształt sygnału: {waveform}")
+        self.waveform = waveform
+
+    def _wavetable(self, increments):
+        # -------------> Faza jako ułamek okresu; cumsum zachowuje ciągłość między blokami
+        cumulative = np.cumsum(increments)
+        # -------------> Próbka k ma fazę sprzed dodania własnego przyrostu
+        phases = (self._phase + cumulative - increments) % 1.0
+        self._phase = float((self._phase + cumulative[-1]) % 1.0)
+        positions = phases * self.table_size
+        index = positions.astype(np.int64)
+        fraction = (positions - index).astype(np.float32)
+        return self.table[index] + fraction * (self.table[index + 1] - self.table[index])
+
+    def render(self, frames):
+        """Zwraca kolejny blok float32 o długości frames. Można używać bez karty dźwiękowej."""
+        if frames == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        if self.waveform == 'sine':
+            target = self.frequency / self.fs
+            # -------------> Płynne przejście przyrostu w obrębie bloku zamiast skoku (bez trzasków)
+            increments = np.linspace(self._increment, target, frames, endpoint=False) \
+                if target != self._increment else np.full(frames, target)
+            self._increment = target
+            block = self._wavetable(increments)
+        elif self.waveform == 'sweep':
+            sweep_frames = max(1, int(self.sweep_seconds * self.fs))
+            t = ((self._sweep_position + np.arange(frames)) % sweep_frames) / sweep_frames
+            self._sweep_position = (self._sweep_position + frames) % sweep_frames
+            # -------------> Sweep logarytmiczny, powtarzany w pętli
+            frequencies = self.sweep_start * (self.sweep_end / self.sweep_start) ** t
+            block = self._wavetable(frequencies / self.fs)
+        elif self.waveform == 'white':
+            block = self._rng.uniform(-1.0, 1.0, frames).astype(np.float32)
+        else:
+            white = self._rng.uniform(-1.0, 1.0, frames)
+            pink, self._pink_zi = lfilter(_PINK_B, _PINK_A, white, zi=self._pink_zi)
+            block = (pink * 4.0).clip(-1.0, 1.0).astype(np.float32)
+
+        return (self.amplitude * block).astype(np.float32)
+
+    def _callback(self, outdata, frames, time, status):
+        if status:
+            print(f"Audio output callback status: {status}")
+        block = self.render(frames)
+        outdata[:, 0] = block
+        if self.capture:
+            # -------------> Kopia dla analizy - bez locka, pisze tylko ten wątek
+            self.write_buffer.append(block[:, np.newaxis])
+
+    def set_capture(self, enabled):
+        """Włącza kopiowanie generowanych bloków dla get_full_recording (np. analiza w GUI)."""
+        if not enabled:
+            self.clear_buffer()
+        self.capture = enabled
+
+    def start(self, device_id=None):
+        try:
+            self.clear_buffer()
+            self.reset()
+            if self.backend is None:
+                self.backend = get_default_backend()
+            self.stream = self.backend.open_output_stream(self.fs, 1, self._callback, device=device_id)
+            self.stream.start()
+            self.playing = True
+            print(f"Tone generator started ({self.waveform}, {self.frequency:.1f} Hz)")
+        except Exception as e:
+            print(f"Error starting tone generator: {e}")
+            self.playing = False
+            raise
+
+    def stop(self):
+        self.playing = False
+        if self.stream:
+            try:
+                self.stream.stop()
+                self.stream.close()
+                print("Tone generator stopped")
+            except Exception as e:
+                print(f"Error stopping tone generator: {e}")
+            finally:
+                self.stream = None
+
+    def is_playing(self):
+        return self.playing
+
+    def get_sample_rate(self):
+        return self.fs
+
+    def get_total_frames(self):
+        return self.total_frames
+
+    def get_full_recording(self):
+        """Zwraca ostatnie history_frames próbek wygenerowanego sygnału (interfejs jak AudioRecorder)."""
+        with self.lock:
+            chunks, self.write_buffer = self.write_buffer, []
+            for chunk in chunks:
+                self.history_chunks.append(chunk)
+                self._buffered_frames += len(chunk)
+                self.total_frames += len(chunk)
+            while self.history_chunks and \
+                    self._buffered_frames - len(self.history_chunks[0]) >= self.history_frames:
+                self._buffered_frames -= len(self.history_chunks.popleft())
+
+            if self.history_chunks:
+                return np.concatenate(self.history_chunks, axis=0)[-self.history_frames:]
+            return np.array([])
+
+    def clear_buffer(self):
+        with self.lock:
+            self.write_buffer = []
+            self.history_chunks.clear()
+            self._buffered_frames = 0
+            self.total_frames = 0
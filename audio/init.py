@@ -1,11 +1,27 @@
 from .recorder import AudioRecorder
+from .segments import SegmentWriter, BackgroundSegmentWriter
+from .generator import ToneGenerator
+from .backends import SoundDeviceBackend, VirtualBackend, get_default_backend
+from .measurement import ThdMeasurement, measure_recording, sweep_frequencies, compare_files
 from .saver import save_wav, validate_filename, get_supported_formats
-from .loader import load_wav  # <-- DODAJ TEN IMPORT
+from .loader import load_wav, iter_wav_blocks, read_wav_metadata  # <-- DODAJ TEN IMPORT
 
 __all__ = [
     'AudioRecorder',
+    'SegmentWriter',
+    'BackgroundSegmentWriter',
+    'ToneGenerator',
+    'SoundDeviceBackend',
+    'VirtualBackend',
+    'get_default_backend',
     'save_wav',
     'validate_filename',
     'get_supported_formats',
-    'load_wav'
+    'load_wav',
+    'iter_wav_blocks',
+    'read_wav_metadata',
+    'ThdMeasurement',
+    'measure_recording',
+    'sweep_frequencies',
+    'compare_files'
 ]
\ No newline at end of file
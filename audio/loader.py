@@ -14,6 +14,17 @@ def normalize_audio(audio_data):
         raise ValueError("Nieobsługiwany format danych audio")
 
 
+def read_wav_metadata(filepath):
+    """Czyta z nagłówka WAV liczbę kanałów, głębię bitową, długość i częstotliwość próbkowania."""
+    with wave.open(filepath, 'rb') as wf:
+        return {
+            'channels': wf.getnchannels(),
+            'bit_depth': wf.getsampwidth() * 8,
+            'duration': wf.getnframes() / wf.getframerate(),
+            'sample_rate': wf.getframerate()
+        }
+
+
 def load_wav(filepath):
     """
     Wczytuje plik WAV i zwraca znormalizowane próbki, częstotliwość próbkowania oraz słownik z metadanymi.
@@ -21,27 +32,32 @@ def load_wav(filepath):
     """
     try:
         sample_rate, data = wav_read(filepath)
-
-        with wave.open(filepath, 'rb') as wf:
-            channels = wf.getnchannels()
-            bit_depth = wf.getsampwidth() * 8
-            duration = wf.getnframes() / wf.getframerate()
+        metadata = read_wav_metadata(filepath)
 
         # -------------> Jeśli plik jest stereo, uśrednij kanały do mono
         if data.ndim > 1:
             data = data.mean(axis=1)
 
         samples = normalize_audio(data)
-
-        metadata = {
-            'channels': channels,
-            'bit_depth': bit_depth,
-            'duration': duration,
-            'sample_rate': sample_rate
-        }
+        metadata['sample_rate'] = sample_rate
 
         return samples, sample_rate, metadata
 
     except Exception as e:
         print(f"Błąd podczas wczytywania pliku WAV: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+def iter_wav_blocks(filepath, block_size=65536):
+    """
+    Czyta plik WAV kolejnymi blokami i zwraca pary (sample_rate, znormalizowany blok).
+    Zachowuje kanały - blok ma kształt (n,) lub (n, kanały). Nie wczytuje całego pliku do pamięci.
+    """
+    try:
+        sample_rate, data = wav_read(filepath, mmap=True)
+    except ValueError:
+        # -------------> Pliki 24-bit nie wspierają mmap - wczytujemy je w całości
+        sample_rate, data = wav_read(filepath)
+
+    for start in range(0, len(data), block_size):
+        yield sample_rate, normalize_audio(np.array(data[start:start + block_size]))
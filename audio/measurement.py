@@ -0,0 +1,160 @@
+import numpy as np
+import threading
+import time
+
+from audio.backends import get_default_backend
+from audio.generator import ToneGenerator
+from audio.loader import load_wav
+from audio.recorder import AudioRecorder
+from dsp.alignment import compare_signals
+from dsp.distortion import coherent_frequency, harmonic_analysis, DEFAULT_N_FFT, DEFAULT_HARMONICS
+
+
+def sweep_frequencies(start=20.0, end=20000.0, points=24, fs=44100):
+    """Logarytmicznie rozmieszczone częstotliwości pomiaru, ograniczone do pasma poniżej Nyquista."""
+    end = min(end, 0.45 * fs)
+    return list(np.geomspace(start, end, points)) if points > 1 else [start]
+
+
+class ThdMeasurement:
+    """
+    Pomiar zniekształceń: ToneGenerator gra sinus o częstotliwości koherentnej z ramką analizy,
+    AudioRecorder nagrywa wejście (mikrofon, wejście liniowe, pętlę zwrotną backendu wirtualnego),
+    a harmonic_analysis liczy THD, THD+N, SNR i poziomy harmonicznych z widma uśrednionego po frames
+    ramkach. Generator i nagrywanie działają przez cały sweep - zmienia się tylko częstotliwość,
+    a po każdej zmianie pomijane jest settle_seconds nagrania (opóźnienie toru i stan przejściowy).
+    """
+
+    def __init__(self, backend=None, fs=44100, n_fft=DEFAULT_N_FFT, frames=8, amplitude=0.5,
+                 settle_seconds=0.1, n_harmonics=DEFAULT_HARMONICS, input_device=None, output_device=None,
+                 timeout=10.0):
+        self.backend = backend or get_default_backend()
+        self.fs = fs
+        self.n_fft = n_fft
+        self.frames = frames
+        self.settle_seconds = settle_seconds
+        self.n_harmonics = n_harmonics
+        self.input_device = input_device
+        self.output_device = output_device
+        self.timeout = timeout
+        self.generator = ToneGenerator(fs, amplitude=amplitude, backend=self.backend)
+        self.recorder = AudioRecorder(fs, channels=1, backend=self.backend)
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def frame_size(self, frequency):
+        """Ramka analizy dla częstotliwości: co najmniej n_fft i co najmniej 8 okresów tonu."""
+        n_fft = self.n_fft
+        while n_fft * frequency < 8 * self.fs:
+            n_fft *= 2
+        return n_fft
+
+    def start(self, frequency):
+        self._cancel.clear()
+        self.generator.set_frequency(coherent_frequency(frequency, self.fs, self.frame_size(frequency)))
+        self.generator.start(self.output_device)
+        # -------------> Kilka bloków zapasu w torze, zanim zacznie się nagrywanie (pętla zwrotna bez niedoborów)
+        blocksize = getattr(self.backend, 'blocksize', 512)
+        speed = getattr(self.backend, 'speed', 1.0) or 1.0
+        time.sleep(4 * blocksize / self.fs / speed)
+        # -------------> Tryb ciągły z krótką historią - pamięć nie rośnie w trakcie długiego sweepa
+        self.recorder.start(1.0, device_id=self.input_device, continuous=True)
+
+    def stop(self):
+        self.recorder.stop()
+        self.generator.stop()
+
+    def _capture(self, frame_count):
+        chunks = []
+        captured = 0
+        deadline = time.perf_counter() + self.timeout
+        while captured < frame_count:
+            if self._cancel.is_set():
+                return None
+            if time.perf_counter() > deadline:
+                raise TimeoutError("Brak sygnału z wejścia pomiarowego")
+            block = self.recorder.get_realtime_buffer()
+            if block.size:
+                block = block.mean(axis=1) if block.ndim > 1 else block
+                chunks.append(block)
+                captured += len(block)
+            else:
+                time.sleep(0.002)
+        return np.concatenate(chunks)[:frame_count]
+
+    def measure(self, frequency):
+        """Pomiar w jednym punkcie - generator i nagrywanie muszą być uruchomione (start())."""
+        n_fft = self.frame_size(frequency)
+        # -------------> Dłuższe ramki dla niskich tonów - mniej uśrednień, podobny czas pomiaru
+        frames = max(2, self.frames * self.n_fft // n_fft)
+        stimulus = coherent_frequency(frequency, self.fs, n_fft)
+        self.generator.set_frequency(stimulus)
+        settle = int(self.settle_seconds * self.fs)
+        # -------------> Odrzucamy to, co zdążyło się nagrać przed zmianą, i czas ustalania
+        self.recorder.get_realtime_buffer()
+        if self._capture(settle) is None:
+            return None
+        samples = self._capture(n_fft * frames)
+        if samples is None:
+            return None
+        result = harmonic_analysis(samples, self.fs, stimulus, n_fft, self.n_harmonics)
+        result['stimulus'] = stimulus
+        return result
+
+    def sweep(self, frequencies, progress=None):
+        """
+        Mierzy kolejne częstotliwości. progress(done, total) jest wywoływane po każdym punkcie.
+        Zwraca listę wyników (krótszą, jeśli pomiar anulowano przez cancel()).
+        """
+        frequencies = list(frequencies)
+        results = []
+        if not frequencies:
+            return results
+        self.start(frequencies[0])
+        try:
+            for done, frequency in enumerate(frequencies, start=1):
+                result = self.measure(frequency)
+                if result is None:
+                    break
+                results.append(result)
+                if progress:
+                    progress(done, len(frequencies))
+        finally:
+            self.stop()
+        return results
+
+
+def measure_recording(samples, fs, frequency=None, n_fft=None, n_harmonics=DEFAULT_HARMONICS):
+    """
+    Pomiar zniekształceń nagranego sygnału (np. odtworzonego pliku z zarejestrowanym tonem).
+    Częstotliwość nie musi być koherentna, więc używane jest okno Blackmana-Harrisa z szerszymi binami.
+    Bez frequency mierzony jest ton dominujący.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    samples = samples.mean(axis=1) if samples.ndim > 1 else samples
+    n_fft = n_fft or min(1 << 15, 1 << int(np.log2(max(len(samples), 2))))
+    if frequency is None:
+        spectrum = np.abs(np.fft.rfft(samples[:n_fft] * np.hanning(n_fft)))
+        frequency = (np.argmax(spectrum[1:]) + 1) * fs / n_fft
+    return harmonic_analysis(samples, fs, frequency, n_fft, n_harmonics, window='blackmanharris', bin_width=4)
+
+
+def compare_files(reference_path, other_path, max_lag_seconds=10.0):
+    """
+    Porównuje plik z referencją: przesunięcie z korelacji wzajemnej (overlap-save, szukane w zakresie
+    +/- max_lag_seconds), różnice poziomów, sygnał różnicowy i różnicę widm. Plik o innej
+    częstotliwości próbkowania jest najpierw przepróbkowany do częstotliwości referencji.
+    """
+    reference, fs, _ = load_wav(reference_path)
+    other, other_fs, _ = load_wav(other_path)
+    if other_fs != fs:
+        # -------------> Import lokalny - scipy.signal jest potrzebne tylko przy różnych fs
+        from math import gcd
+        from scipy.signal import resample_poly
+        divisor = gcd(int(fs), int(other_fs))
+        other = resample_poly(other, int(fs) // divisor, int(other_fs) // divisor).astype(np.float32)
+    result = compare_signals(reference, other, fs, int(max_lag_seconds * fs))
+    result.update({'reference': reference_path, 'file': other_path, 'sample_rate': fs})
+    return result
@@ -1,13 +1,17 @@
-import sounddevice as sd
 import numpy as np
 from collections import deque
 import threading
 
+from audio.backends import get_default_backend
+
 
 class AudioRecorder:
-    def __init__(self, fs=44100, channels=1):
+    def __init__(self, fs=44100, channels=1, backend=None, blocksize=0):
         self.fs = fs
         self.channels = channels
+        # -------------> Źródło strumienia: sounddevice lub urządzenia wirtualne (testy bez sprzętu)
+        self.backend = backend or get_default_backend()
+        self.blocksize = blocksize
 
         # -------------> Technika podwójnego buforowania
         self.write_buffer = []  # -------------> Bufor, do którego pisze wątek audio
@@ -17,8 +21,17 @@ class AudioRecorder:
         self.recording = False
         self.lock = threading.Lock()
 
-        # -------------> Bufor główny, który przechowuje całe nagranie
-        self.main_buffer_chunks = []
+        # -------------> Bufor główny, który przechowuje całe nagranie (lub ostatnią historię w trybie ciągłym)
+        self.main_buffer_chunks = deque()
+        self._buffered_frames = 0
+        self.total_frames = 0  # -------------> Liczba ramek od startu nagrania (także tych usuniętych z historii)
+
+        # -------------> Tryb ciągły: ograniczona historia w RAM, reszta trafia do segmentów WAV
+        self.history_frames = None
+        self.segment_writer = None
+
+        # -------------> Opcjonalna bramka ciszy (dsp.gate.SilenceGate) aktualizowana w callbacku audio
+        self.silence_gate = None
 
     def _callback(self, indata, frames, time, status):
         if status:
@@ -27,20 +40,30 @@ class AudioRecorder:
         if self.recording:
             # -------------> Ta operacja jest bezpieczna bez locka, bo tylko ten wątek modyfikuje write_buffer
             self.write_buffer.append(indata.copy())
-
-    def start(self, duration, device_id=None):
+            gate = self.silence_gate
+            if gate is not None:
+                gate.process(indata)
+
+    def start(self, duration, device_id=None, continuous=False, segment_writer=None):
+        """
+        Rozpoczyna nagrywanie. W trybie ciągłym duration oznacza długość historii trzymanej w pamięci,
+        a wszystkie próbki są dodatkowo zapisywane przez segment_writer (jeśli podano).
+        """
         try:
             self.clear_buffer()
+            self.history_frames = int(duration * self.fs) if continuous else None
+            self.segment_writer = segment_writer
+            if self.silence_gate is not None:
+                self.silence_gate.reset()
             self.recording = True
 
-            self.stream = sd.InputStream(
-                samplerate=self.fs, channels=self.channels, callback=self._callback,
-                dtype=np.float32, device=device_id
+            self.stream = self.backend.open_input_stream(
+                self.fs, self.channels, self._callback, device=device_id, blocksize=self.blocksize
             )
 
             self.stream.start()
-            device_info = sd.query_devices(self.stream.device, 'input')
-            print(f"Recording started on '{device_info['name']}' ({self.stream.channels} channel(s))")
+            device_name = self.backend.device_name(self.stream.device)
+            print(f"Recording started on '{device_name}' ({self.stream.channels} channel(s))")
 
         except Exception as e:
             print(f"Error starting recording: {e}")
@@ -61,7 +84,49 @@ class AudioRecorder:
 
         with self.lock:
             if self.write_buffer:
-                self.main_buffer_chunks.extend(self.write_buffer)
+                self._append_chunks(self.write_buffer)
+                self.write_buffer = []
+
+        if self.segment_writer:
+            try:
+                self.segment_writer.close()
+            except Exception as e:
+                print(f"Error closing segment file: {e}")
+            self.segment_writer = None
+
+    def _append_chunks(self, chunks):
+        """Przenosi fragmenty do bufora głównego, zapisuje je do segmentów i przycina historię."""
+        for chunk in chunks:
+            self.main_buffer_chunks.append(chunk)
+            self._buffered_frames += len(chunk)
+            self.total_frames += len(chunk)
+            if self.segment_writer:
+                self.segment_writer.write(chunk)
+
+        if self.history_frames:
+            # -------------> Usuwamy z pamięci fragmenty starsze niż zadana historia
+            while self._buffered_frames - len(self.main_buffer_chunks[0]) >= self.history_frames:
+                self._buffered_frames -= len(self.main_buffer_chunks.popleft())
+
+    def set_silence_gate(self, gate):
+        """Podłącza (lub odłącza, gate=None) bramkę ciszy liczoną na każdym bloku z wejścia."""
+        if gate is not None:
+            gate.reset()
+        self.silence_gate = gate
+
+    def is_silent(self):
+        """True, gdy bramka ciszy jest podłączona i zamknięta - na wejściu od dłuższej chwili jest cisza."""
+        gate = self.silence_gate
+        return gate is not None and not gate.is_open
+
+    def drain(self):
+        """
+        Przenosi nowe fragmenty do bufora głównego (zapis segmentów, przycinanie historii) bez sklejania
+        nagrania - tani zamiennik get_full_recording, gdy próbki nie będą analizowane (np. w ciszy).
+        """
+        with self.lock:
+            if self.write_buffer:
+                self._append_chunks(self.write_buffer)
                 self.write_buffer = []
 
     def get_realtime_buffer(self):
@@ -73,7 +138,7 @@ class AudioRecorder:
             # -------------> Zamieniamy bufory miejscami, aby bezpiecznie odczytać dane
             self.read_buffer, self.write_buffer = self.write_buffer, []
             # -------------> Dodajemy odczytane fragmenty do głównego bufora
-            self.main_buffer_chunks.extend(self.read_buffer)
+            self._append_chunks(self.read_buffer)
 
         if self.read_buffer:
             return np.concatenate(self.read_buffer, axis=0)
@@ -81,14 +146,20 @@ class AudioRecorder:
             return np.array([])
 
     def get_full_recording(self):
-        """Metoda do pobierania całego dotychczasowego nagrania."""
+        """
+        Metoda do pobierania całego dotychczasowego nagrania.
+        W trybie ciągłym zwraca tylko ostatnią historię (history_frames próbek).
+        """
         with self.lock:
             if self.write_buffer:
-                self.main_buffer_chunks.extend(self.write_buffer)
+                self._append_chunks(self.write_buffer)
                 self.write_buffer = []
 
             if self.main_buffer_chunks:
-                return np.concatenate(self.main_buffer_chunks, axis=0)
+                recording = np.concatenate(self.main_buffer_chunks, axis=0)
+                if self.history_frames:
+                    recording = recording[-self.history_frames:]
+                return recording
             else:
                 return np.array([])
 
@@ -98,8 +169,38 @@ class AudioRecorder:
     def get_sample_rate(self):
         return self.fs
 
+    def get_total_frames(self):
+        """Zwraca liczbę ramek nagranych od startu (pozycję końca strumienia)."""
+        return self.total_frames
+
+    def buffered_bytes(self):
+        """Bajty zajmowane przez bufory nagrania (historia i fragmenty jeszcze nieodczytane)."""
+        with self.lock:
+            return sum(chunk.nbytes for chunk in self.main_buffer_chunks) + \
+                sum(chunk.nbytes for chunk in self.write_buffer)
+
+    def limit_history(self, history_frames, segment_writer=None):
+        """
+        Degradacja przy braku pamięci: w RAM zostaje tylko ostatnie history_frames ramek.
+        Jeśli nagranie nie jest jeszcze zapisywane do segmentów, dotychczasowe fragmenty trafiają
+        najpierw do segment_writer, a kolejne są zapisywane na bieżąco - jak w trybie ciągłym.
+        Zrzut całej historii może trwać długo - segment_writer powinien zapisywać w tle
+        (BackgroundSegmentWriter), bo write() jest tu wywoływane pod lockiem nagrania.
+        """
+        with self.lock:
+            if self.segment_writer is None and segment_writer is not None:
+                for chunk in self.main_buffer_chunks:
+                    segment_writer.write(chunk)
+                self.segment_writer = segment_writer
+            self.history_frames = max(1, int(history_frames))
+            while self.main_buffer_chunks and \
+                    self._buffered_frames - len(self.main_buffer_chunks[0]) >= self.history_frames:
+                self._buffered_frames -= len(self.main_buffer_chunks.popleft())
+
     def clear_buffer(self):
         with self.lock:
             self.write_buffer.clear()
             self.read_buffer.clear()
-            self.main_buffer_chunks.clear()
\ No newline at end of file
+            self.main_buffer_chunks.clear()
+            self._buffered_frames = 0
+            self.total_frames = 0
\ No newline at end of file
@@ -0,0 +1,120 @@
+import numpy as np
+from collections import deque
+from datetime import datetime
+import glob
+import os
+import queue
+import threading
+import wave
+
+
+class SegmentWriter:
+    """
+    Zapisuje strumień audio do rotowanych plików WAV (16-bit PCM) o stałej długości lub rozmiarze.
+    Przechowuje najwyżej max_segments plików - najstarsze są usuwane.
+    """
+
+    def __init__(self, directory, fs, channels=1, segment_seconds=60.0, segment_bytes=None,
+                 max_segments=60, prefix="segment"):
+        self.directory = directory
+        self.fs = fs
+        self.channels = channels
+        self.max_segments = max_segments
+        self.prefix = prefix
+
+        bytes_per_frame = 2 * channels
+        if segment_bytes:
+            self.frames_per_segment = max(1, int(segment_bytes) // bytes_per_frame)
+        else:
+            self.frames_per_segment = max(1, int(round(segment_seconds * fs)))
+
+        os.makedirs(directory, exist_ok=True)
+        # -------------> Retencja obejmuje także segmenty z poprzednich sesji
+        self.segments = deque(sorted(glob.glob(os.path.join(directory, f"{prefix}_*.wav"))))
+        self._current = None
+        self._current_frames = 0
+        self._counter = 0
+
+    def _open_segment(self):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, f"{self.prefix}_{timestamp}_{self._counter:04d}.wav")
+        self._counter += 1
+
+        self._current = wave.open(path, 'wb')
+        self._current.setnchannels(self.channels)
+        self._current.setsampwidth(2)
+        self._current.setframerate(self.fs)
+        self._current_frames = 0
+
+        self.segments.append(path)
+        self._enforce_retention()
+
+    def _enforce_retention(self):
+        while self.max_segments and len(self.segments) > self.max_segments:
+            oldest = self.segments.popleft()
+            try:
+                os.remove(oldest)
+            except OSError as e:
+                print(f"Nie udało się usunąć segmentu {oldest}: {e}")
+
+    def _close_segment(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+
+    def write(self, block):
+        """Dopisuje blok float32 w zakresie [-1.0, 1.0], dzieląc go na granicach segmentów."""
+        block = np.asarray(block)
+        if block.ndim == 1:
+            block = block[:, np.newaxis]
+        int_block = np.int16(np.clip(block, -1.0, 1.0) * 32767)
+
+        pos = 0
+        while pos < len(int_block):
+            if self._current is None:
+                self._open_segment()
+            take = min(self.frames_per_segment - self._current_frames, len(int_block) - pos)
+            self._current.writeframes(int_block[pos:pos + take].tobytes())
+            self._current_frames += take
+            pos += take
+            if self._current_frames >= self.frames_per_segment:
+                self._close_segment()
+
+    def close(self):
+        """Zamyka bieżący segment (nagłówek WAV zostaje uzupełniony)."""
+        self._close_segment()
+
+
+class BackgroundSegmentWriter:
+    """
+    Zapis segmentów w osobnym wątku: write() tylko kolejkuje blok, więc wywołujący (np. wątek GUI
+    zrzucający całą dotychczasową historię nagrania) nie czeka na dysk. Kolejność bloków jest zachowana.
+    close() nie czeka na zapis - wątek dokańcza kolejkę i zamyka segment (join() czeka na koniec).
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.directory = writer.directory
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="SegmentWriter")
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            block = self._queue.get()
+            if block is None:
+                break
+            try:
+                self.writer.write(block)
+            except Exception as e:
+                print(f"Błąd zapisu segmentu: {e}")
+        self.writer.close()
+
+    def write(self, block):
+        self._queue.put(block)
+
+    def close(self):
+        self._queue.put(None)
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
@@ -0,0 +1,166 @@
+"""
+Benchmark end-to-end sesji na żywo: nadejście bloku audio -> trigger_analysis -> worker
+-> update_plots_from_results -> narysowana klatka.
+Uruchamia LiveAudioAnalyzer bez ekranu (Qt offscreen) z wirtualnym źródłem sygnału.
+
+Użycie: python -m benchmarks.live_latency [--durations 5 10 30] [--channels 1 2] [--blocksize 512] [--json]
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6.QtWidgets import QApplication
+
+from audio.backends import VirtualBackend
+from audio.recorder import AudioRecorder
+from gui.main_window import LiveAudioAnalyzer
+
+
+def _rss_mb():
+    # -------------> Bieżące RSS z /proc (Linux), w przeciwnym razie szczytowe z getrusage
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+class SessionProbe:
+    """Zbiera znaczniki czasu nadejścia bloków i narysowania klatek dla jednej sesji."""
+
+    def __init__(self, window, recorder):
+        self.window = window
+        self.arrival_positions = []
+        self.arrival_times = []
+        self.latencies = []
+        self.triggers = 0
+        self.samples = []
+
+        original_callback = recorder._callback
+        self._frames_seen = 0
+
+        def timed_callback(indata, frames, time_info, status):
+            self._frames_seen += frames
+            self.arrival_positions.append(self._frames_seen)
+            self.arrival_times.append(time.perf_counter())
+            original_callback(indata, frames, time_info, status)
+
+        # -------------> Podmiana na poziomie instancji - start() pobiera self._callback
+        recorder._callback = timed_callback
+        window.analysis_trigger.connect(self._on_trigger)
+
+        original_draw = window._draw_results
+
+        def timed_draw(results):
+            try:
+                original_draw(results)
+            finally:
+                self._on_frame(results)
+
+        # -------------> Slot GUI wywołuje self._draw_results, więc znacznik pada w wątku GUI po canvas.draw()
+        window._draw_results = timed_draw
+
+    def _on_trigger(self, samples, fs, stream_position):
+        self.triggers += 1
+
+    def _on_frame(self, results):
+        if not results:
+            return
+        now = time.perf_counter()
+        position = results['stream_position']
+        # -------------> Czas nadejścia bloku, który zamknął analizowany fragment
+        index = np.searchsorted(self.arrival_positions, position)
+        if index < len(self.arrival_times):
+            self.latencies.append(now - self.arrival_times[index])
+
+    def sample_resources(self, cpu_start, wall_start):
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        self.samples.append((wall, 100.0 * cpu / wall if wall > 0 else 0.0, _rss_mb()))
+
+
+def run_session(app, duration, channels, blocksize, speed, jitter):
+    backend = VirtualBackend(blocksize=blocksize, speed=speed, jitter=jitter, seed=0)
+    window = LiveAudioAnalyzer()
+    window.recorder = AudioRecorder(channels=channels, backend=backend, blocksize=blocksize)
+    window.duration = duration
+    probe = SessionProbe(window, window.recorder)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    next_sample = wall_start
+    window.start_recording()
+    while window.is_recording:
+        app.processEvents()
+        if time.perf_counter() >= next_sample:
+            probe.sample_resources(cpu_start, wall_start)
+            next_sample += 1.0
+        time.sleep(0.001)
+
+    # -------------> Dokańczamy analizy z kolejki
+    drain_until = time.perf_counter() + 2.0
+    while time.perf_counter() < drain_until:
+        app.processEvents()
+        time.sleep(0.005)
+    probe.sample_resources(cpu_start, wall_start)
+    window.close()
+
+    latencies_ms = np.array(probe.latencies) * 1000
+    scheduler = window.frame_scheduler
+    return {
+        'duration': duration,
+        'channels': channels,
+        'frames': len(latencies_ms),
+        'triggers': probe.triggers,
+        # -------------> Ticki pominięte przez scheduler, bo poprzednia klatka nie była jeszcze narysowana
+        'dropped_frames': scheduler.frames_skipped,
+        'frame_interval_ms': scheduler.interval(),
+        'latency_p50_ms': float(np.percentile(latencies_ms, 50)) if latencies_ms.size else None,
+        'latency_p90_ms': float(np.percentile(latencies_ms, 90)) if latencies_ms.size else None,
+        'latency_p99_ms': float(np.percentile(latencies_ms, 99)) if latencies_ms.size else None,
+        'latency_max_ms': float(latencies_ms.max()) if latencies_ms.size else None,
+        'cpu_percent_mean': float(np.mean([s[1] for s in probe.samples])),
+        'rss_mb_timeline': [round(s[2], 1) for s in probe.samples],
+        'rss_mb_peak': max(s[2] for s in probe.samples)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.live_latency",
+                                     description="Opóźnienie end-to-end sesji na żywo")
+    parser.add_argument('--durations', type=int, nargs='+', default=[5, 10, 30])
+    parser.add_argument('--channels', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--blocksize', type=int, default=512)
+    parser.add_argument('--speed', type=float, default=1.0)
+    parser.add_argument('--jitter', type=float, default=0.0, help="Maksymalne dodatkowe opóźnienie bloku [s]")
+    parser.add_argument('--json', action='store_true', help="Wyniki jako linie JSON")
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    if not args.json:
+        print(f"{'czas':>5} {'kan':>4} {'klatki':>7} {'utr.':>5} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8} "
+              f"{'CPU%':>6} {'RSS MB':>8}")
+    for duration in args.durations:
+        for channels in args.channels:
+            result = run_session(app, duration, channels, args.blocksize, args.speed, args.jitter)
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(f"{result['duration']:>5} {result['channels']:>4} {result['frames']:>7} "
+                      f"{result['dropped_frames']:>5} {result['latency_p50_ms'] or 0:>8.1f} "
+                      f"{result['latency_p90_ms'] or 0:>8.1f} {result['latency_p99_ms'] or 0:>8.1f} "
+                      f"{result['latency_max_ms'] or 0:>8.1f} {result['cpu_percent_mean']:>6.1f} "
+                      f"{result['rss_mb_peak']:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import numpy as np
+import scipy.fft
+
+from dsp.welch import welch_psd
+
+# -------------> Minimalna długość bloku korelacji (próbki sygnału referencyjnego na jedną FFT)
+_MIN_BLOCK = 1 << 16
+# -------------> Środki pasm oktawowych do podsumowania różnicy widm
+OCTAVE_BANDS = [31.5, 63, 125, 250, 500, 1000, 2000, 4000, 8000, 16000]
+
+
+def cross_correlation(reference, other, max_lag, block_size=None, workers=-1):
+    """
+    Korelacja wzajemna c[l] = sum reference[n] * other[n + l] dla l z zakresu -max_lag..max_lag,
+    liczona metodą overlap-save: referencja jest dzielona na bloki długości block_size, a każdy
+    jest korelowany z fragmentem other dłuższym o max_lag z obu stron. Widma wzajemne bloków są
+    sumowane, a na końcu wykonywana jest jedna odwrotna FFT - rozmiar transformaty zależy od
+    max_lag i block_size, nie od długości plików. Zwraca (opóźnienia, korelacja).
+    """
+    reference = np.asarray(reference)
+    other = np.asarray(other)
+    max_lag = int(max_lag)
+    block_size = int(block_size or max(4 * max_lag, _MIN_BLOCK))
+    n_fft = scipy.fft.next_fast_len(block_size + 2 * max_lag, real=True)
+    accumulated = np.zeros(n_fft // 2 + 1, dtype=np.complex128)
+    # -------------> Transformaty w pojedynczej precyzji, sumowanie widm w podwójnej
+    segment = np.zeros(n_fft, dtype=np.float32)
+
+    for start in range(0, len(reference), block_size):
+        block = np.asarray(reference[start:start + block_size], dtype=np.float32)
+        # -------------> Fragment other od start - max_lag; poza zakresem pliku - zera
+        low, high = start - max_lag, start + len(block) + max_lag
+        segment[:] = 0.0
+        available = np.asarray(other[max(low, 0):min(high, len(other))], dtype=np.float32)
+        if available.size == 0:
+            continue
+        offset = max(low, 0) - low
+        segment[offset:offset + len(available)] = available
+        accumulated += np.conj(scipy.fft.rfft(block, n_fft, workers=workers)) * \
+            scipy.fft.rfft(segment, workers=workers)
+
+    # -------------> Korelacja kołowa: indeksy 0..2*max_lag nie zawijają się, bo n_fft >= blok + 2*max_lag
+    correlation = scipy.fft.irfft(accumulated, n_fft, workers=workers)[:2 * max_lag + 1]
+    return np.arange(-max_lag, max_lag + 1), correlation
+
+
+def find_offset(reference, other, max_lag=None, block_size=None):
+    """
+    Opóźnienie other względem reference w próbkach (other[n + lag] ~ reference[n]) z ułamkiem próbki
+    z interpolacji parabolicznej maksimum, oraz znormalizowany współczynnik korelacji (-1..1).
+    Ujemny współczynnik oznacza odwróconą polaryzację.
+    """
+    if max_lag is None:
+        max_lag = min(len(reference), len(other)) // 2
+    max_lag = max(1, min(int(max_lag), max(len(reference), len(other)) - 1))
+    lags, correlation = cross_correlation(reference, other, max_lag, block_size)
+    index = int(np.argmax(np.abs(correlation)))
+    lag = float(lags[index])
+    if 0 < index < len(correlation) - 1:
+        left, center, right = np.abs(correlation[index - 1:index + 2])
+        denominator = left - 2 * center + right
+        if denominator != 0:
+            lag += float(0.5 * (left - right) / denominator)
+    energy = np.sqrt(np.dot(reference, reference) * np.dot(other, other))
+    coefficient = float(correlation[index] / energy) if energy > 0 else 0.0
+    return lag, coefficient
+
+
+def align(reference, other, lag):
+    """Przycina oba sygnały do wspólnego fragmentu po przesunięciu other o lag (całkowite) próbek."""
+    lag = int(round(lag))
+    if lag >= 0:
+        other = other[lag:]
+    else:
+        reference = reference[-lag:]
+    length = min(len(reference), len(other))
+    return reference[:length], other[:length]
+
+
+def _db(value):
+    return float(20 * np.log10(max(value, 1e-12)))
+
+
+def compare_signals(reference, other, fs, max_lag=None, segment_length=4096):
+    """
+    Wyrównuje other do reference i porównuje je: przesunięcie, różnica poziomów (RMS, szczyt),
+    sygnał różnicowy (other - reference) i jego poziom względem referencji (głębokość "nulla"),
+    także po dopasowaniu wzmocnienia metodą najmniejszych kwadratów (różnica samej "barwy"),
+    oraz różnica widm Welcha (other / reference w dB) na binach i w pasmach oktawowych.
+    Sygnał o odwróconej polaryzacji jest odwracany przed odejmowaniem.
+    """
+    lag, coefficient = find_offset(reference, other, max_lag)
+    ref_aligned, other_aligned = align(reference, other, lag)
+    if len(ref_aligned) == 0:
+        raise ValueError("Sygnały nie mają wspólnego fragmentu po wyrównaniu")
+    if coefficient < 0:
+        other_aligned = -other_aligned
+    difference = (other_aligned - ref_aligned).astype(np.float32)
+
+    ref_rms = float(np.sqrt(np.mean(np.square(ref_aligned, dtype=np.float64))))
+    other_rms = float(np.sqrt(np.mean(np.square(other_aligned, dtype=np.float64))))
+    difference_rms = float(np.sqrt(np.mean(np.square(difference, dtype=np.float64))))
+    # -------------> Reszta po najlepszym wzmocnieniu g: |o - g*r|^2 = |o|^2 - g * <r, o>, bez kolejnej kopii sygnału
+    cross = float(np.dot(ref_aligned.astype(np.float64), other_aligned))
+    gain = cross / (ref_rms ** 2 * len(ref_aligned)) if ref_rms > 0 else 0.0
+    residual_rms = np.sqrt(max(other_rms ** 2 - gain * cross / len(ref_aligned), 0.0))
+
+    freqs, ref_psd = welch_psd(ref_aligned, fs, segment_length)
+    _, other_psd = welch_psd(other_aligned, fs, segment_length)
+    ref_db = 10 * np.log10(ref_psd + 1e-24)
+    other_db = 10 * np.log10(other_psd + 1e-24)
+    band_deltas = {}
+    for center in OCTAVE_BANDS:
+        band = (freqs >= center / np.sqrt(2)) & (freqs < center * np.sqrt(2))
+        if band.any() and ref_psd[band].sum() > 0:
+            band_deltas[f"{center:g}"] = float(10 * np.log10((other_psd[band].sum() + 1e-24) / ref_psd[band].sum()))
+
+    return {
+        'offset_samples': lag,
+        'offset_seconds': lag / fs,
+        'correlation': coefficient,
+        'polarity_inverted': coefficient < 0,
+        'overlap_seconds': len(ref_aligned) / fs,
+        'level_delta_db': _db(other_rms) - _db(ref_rms),
+        'peak_delta_db': _db(float(np.max(np.abs(other_aligned)))) - _db(float(np.max(np.abs(ref_aligned)))),
+        'difference_rms_dbfs': _db(difference_rms),
+        'null_depth_db': _db(difference_rms) - _db(ref_rms),
+        'gain_matched_null_db': _db(residual_rms) - _db(ref_rms),
+        'band_deltas_db': band_deltas,
+        'difference': difference,
+        'spectrum': (freqs, ref_db, other_db, other_db - ref_db)
+    }
@@ -0,0 +1,140 @@
+import numpy as np
+from scipy import sparse
+from collections import OrderedDict
+import threading
+
+# -------------> Domyślnie zaczynamy od C1, 12 binów na oktawę = jeden bin na półton
+DEFAULT_FMIN = 32.70319566257483
+DEFAULT_BINS_PER_OCTAVE = 12
+
+# -------------> Cache jąder spektralnych, klucz: (fs, bins_per_octave, fmin, n_bins)
+_KERNEL_CACHE_SIZE = 8
+_kernel_cache = OrderedDict()
+_kernel_lock = threading.Lock()
+
+
+class CQTKernel:
+    """
+    Prekomputowane jądro spektralne transformaty stałego Q (metoda Browna-Puckette'a).
+    Macierz rzadka o wymiarach (n_bins, n_fft // 2 + 1) mnożona przez widmo rfft ramki.
+    """
+
+    def __init__(self, matrix, frequencies, n_fft, fs, bins_per_octave, fmin):
+        self.matrix = matrix
+        self.frequencies = frequencies
+        self.n_fft = n_fft
+        self.fs = fs
+        self.bins_per_octave = bins_per_octave
+        self.fmin = fmin
+
+    @property
+    def n_bins(self):
+        return len(self.frequencies)
+
+
+def cqt_frequencies(n_bins, fmin=DEFAULT_FMIN, bins_per_octave=DEFAULT_BINS_PER_OCTAVE):
+    """Zwraca częstotliwości środkowe binów CQT rozmieszczone logarytmicznie."""
+    return fmin * 2.0 ** (np.arange(n_bins) / bins_per_octave)
+
+
+def _default_n_bins(fs, fmin, bins_per_octave):
+    # -------------> Zostawiamy margines pod Nyquistem na szerokość pasma najwyższego jądra
+    top = 0.45 * fs
+    if top <= fmin:
+        raise ValueError("Częstotliwość fmin musi być mniejsza niż fs / 2")
+    return int(np.floor(bins_per_octave * np.log2(top / fmin))) + 1
+
+
+def _build_kernel(fs, bins_per_octave, fmin, n_bins, sparsity):
+    q = 1.0 / (2.0 ** (1.0 / bins_per_octave) - 1.0)
+    frequencies = cqt_frequencies(n_bins, fmin, bins_per_octave)
+    lengths = np.ceil(q * fs / frequencies).astype(int)
+    n_fft = int(2 ** np.ceil(np.log2(lengths[0])))
+    n_rfft = n_fft // 2 + 1
+
+    rows, cols, values = [], [], []
+    for k, (freq, length) in enumerate(zip(frequencies, lengths)):
+        window = np.hanning(length)
+        n = np.arange(length)
+        temporal = np.zeros(n_fft, dtype=np.complex128)
+        start = (n_fft - length) // 2
+        # -------------> Normalizacja do sumy okna: sinus o amplitudzie A daje |X| = A / 2
+        temporal[start:start + length] = window / window.sum() * np.exp(2j * np.pi * freq * n / fs)
+
+        spectrum = np.fft.fft(temporal)[:n_rfft]
+        magnitude = np.abs(spectrum)
+        keep = np.flatnonzero(magnitude > sparsity * magnitude.max())
+        rows.append(np.full(keep.size, k))
+        cols.append(keep)
+        # -------------> Z twierdzenia Parsevala: sum x * conj(h) = sum X * conj(H) / N
+        values.append(np.conj(spectrum[keep]) / n_fft)
+
+    matrix = sparse.csr_matrix(
+        (np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(n_bins, n_rfft)
+    )
+    return CQTKernel(matrix, frequencies, n_fft, fs, bins_per_octave, fmin)
+
+
+def get_cqt_kernel(fs, bins_per_octave=DEFAULT_BINS_PER_OCTAVE, fmin=DEFAULT_FMIN, n_bins=None, sparsity=0.01):
+    """
+    Zwraca jądro CQT z cache lub buduje je przy pierwszym użyciu.
+    Jądra są przechowywane per (fs, bins_per_octave, fmin, n_bins) z usuwaniem najdawniej używanych.
+    """
+    if n_bins is None:
+        n_bins = _default_n_bins(fs, fmin, bins_per_octave)
+    key = (int(fs), int(bins_per_octave), float(fmin), int(n_bins), float(sparsity))
+
+    with _kernel_lock:
+        kernel = _kernel_cache.get(key)
+        if kernel is not None:
+            _kernel_cache.move_to_end(key)
+            return kernel
+
+    # -------------> Budowa poza lockiem - może potrwać kilkaset ms dla dużej rozdzielczości
+    kernel = _build_kernel(int(fs), int(bins_per_octave), float(fmin), int(n_bins), sparsity)
+
+    with _kernel_lock:
+        _kernel_cache[key] = kernel
+        while len(_kernel_cache) > _KERNEL_CACHE_SIZE:
+            _kernel_cache.popitem(last=False)
+    return kernel
+
+
+def cqt_spectrum(samples, fs, bins_per_octave=DEFAULT_BINS_PER_OCTAVE, fmin=DEFAULT_FMIN):
+    """
+    Liczy widmo CQT ostatniej ramki sygnału (n_fft najnowszych próbek).
+    Zwraca częstotliwości środkowe binów oraz amplitudy (sinus 1.0 -> 1.0).
+    """
+    kernel = get_cqt_kernel(fs, bins_per_octave, fmin)
+    frame = np.asarray(samples[-kernel.n_fft:], dtype=np.float64)
+    if frame.size < kernel.n_fft:
+        frame = np.concatenate([np.zeros(kernel.n_fft - frame.size), frame])
+
+    magnitude = 2.0 * np.abs(kernel.matrix @ np.fft.rfft(frame))
+    return kernel.frequencies, magnitude
+
+
+def cqt_spectrogram(samples, fs, hop_length=2048, bins_per_octave=DEFAULT_BINS_PER_OCTAVE, fmin=DEFAULT_FMIN,
+                    batch_size=64):
+    """
+    Liczy spektrogram CQT jako iloczyn macierzy rzadkiej i widm rfft kolejnych ramek.
+    Ramki są przetwarzane partiami, aby ograniczyć zużycie pamięci dla długich sygnałów.
+    Zwraca (częstotliwości, czasy środków ramek, amplitudy [n_bins, n_frames]).
+    """
+    kernel = get_cqt_kernel(fs, bins_per_octave, fmin)
+    n_fft = kernel.n_fft
+    samples = np.asarray(samples, dtype=np.float64)
+
+    # -------------> Ramki wycentrowane na kolejnych punktach hop
+    padded = np.pad(samples, (n_fft // 2, n_fft // 2))
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop_length]
+    n_frames = frames.shape[0]
+
+    magnitude = np.empty((kernel.n_bins, n_frames), dtype=np.float32)
+    for start in range(0, n_frames, batch_size):
+        batch = np.fft.rfft(frames[start:start + batch_size], axis=1)
+        magnitude[:, start:start + batch.shape[0]] = 2.0 * np.abs(kernel.matrix @ batch.T)
+
+    times = np.arange(n_frames) * hop_length / fs
+    return kernel.frequencies, times, magnitude
@@ -0,0 +1,112 @@
+import numpy as np
+import scipy.fft
+from math import gcd
+
+from dsp.fft import window as cached_window, rfft_frequencies
+
+DEFAULT_N_FFT = 4096
+DEFAULT_HARMONICS = 10
+
+
+def coherent_frequency(frequency, fs, n_fft=DEFAULT_N_FFT):
+    """
+    Najbliższa częstotliwość mieszcząca całkowitą liczbę okresów w ramce n_fft próbek, z liczbą
+    okresów względnie pierwszą z n_fft (każda ramka trafia w inne fazy sinusa). Sygnał o takiej
+    częstotliwości nie daje przecieku widma przy oknie prostokątnym - cała moc tonu jest w jednym binie.
+    """
+    k = max(1, int(round(frequency * n_fft / fs)))
+    k = min(k, n_fft // 2 - 1)
+    for offset in range(n_fft // 2):
+        for candidate in (k - offset, k + offset):
+            if 0 < candidate < n_fft // 2 and gcd(candidate, n_fft) == 1:
+                return candidate * fs / n_fft
+    return k * fs / n_fft
+
+
+def _fold(bins, n_fft):
+    # -------------> Harmoniczne powyżej Nyquista aliasują z powrotem do pasma 0..n_fft/2
+    bins = np.mod(bins, n_fft)
+    return np.where(bins > n_fft // 2, n_fft - bins, bins)
+
+
+def averaged_power_spectrum(samples, fs, n_fft=DEFAULT_N_FFT, window='boxcar', workers=-1):
+    """
+    Widmo mocy uśrednione po wszystkich pełnych ramkach n_fft (bez nakładania) - wszystkie ramki
+    transformowane jednym wywołaniem scipy.fft. Skala: suma binów tonu = średni kwadrat (A^2 / 2).
+    Zwraca (częstotliwości, moc w binach, liczba ramek).
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    n_frames = len(samples) // n_fft
+    if n_frames == 0:
+        raise ValueError(f"Za mało próbek do pomiaru: {len(samples)} < {n_fft}")
+    frames = samples[:n_frames * n_fft].reshape(n_frames, n_fft)
+    win = cached_window(window, n_fft, periodic=True, dtype=np.float64)
+    spectrum = scipy.fft.rfft(frames * win, axis=1, workers=workers)
+    power = np.mean(spectrum.real ** 2 + spectrum.imag ** 2, axis=0) / (n_fft * np.sum(win ** 2))
+    power[1:-1 if n_fft % 2 == 0 else None] *= 2
+    return rfft_frequencies(n_fft, fs), power, n_frames
+
+
+def harmonic_analysis(samples, fs, fundamental, n_fft=DEFAULT_N_FFT, n_harmonics=DEFAULT_HARMONICS,
+                      window='boxcar', bin_width=0, min_frequency=20.0, workers=-1):
+    """
+    Mierzy THD, THD+N, SNR i poziomy harmonicznych sinusa o częstotliwości fundamental.
+    Dla sygnału koherentnego (coherent_frequency) wystarcza okno prostokątne i bin_width=0;
+    dla dowolnego nagrania lepiej użyć np. window='blackmanharris' i bin_width=4.
+    Moc każdej składowej to suma binów środek +/- bin_width (maski liczone wektorowo dla wszystkich
+    harmonicznych naraz), szum to reszta pasma od min_frequency (ale nie wyżej niż połowa tonu
+    podstawowego) do Nyquista, bez binów składowej stałej.
+    THD i THD+N są liczone względem składowej podstawowej.
+    """
+    freqs, power, n_frames = averaged_power_spectrum(samples, fs, n_fft, window, workers)
+    n_bins = len(power)
+
+    # -------------> Faktyczny bin tonu: maksimum w pobliżu oczekiwanej częstotliwości
+    expected = int(round(fundamental * n_fft / fs))
+    search = max(2, bin_width + 2)
+    low, high = max(1, expected - search), min(n_bins, expected + search + 1)
+    if low >= high:
+        raise ValueError(f"Częstotliwość {fundamental} Hz poza pasmem pomiaru (fs = {fs} Hz)")
+    fundamental_bin = low + int(np.argmax(power[low:high]))
+
+    # -------------> Wiersz 0 to ton podstawowy, kolejne - harmoniczne 2..n_harmonics+1
+    orders = np.arange(1, n_harmonics + 2)
+    centers = _fold(orders * fundamental_bin, n_fft)
+    offsets = np.arange(-bin_width, bin_width + 1)
+    bins = np.clip(centers[:, np.newaxis] + offsets, 0, n_bins - 1)
+    masks = np.zeros((len(orders), n_bins), dtype=bool)
+    masks[np.arange(len(orders))[:, np.newaxis], bins] = True
+
+    band = (freqs >= min(min_frequency, freqs[fundamental_bin] / 2)) & (np.arange(n_bins) > bin_width)
+    # -------------> Harmoniczna, która po aliasingu trafia w ton podstawowy (lub inną), liczona jest raz
+    masks[1:] &= ~masks[0]
+    masks[2:] &= ~np.logical_or.accumulate(masks[1:-1], axis=0)
+    component_power = (masks & band) @ power
+
+    fundamental_power = component_power[0]
+    harmonics_power = component_power[1:]
+    total_power = power[band].sum()
+    residual_power = max(total_power - fundamental_power, 0.0)
+    noise_power = max(residual_power - harmonics_power.sum(), 1e-30)
+    reference = max(fundamental_power, 1e-30)
+
+    def db(ratio):
+        return float(10 * np.log10(max(ratio, 1e-30)))
+
+    thd = np.sqrt(harmonics_power.sum() / reference)
+    thdn = np.sqrt(residual_power / reference)
+    return {
+        'fundamental': float(freqs[fundamental_bin]),
+        'fundamental_dbfs': db(2 * fundamental_power),
+        'thd_percent': float(100 * thd),
+        'thd_db': db(thd ** 2),
+        'thdn_percent': float(100 * thdn),
+        'thdn_db': db(thdn ** 2),
+        'snr_db': db(fundamental_power / noise_power),
+        'harmonics': [{'order': int(order), 'frequency': float(freqs[center]),
+                       'level_dbc': db(level / reference), 'level_dbfs': db(2 * level)}
+                      for order, center, level in zip(orders[1:], centers[1:], harmonics_power)],
+        'n_fft': n_fft,
+        'frames': n_frames,
+        'spectrum': (freqs, power)
+    }
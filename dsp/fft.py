@@ -0,0 +1,104 @@
+import numpy as np
+import scipy.fft
+from scipy.signal import get_window as scipy_get_window
+from collections import OrderedDict
+import threading
+
+# -------------> Wątki dla scipy.fft: -1 = wszystkie rdzenie
+DEFAULT_WORKERS = -1
+# -------------> Limit pamięci cache okien i osi częstotliwości (usuwane najdawniej używane)
+_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# -------------> Ramek STFT w jednej partii: ogranicza pamięć dla długich nagrań
+_STFT_BATCH_FRAMES = 1024
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def _cached(key, factory):
+    """Zwraca tablicę z cache (tylko do odczytu) albo tworzy ją i zapamiętuje, pilnując limitu pamięci."""
+    global _cache_bytes
+    with _cache_lock:
+        array = _cache.get(key)
+        if array is not None:
+            _cache.move_to_end(key)
+            return array
+
+    array = factory()
+    array.setflags(write=False)
+
+    with _cache_lock:
+        if key not in _cache:
+            _cache[key] = array
+            _cache_bytes += array.nbytes
+        while _cache_bytes > _CACHE_MAX_BYTES and len(_cache) > 1:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= evicted.nbytes
+    return array
+
+
+def clear_fft_cache():
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+
+def fast_length(n):
+    """Najmniejsza długość >= n, dla której rfft jest szybkie (iloczyn małych liczb pierwszych)."""
+    return scipy.fft.next_fast_len(int(n), real=True)
+
+
+def window(name, length, periodic=False, dtype=np.float32):
+    """
+    Okno z cache per (nazwa, długość, typ). Domyślnie symetryczne (jak np.hanning) - do analizy
+    pojedynczego bloku; periodic=True daje wariant do STFT/Welcha (jak scipy.signal.get_window).
+    """
+    key = ('window', name, int(length), bool(periodic), np.dtype(dtype).str)
+    return _cached(key, lambda: scipy_get_window(name, int(length), fftbins=periodic).astype(dtype))
+
+
+def rfft_frequencies(n_fft, fs):
+    """Oś częstotliwości rfft z cache per (n_fft, fs)."""
+    return _cached(('freqs', int(n_fft), float(fs)), lambda: np.fft.rfftfreq(int(n_fft), 1 / fs))
+
+
+def magnitude_spectrum(samples, fs, window_name='hann', workers=DEFAULT_WORKERS, dtype=np.float32):
+    """
+    Moduł widma całego bloku: okno z cache, dopełnienie zerami do fast_length (dowolna długość
+    nagrania nie trafia na wolne, "prawie pierwsze" rozmiary FFT) i rfft w pojedynczej precyzji
+    liczone przez scipy.fft na `workers` wątkach. Zwraca (częstotliwości, moduł).
+    """
+    n = len(samples)
+    n_fft = fast_length(n)
+    windowed = np.asarray(samples, dtype=dtype) * window(window_name, n, dtype=dtype)
+    spectrum = scipy.fft.rfft(windowed, n=n_fft, workers=workers)
+    return rfft_frequencies(n_fft, fs), np.abs(spectrum)
+
+
+def power_spectrogram(samples, fs, n_fft=1024, hop_length=512, window_name='hann', workers=DEFAULT_WORKERS,
+                      dtype=np.float32):
+    """
+    Spektrogram gęstości mocy o tej samej skali co matplotlib.mlab.specgram (okno symetryczne,
+    widmo jednostronne, podział przez fs * sum(okno^2)). Ramki są liczone partiami widoków
+    na próbki, więc pamięć pośrednia nie rośnie z długością nagrania.
+    Zwraca (częstotliwości, czasy środków ramek, moc [biny x ramki]).
+    """
+    samples = np.asarray(samples, dtype=dtype)
+    if len(samples) < n_fft:
+        # -------------> Krótki sygnał dopełniamy zerami do jednej ramki (jak mlab.specgram)
+        samples = np.pad(samples, (0, n_fft - len(samples)))
+    win = window(window_name, n_fft, dtype=dtype)
+    n_frames = max(0, (len(samples) - n_fft) // hop_length + 1)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, n_fft)[::hop_length][:n_frames]
+    power = np.empty((n_fft // 2 + 1, n_frames), dtype=dtype)
+    for start in range(0, n_frames, _STFT_BATCH_FRAMES):
+        spectrum = scipy.fft.rfft(frames[start:start + _STFT_BATCH_FRAMES] * win, axis=1, workers=workers)
+        power[:, start:start + _STFT_BATCH_FRAMES] = (spectrum.real ** 2 + spectrum.imag ** 2).T
+
+    power /= fs * np.sum(win.astype(np.float64) ** 2)
+    # -------------> Widmo jednostronne: podwajamy wszystko poza DC (i Nyquistem dla parzystej długości)
+    power[1:-1 if n_fft % 2 == 0 else None] *= 2
+    times = (np.arange(n_frames) * hop_length + n_fft / 2) / fs
+    return rfft_frequencies(n_fft, fs), times, power
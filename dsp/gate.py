@@ -0,0 +1,97 @@
+import numpy as np
+
+# -------------> Próg ciszy (dBFS RMS bloku), szerokość histerezy i czas podtrzymania przed zamknięciem bramki
+DEFAULT_THRESHOLD_DB = -60.0
+DEFAULT_HYSTERESIS_DB = 6.0
+DEFAULT_HOLD_SECONDS = 0.5
+DEFAULT_BLOCK_SIZE = 1024
+
+
+def block_levels_db(samples, block_size=DEFAULT_BLOCK_SIZE):
+    """Poziom RMS [dBFS] kolejnych pełnych bloków (wszystkie kanały razem), bez kopii sygnału."""
+    samples = np.asarray(samples)
+    frames = samples.reshape(len(samples), -1) if samples.ndim > 1 else samples[:, np.newaxis]
+    n_blocks = len(frames) // block_size
+    if n_blocks == 0:
+        return np.zeros(0)
+    blocks = frames[:n_blocks * block_size].reshape(n_blocks, -1)
+    power = np.einsum('ij,ij->i', blocks, blocks, dtype=np.float64) / blocks.shape[1]
+    return 10 * np.log10(power + 1e-20)
+
+
+class SilenceGate:
+    """
+    Bramka ciszy na energii bloków z histerezą: otwiera się od razu, gdy poziom bloku przekroczy
+    threshold_db + hysteresis_db, a zamyka dopiero po hold_seconds ciągłego poziomu poniżej
+    threshold_db. Poziomy pomiędzy progami nie zmieniają stanu - szum w okolicy progu nie przełącza
+    bramki w kółko. process() kosztuje jeden iloczyn skalarny na blok, więc może działać w callbacku audio.
+    """
+
+    def __init__(self, fs, threshold_db=DEFAULT_THRESHOLD_DB, hysteresis_db=DEFAULT_HYSTERESIS_DB,
+                 hold_seconds=DEFAULT_HOLD_SECONDS):
+        self.fs = fs
+        self.close_db = threshold_db
+        self.open_db = threshold_db + hysteresis_db
+        self.hold_frames = int(hold_seconds * fs)
+        self.is_open = True
+        self.level_db = None
+        self._below_frames = 0
+
+    def process(self, block):
+        """Aktualizuje stan blokiem próbek i zwraca True, gdy bramka jest otwarta (jest sygnał)."""
+        block = np.asarray(block)
+        if block.size == 0:
+            return self.is_open
+        flat = block.reshape(-1)
+        self.level_db = float(10 * np.log10(float(np.dot(flat, flat)) / flat.size + 1e-20))
+        if self.level_db > self.open_db:
+            self.is_open = True
+            self._below_frames = 0
+        elif self.level_db < self.close_db:
+            self._below_frames += len(block)
+            if self._below_frames >= self.hold_frames:
+                self.is_open = False
+        else:
+            self._below_frames = 0
+        return self.is_open
+
+    def reset(self):
+        self.is_open = True
+        self.level_db = None
+        self._below_frames = 0
+
+
+def silent_regions(samples, fs, threshold_db=DEFAULT_THRESHOLD_DB, hysteresis_db=DEFAULT_HYSTERESIS_DB,
+                   hold_seconds=DEFAULT_HOLD_SECONDS, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Fragmenty ciszy całego sygnału z tą samą histerezą co SilenceGate, liczone wektorowo na poziomach
+    bloków: stan bloku między progami jest przenoszony z ostatniego bloku poza nimi, a cisza krótsza
+    niż hold_seconds nie jest zaznaczana. Zwraca tablicę (N, 2) z początkami i końcami w sekundach.
+    """
+    levels = block_levels_db(samples, block_size)
+    if len(levels) == 0:
+        return np.zeros((0, 2))
+    # -------------> 1 = sygnał, 0 = cisza, -1 = pomiędzy progami (stan poprzedniego bloku; na początku sygnał)
+    state = np.where(levels > threshold_db + hysteresis_db, 1, np.where(levels < threshold_db, 0, -1))
+    decided = np.where(state >= 0, np.arange(len(state)), -1)
+    last_decided = np.maximum.accumulate(decided)
+    silent = np.where(last_decided >= 0, state[np.maximum(last_decided, 0)] == 0, False)
+
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    regions = np.stack([starts, stops], axis=1) * block_size / fs
+    if len(silent) * block_size < len(samples) and len(regions) and stops[-1] == len(silent):
+        # -------------> Niepełny ostatni blok należy do ciszy, która sięga końca sygnału
+        regions[-1, 1] = len(samples) / fs
+    return regions[regions[:, 1] - regions[:, 0] >= hold_seconds]
+
+
+def active_samples(samples, fs, regions):
+    """Sygnał bez fragmentów ciszy (regions w sekundach, jak z silent_regions) - sklejone fragmenty aktywne."""
+    if len(regions) == 0:
+        return samples
+    bounds = np.round(np.asarray(regions) * fs).astype(np.int64)
+    keep_starts = np.concatenate(([0], bounds[:, 1]))
+    keep_stops = np.concatenate((bounds[:, 0], [len(samples)]))
+    pieces = [samples[start:stop] for start, stop in zip(keep_starts, keep_stops) if stop > start]
+    return np.concatenate(pieces) if pieces else samples[:0]
@@ -0,0 +1,45 @@
+from .cqt import get_cqt_kernel, cqt_spectrum, cqt_spectrogram, cqt_frequencies
+from .loudness import LoudnessMeter, k_weighting_sos
+from .stats import RunningStats
+from .zoom import zoom_spectrum, interpolate_peak
+from .welch import welch_psd
+from .onsets import OnsetDetector, segment_boundaries
+from .distortion import coherent_frequency, averaged_power_spectrum, harmonic_analysis
+from .pipeline import AnalysisPipeline, Stage
+from .alignment import cross_correlation, find_offset, align, compare_signals
+from .gate import SilenceGate, silent_regions, active_samples, block_levels_db
+from .fft import fast_length, window, rfft_frequencies, magnitude_spectrum, power_spectrogram, clear_fft_cache
+
+__all__ = [
+    'get_cqt_kernel',
+    'cqt_spectrum',
+    'cqt_spectrogram',
+    'cqt_frequencies',
+    'LoudnessMeter',
+    'k_weighting_sos',
+    'RunningStats',
+    'zoom_spectrum',
+    'interpolate_peak',
+    'welch_psd',
+    'OnsetDetector',
+    'segment_boundaries',
+    'fast_length',
+    'window',
+    'rfft_frequencies',
+    'magnitude_spectrum',
+    'power_spectrogram',
+    'clear_fft_cache',
+    'coherent_frequency',
+    'averaged_power_spectrum',
+    'harmonic_analysis',
+    'cross_correlation',
+    'find_offset',
+    'align',
+    'compare_signals',
+    'SilenceGate',
+    'silent_regions',
+    'active_samples',
+    'block_levels_db',
+    'AnalysisPipeline',
+    'Stage'
+]
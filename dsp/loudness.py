@@ -0,0 +1,210 @@
+import numpy as np
+from scipy.signal import sosfilt, firwin, upfirdn
+from collections import deque
+
+# -------------> Stałe z ITU-R BS.1770-4 / EBU R128
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+SUBBLOCK_SECONDS = 0.1  # -------------> Krok 100 ms = 75% nakładania bloków 400 ms
+MOMENTARY_SUBBLOCKS = 4  # -------------> 400 ms
+SHORT_TERM_SUBBLOCKS = 30  # -------------> 3 s
+
+# -------------> Histogram bloków bramkowanych: stała pamięć niezależnie od długości sesji
+_HISTOGRAM_MIN = ABSOLUTE_GATE_LUFS
+_HISTOGRAM_MAX = 10.0
+_HISTOGRAM_STEP = 0.01
+
+
+def k_weighting_sos(fs):
+    """
+    Zwraca współczynniki filtru K (półka wysokotonowa + górnoprzepustowy) jako sekcje SOS
+    dla dowolnej częstotliwości próbkowania.
+    """
+    # -------------> Etap 1: półka wysokotonowa modelująca wpływ głowy
+    f0 = 1681.974450955533
+    gain_db = 3.999843853973347
+    q = 0.7071752369554196
+    k = np.tan(np.pi * f0 / fs)
+    vh = 10.0 ** (gain_db / 20.0)
+    vb = vh ** 0.4996667741545416
+    a0 = 1.0 + k / q + k * k
+    shelf = [(vh + vb * k / q + k * k) / a0, 2.0 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+             1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0]
+
+    # -------------> Etap 2: filtr górnoprzepustowy RLB
+    f0 = 38.13547087602444
+    q = 0.5003270373238773
+    k = np.tan(np.pi * f0 / fs)
+    a0 = 1.0 + k / q + k * k
+    highpass = [1.0, -2.0, 1.0, 1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0]
+
+    return np.array([shelf, highpass])
+
+
+def _channel_weights(channels):
+    # -------------> Dla 5.1 (L, R, C, LFE, Ls, Rs) kanał LFE jest pomijany, a tylne wzmacniane
+    if channels == 6:
+        return np.array([1.0, 1.0, 1.0, 0.0, 1.41, 1.41])
+    return np.ones(channels)
+
+
+def _power_to_lufs(power):
+    if power <= 0:
+        return float('-inf')
+    return -0.691 + 10.0 * np.log10(power)
+
+
+class LoudnessMeter:
+    """
+    Strumieniowy miernik głośności zgodny z BS.1770 (LUFS momentary/short-term/integrated, true peak).
+    Filtry K i interpolator true peak przechowują stan między blokami, więc koszt
+    wywołania process() zależy wyłącznie od liczby nowych próbek.
+    """
+
+    def __init__(self, fs, channels=1):
+        self.fs = fs
+        self.channels = channels
+        self.sos = k_weighting_sos(fs)
+        self.weights = _channel_weights(channels)
+        self.subblock_size = int(round(SUBBLOCK_SECONDS * fs))
+
+        # -------------> Nadpróbkowanie x4 poniżej 96 kHz, x2 do 192 kHz
+        self.oversample = 4 if fs < 96000 else (2 if fs < 192000 else 1)
+        if self.oversample > 1:
+            self._tp_filter = firwin(12 * self.oversample, 1.0 / self.oversample,
+                                     window=('kaiser', 5.0)) * self.oversample
+            self._tp_history_len = int(np.ceil(len(self._tp_filter) / self.oversample))
+        self.reset()
+
+    def reset(self):
+        """Zeruje stan filtrów i wszystkie pomiary."""
+        self._zi = np.zeros((self.sos.shape[0], 2, self.channels))
+        self._partial_sum = np.zeros(self.channels)
+        self._partial_count = 0
+        self._subblocks = deque(maxlen=SHORT_TERM_SUBBLOCKS)
+        n_bins = int(round((_HISTOGRAM_MAX - _HISTOGRAM_MIN) / _HISTOGRAM_STEP))
+        self._gate_counts = np.zeros(n_bins, dtype=np.int64)
+        self._gate_power = np.zeros(n_bins)
+        self._max_momentary = float('-inf')
+        self._true_peak = 0.0
+        if self.oversample > 1:
+            self._tp_history = np.zeros((self._tp_history_len, self.channels))
+        self.samples_processed = 0
+        self.samples_skipped = 0
+
+    def _as_2d(self, block):
+        block = np.asarray(block, dtype=np.float64)
+        if block.ndim == 1:
+            block = block[:, np.newaxis]
+        if block.shape[1] != self.channels:
+            raise ValueError(f"Oczekiwano {self.channels} kanałów, otrzymano {block.shape[1]}")
+        return block
+
+    def process(self, block):
+        """Przetwarza nowy blok próbek o kształcie (n,) lub (n, kanały)."""
+        block = self._as_2d(block)
+        n = block.shape[0]
+        if n == 0:
+            return
+        self.samples_processed += n
+
+        self._update_true_peak(block)
+
+        filtered, self._zi = sosfilt(self.sos, block, axis=0, zi=self._zi)
+        squared = filtered * filtered
+
+        pos = 0
+        while pos < n:
+            take = min(self.subblock_size - self._partial_count, n - pos)
+            self._partial_sum += squared[pos:pos + take].sum(axis=0)
+            self._partial_count += take
+            pos += take
+            if self._partial_count == self.subblock_size:
+                self._push_subblock(float(self._partial_sum @ self.weights) / self.subblock_size)
+                self._partial_sum[:] = 0.0
+                self._partial_count = 0
+
+    def skip(self, count):
+        """
+        Uwzględnia count próbek ciszy, których nie przekazano - jak blok zer. Zera są przetwarzane tylko
+        do wygaszenia okna krótkoterminowego (3 s), dalsze pod-bloki ciszy i tak nie zmieniają pomiarów
+        (nie przechodzą bramki absolutnej), więc koszt nie zależy od długości luki.
+        """
+        if count <= 0:
+            return
+        flush = min(count, (SHORT_TERM_SUBBLOCKS + 1) * self.subblock_size)
+        self.process(np.zeros((flush, self.channels)))
+        rest = count - flush
+        self.samples_processed += rest
+        self.samples_skipped += count
+        self._partial_count = (self._partial_count + rest) % self.subblock_size
+
+    def _push_subblock(self, power):
+        self._subblocks.append(power)
+        if len(self._subblocks) < MOMENTARY_SUBBLOCKS:
+            return
+
+        # -------------> Każdy nowy pod-blok zamyka kolejny blok 400 ms (krok 100 ms)
+        block_power = sum(list(self._subblocks)[-MOMENTARY_SUBBLOCKS:]) / MOMENTARY_SUBBLOCKS
+        loudness = _power_to_lufs(block_power)
+        self._max_momentary = max(self._max_momentary, loudness)
+        if loudness > ABSOLUTE_GATE_LUFS:
+            idx = min(int((loudness - _HISTOGRAM_MIN) / _HISTOGRAM_STEP), len(self._gate_counts) - 1)
+            self._gate_counts[idx] += 1
+            self._gate_power[idx] += block_power
+
+    def _update_true_peak(self, block):
+        if self.oversample == 1:
+            self._true_peak = max(self._true_peak, float(np.max(np.abs(block))))
+            return
+
+        extended = np.concatenate([self._tp_history, block], axis=0)
+        upsampled = upfirdn(self._tp_filter, extended, up=self.oversample, axis=0)
+        # -------------> Odrzucamy próbki zależne od historii sprzed poprzedniego bloku
+        start = self._tp_history_len * self.oversample
+        valid = upsampled[start:extended.shape[0] * self.oversample]
+        if valid.size:
+            self._true_peak = max(self._true_peak, float(np.max(np.abs(valid))))
+        self._tp_history = extended[-self._tp_history_len:]
+
+    @property
+    def momentary(self):
+        if len(self._subblocks) < MOMENTARY_SUBBLOCKS:
+            return float('-inf')
+        return _power_to_lufs(sum(list(self._subblocks)[-MOMENTARY_SUBBLOCKS:]) / MOMENTARY_SUBBLOCKS)
+
+    @property
+    def short_term(self):
+        # -------------> Przed upływem 3 s uśredniamy dostępne pod-bloki
+        if len(self._subblocks) < MOMENTARY_SUBBLOCKS:
+            return float('-inf')
+        return _power_to_lufs(sum(self._subblocks) / len(self._subblocks))
+
+    @property
+    def integrated(self):
+        """Głośność zintegrowana z bramkowaniem absolutnym i względnym (dokładność 0.01 LU)."""
+        total_count = self._gate_counts.sum()
+        if total_count == 0:
+            return float('-inf')
+        relative_gate = _power_to_lufs(self._gate_power.sum() / total_count) + RELATIVE_GATE_LU
+        first_bin = max(0, int(np.floor((relative_gate - _HISTOGRAM_MIN) / _HISTOGRAM_STEP)))
+        count = self._gate_counts[first_bin:].sum()
+        if count == 0:
+            return float('-inf')
+        return _power_to_lufs(self._gate_power[first_bin:].sum() / count)
+
+    @property
+    def true_peak_db(self):
+        if self._true_peak <= 0:
+            return float('-inf')
+        return 20.0 * np.log10(self._true_peak)
+
+    def get_results(self):
+        """Zwraca słownik z bieżącymi pomiarami."""
+        return {
+            'lufs_momentary': self.momentary,
+            'lufs_short_term': self.short_term,
+            'lufs_integrated': self.integrated,
+            'lufs_max_momentary': self._max_momentary,
+            'true_peak_db': self.true_peak_db
+        }
@@ -0,0 +1,105 @@
+import numpy as np
+from bisect import bisect_left
+
+
+class OnsetDetector:
+    """
+    Strumieniowy detektor onsetów (początków dźwięków i transjentów) oparty na strumieniu widmowym
+    (spectral flux): średnim dodatnim przyroście logarytmicznego widma między kolejnymi ramkami STFT.
+    Próg jest adaptacyjny - średnia strumienia z poprzednich threshold_seconds pomnożona przez ratio
+    plus delta - a onset to lokalne maksimum ponad progiem, nie bliżej niż min_gap od poprzedniego.
+    process() przyjmuje tylko nowe próbki; liczone są wyłącznie nowe ramki.
+    """
+
+    def __init__(self, fs, n_fft=1024, hop_length=512, threshold_seconds=0.5, ratio=1.5, delta=0.02,
+                 min_gap=0.05, compression=100.0):
+        self.fs = fs
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.ratio = ratio
+        self.delta = delta
+        self.compression = compression
+        self.window = np.hanning(n_fft)
+        self.threshold_frames = max(1, int(threshold_seconds * fs / hop_length))
+        self.min_gap_frames = max(1, int(round(min_gap * fs / hop_length)))
+
+        self.onsets = []  # -------------> Czasy onsetów w sekundach od początku strumienia
+        self.frames_processed = 0
+        self._buffer = np.zeros(0)
+        self._previous = None
+        # -------------> Ostatnie wartości strumienia: historia do progu + jedna ramka czekająca na następną.
+        # -------------> Na starcie to wirtualna ramka -1 (cisza), więc dźwięk od pierwszej próbki też jest onsetem.
+        self._flux = np.zeros(1)
+        self._last_onset_frame = -self.min_gap_frames
+
+    def frame_time(self, frame):
+        """Czas środka ramki STFT o danym numerze (w sekundach od początku strumienia)."""
+        return (frame * self.hop_length + self.n_fft / 2) / self.fs
+
+    def process(self, samples):
+        """Przetwarza nowe próbki (mono lub wielokanałowe). Zwraca listę nowo wykrytych onsetów [s]."""
+        mono = samples.mean(axis=1) if samples.ndim > 1 else samples
+        buffer = np.concatenate([self._buffer, mono])
+        n_frames = max(0, (len(buffer) - self.n_fft) // self.hop_length + 1)
+        self._buffer = buffer[n_frames * self.hop_length:]
+        if n_frames == 0:
+            return []
+
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop_length][:n_frames]
+        spectrum = np.log1p(self.compression * np.abs(np.fft.rfft(frames * self.window, axis=1))
+                            * (2.0 / self.window.sum()))
+        previous = np.zeros((1, spectrum.shape[1])) if self._previous is None else self._previous[np.newaxis]
+        flux = np.maximum(np.diff(np.vstack([previous, spectrum]), axis=0), 0.0).mean(axis=1)
+        self._previous = spectrum[-1]
+
+        values = np.concatenate([self._flux, flux])
+        first_frame = self.frames_processed - len(self._flux)
+        self.frames_processed += n_frames
+
+        # -------------> Średnia krocząca z poprzednich threshold_frames ramek (przyczynowa) przez cumsum
+        cumulative = np.concatenate([[0.0], np.cumsum(values)])
+        index = np.arange(len(values))
+        start = np.maximum(index - self.threshold_frames, 0)
+        counts = np.maximum(index - start, 1)
+        threshold = (cumulative[index] - cumulative[start]) / counts * self.ratio + self.delta
+
+        # -------------> Kandydaci: ramki, które mają już następnika (ostatnia czeka do kolejnego wywołania)
+        candidates = index[len(self._flux) - 1:-1]
+        candidates = candidates[candidates > 0]
+        peaks = candidates[(values[candidates] > values[candidates - 1])
+                           & (values[candidates] >= values[candidates + 1])
+                           & (values[candidates] > threshold[candidates])]
+
+        detected = []
+        for peak in peaks:
+            frame = first_frame + peak
+            if frame - self._last_onset_frame >= self.min_gap_frames:
+                self._last_onset_frame = frame
+                detected.append(float(self.frame_time(frame)))
+        self.onsets.extend(detected)
+        self._flux = values[-(self.threshold_frames + 1):]
+        return detected
+
+    def skip(self, count):
+        """
+        Uwzględnia count próbek ciszy, których nie przekazano - jak blok zer, ale bez tworzenia tablicy
+        długości count. Zera są przetwarzane tylko do wygaszenia historii progu, dalej przesuwany jest
+        tylko zegar ramek, więc czasy kolejnych onsetów pozostają liczone od początku strumienia.
+        """
+        if count <= 0:
+            return
+        flush = min(count, self.n_fft + self.hop_length * (self.threshold_frames + 2))
+        self.process(np.zeros(flush))
+        rest = count - flush
+        self.frames_processed += rest // self.hop_length
+        self._buffer = np.concatenate([self._buffer, np.zeros(rest % self.hop_length)])
+
+    def onsets_between(self, start, end):
+        """Onsety z przedziału [start, end) sekund."""
+        return self.onsets[bisect_left(self.onsets, start):bisect_left(self.onsets, end)]
+
+
+def segment_boundaries(onsets, duration):
+    """Dzieli nagranie o długości duration na segmenty [(początek, koniec)] zaczynające się na onsetach."""
+    starts = [0.0] + [t for t in onsets if 0.0 < t < duration]
+    return [(start, end) for start, end in zip(starts, starts[1:] + [duration]) if end > start]
@@ -0,0 +1,99 @@
+import time
+
+
+class Stage:
+    """
+    Etap potoku analizy: funkcja przyjmująca wartości wejść jako argumenty nazwane
+    i zwracająca słownik z wartościami wszystkich zadeklarowanych wyjść.
+    """
+
+    def __init__(self, name, inputs, outputs, function):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.function = function
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, {self.inputs} -> {self.outputs})"
+
+
+class AnalysisPipeline:
+    """
+    Graf etapów z zadeklarowanymi wejściami i wyjściami (np. próbki -> widmo -> wysokość dźwięku).
+    run() wykonuje tylko etapy potrzebne do żądanych wyjść - każdy najwyżej raz, więc wyniki
+    pośrednie (np. widmo dla wysokości dźwięku i dla dB) są współdzielone. Plan dla danego zestawu
+    wyjść jest zapamiętywany, a czas każdego etapu uśredniany (EMA) do podglądu kosztów.
+    """
+
+    def __init__(self, stages, smoothing=0.2):
+        self.stages = list(stages)
+        self.smoothing = smoothing
+        self._producers = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in self._producers:
+                    raise ValueError(f"Wyjście '{output}' produkują etapy '{self._producers[output].name}' "
+                                     f"i '{stage.name}'")
+                self._producers[output] = stage
+        self._plans = {}
+        self.costs = {}  # -------------> nazwa etapu -> {'last_ms', 'mean_ms', 'runs'}
+
+    def outputs(self):
+        return list(self._producers)
+
+    def plan(self, outputs, available=()):
+        """Etapy potrzebne do wyliczenia outputs z wartości available, w kolejności wykonania."""
+        key = (frozenset(outputs), frozenset(available))
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = []
+            visiting = set()
+
+            def require(name):
+                if name in available:
+                    return
+                stage = self._producers.get(name)
+                if stage is None:
+                    raise KeyError(f"Nieznana wartość potoku: '{name}'")
+                if stage in plan:
+                    return
+                if stage.name in visiting:
+                    raise ValueError(f"Cykl w potoku przy etapie '{stage.name}'")
+                visiting.add(stage.name)
+                for dependency in stage.inputs:
+                    require(dependency)
+                visiting.discard(stage.name)
+                plan.append(stage)
+
+            for name in outputs:
+                require(name)
+            self._plans[key] = plan
+        return plan
+
+    def run(self, context, outputs):
+        """
+        Uzupełnia słownik context (wartości wejściowe) o wyjścia etapów potrzebnych do outputs
+        i zwraca go. Wartości pośrednie zostają w słowniku.
+        """
+        for stage in self.plan(outputs, context.keys()):
+            started = time.perf_counter()
+            produced = stage.function(**{name: context[name] for name in stage.inputs})
+            self._record_cost(stage.name, time.perf_counter() - started)
+            context.update(produced)
+        return context
+
+    def _record_cost(self, name, seconds):
+        milliseconds = 1000 * seconds
+        cost = self.costs.get(name)
+        if cost is None:
+            self.costs[name] = {'last_ms': milliseconds, 'mean_ms': milliseconds, 'runs': 1}
+        else:
+            cost['last_ms'] = milliseconds
+            cost['mean_ms'] += self.smoothing * (milliseconds - cost['mean_ms'])
+            cost['runs'] += 1
+
+    def cost_report(self):
+        """Linie 'etap: średnio X ms (ostatnio Y ms, N uruchomień)' w kolejności etapów."""
+        return [f"{stage.name}: {self.costs[stage.name]['mean_ms']:.2f} ms "
+                f"(ostatnio {self.costs[stage.name]['last_ms']:.2f} ms, {self.costs[stage.name]['runs']}×)"
+                for stage in self.stages if stage.name in self.costs]
@@ -0,0 +1,126 @@
+import numpy as np
+from collections import deque
+
+
+class RunningStats:
+    """
+    Akumulator statystyk sygnału aktualizowany wyłącznie nowymi blokami próbek.
+    Liczy RMS, peak, składową stałą (DC) i liczbę przesterowanych próbek
+    dla całego nagrania oraz dla przesuwnego okna o zadanej długości.
+    """
+
+    def __init__(self, fs, window_seconds=0.3, clip_threshold=0.999):
+        self.fs = fs
+        self.window_size = max(1, int(round(window_seconds * fs)))
+        self.clip_threshold = clip_threshold
+        self.reset()
+
+    def reset(self):
+        """Zeruje statystyki całego nagrania i okna."""
+        self.count = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self.peak = 0.0
+        self.clip_count = 0
+        self.skipped = 0  # -------------> Próbki pominięte przez skip() (luki w strumieniu)
+
+        # -------------> Okno: bloki (próbki, suma, suma kwadratów, peak) + sumy bieżące
+        self._window_blocks = deque()
+        self._window_count = 0
+        self._window_sum = 0.0
+        self._window_sum_sq = 0.0
+
+    def update(self, block):
+        """Dodaje nowy blok o kształcie (n,) lub (n, kanały). Kanały są uśredniane do mono."""
+        block = np.asarray(block)
+        if block.size == 0:
+            return
+        # -------------> Przester liczymy na kanałach, pozostałe statystyki na sygnale mono
+        self.clip_count += int(np.count_nonzero(np.abs(block) >= self.clip_threshold))
+        mono = block.mean(axis=1) if block.ndim > 1 else block
+        mono = mono.astype(np.float64, copy=False)
+
+        block_sum = float(mono.sum())
+        block_sum_sq = float(np.dot(mono, mono))
+        block_peak = float(np.max(np.abs(mono)))
+        self.count += mono.size
+        self._sum += block_sum
+        self._sum_sq += block_sum_sq
+        self.peak = max(self.peak, block_peak)
+
+        self._update_window(mono, block_sum, block_sum_sq, block_peak)
+
+    def skip(self, count):
+        """
+        Uwzględnia count próbek ciszy, których nie przekazano (np. wstrzymana analiza w ciszy) - jak blok
+        zer: liczą się do długości nagrania i wypełniają okno, bez tworzenia tablicy długości count.
+        """
+        if count <= 0:
+            return
+        self.count += count
+        self.skipped += count
+        self._update_window(np.zeros(min(count, self.window_size)), 0.0, 0.0, 0.0)
+
+    def _update_window(self, mono, block_sum, block_sum_sq, block_peak):
+        if mono.size >= self.window_size:
+            # -------------> Blok dłuższy niż okno zastępuje całą historię
+            tail = mono[-self.window_size:]
+            self._window_blocks.clear()
+            self._window_blocks.append((tail, float(tail.sum()), float(np.dot(tail, tail)),
+                                        float(np.max(np.abs(tail)))))
+            self._window_count = tail.size
+            self._window_sum = self._window_blocks[0][1]
+            self._window_sum_sq = self._window_blocks[0][2]
+            return
+
+        self._window_blocks.append((mono, block_sum, block_sum_sq, block_peak))
+        self._window_count += mono.size
+        self._window_sum += block_sum
+        self._window_sum_sq += block_sum_sq
+
+        # -------------> Usuwamy bloki, które w całości wypadły z okna
+        while self._window_count - self._window_blocks[0][0].size >= self.window_size:
+            samples, s, s_sq, _ = self._window_blocks.popleft()
+            self._window_count -= samples.size
+            self._window_sum -= s
+            self._window_sum_sq -= s_sq
+
+    def _window_values(self):
+        if not self._window_blocks:
+            return 0, 0.0, 0.0, 0.0
+        # -------------> Najstarszy blok może wystawać poza okno - odcinamy nadmiar
+        excess = self._window_count - self.window_size
+        oldest = self._window_blocks[0][0]
+        count, total, total_sq = self._window_count, self._window_sum, self._window_sum_sq
+        if excess > 0:
+            head = oldest[:excess]
+            count -= excess
+            total -= float(head.sum())
+            total_sq -= float(np.dot(head, head))
+            oldest_peak = float(np.max(np.abs(oldest[excess:])))
+        else:
+            oldest_peak = self._window_blocks[0][3]
+        peak = max([oldest_peak] + [block[3] for block in list(self._window_blocks)[1:]])
+        return count, total, max(total_sq, 0.0), peak
+
+    @property
+    def rms(self):
+        return float(np.sqrt(self._sum_sq / self.count)) if self.count else 0.0
+
+    @property
+    def dc_offset(self):
+        return self._sum / self.count if self.count else 0.0
+
+    def get_results(self):
+        """Zwraca słownik ze statystykami całego nagrania i okna przesuwnego."""
+        count, total, total_sq, peak = self._window_values()
+        return {
+            'rms': self.rms,
+            'peak': self.peak,
+            'dc_offset': self.dc_offset,
+            'clip_count': self.clip_count,
+            'samples': self.count,
+            'window_rms': float(np.sqrt(total_sq / count)) if count else 0.0,
+            'window_peak': peak,
+            'window_dc_offset': total / count if count else 0.0
+        }
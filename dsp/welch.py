@@ -0,0 +1,45 @@
+import numpy as np
+import scipy.fft
+from numpy.lib.stride_tricks import sliding_window_view
+
+from dsp.fft import window as cached_window, rfft_frequencies
+
+DEFAULT_SEGMENT_LENGTH = 4096
+DEFAULT_OVERLAP = 0.5
+# -------------> Segmentów w jednej partii: 256 x 4096 próbek float64 = 8 MB na partię
+DEFAULT_BATCH_SEGMENTS = 256
+
+
+def welch_psd(samples, fs, segment_length=DEFAULT_SEGMENT_LENGTH, overlap=DEFAULT_OVERLAP,
+              window='hann', batch_segments=DEFAULT_BATCH_SEGMENTS, workers=-1):
+    """
+    Jednostronna gęstość widmowa mocy metodą Welcha (jak scipy.signal.welch z detrend='constant').
+    Segmenty są przetwarzane partiami po batch_segments: każda partia to widok na próbki
+    bez kopiowania całego sygnału, a jej FFT liczy scipy.fft równolegle na `workers` wątkach.
+    Pamięć zależy od rozmiaru partii, nie od długości pliku.
+    Zwraca (częstotliwości, PSD w jednostkach^2/Hz).
+    """
+    samples = np.asarray(samples)
+    segment_length = int(min(segment_length, len(samples)))
+    if segment_length < 2:
+        return np.array([]), np.array([])
+    step = max(1, int(round(segment_length * (1.0 - overlap))))
+    win = cached_window(window, segment_length, periodic=True, dtype=np.float64)
+
+    segments = sliding_window_view(samples, segment_length)[::step]
+    power = np.zeros(segment_length // 2 + 1)
+    for start in range(0, len(segments), batch_segments):
+        batch = segments[start:start + batch_segments].astype(np.float64)
+        batch -= batch.mean(axis=1, keepdims=True)
+        batch *= win
+        spectrum = scipy.fft.rfft(batch, axis=1, workers=workers)
+        power += np.sum(spectrum.real ** 2 + spectrum.imag ** 2, axis=0)
+
+    psd = power / (len(segments) * fs * np.sum(win ** 2))
+    # -------------> Widmo jednostronne: podwajamy wszystko poza DC (i Nyquistem dla parzystej długości)
+    if segment_length % 2:
+        psd[1:] *= 2
+    else:
+        psd[1:-1] *= 2
+    freqs = rfft_frequencies(segment_length, fs)
+    return freqs, psd
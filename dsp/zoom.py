@@ -0,0 +1,65 @@
+import numpy as np
+from scipy.signal import firwin, upfirdn
+from functools import lru_cache
+
+DEFAULT_MAX_FFT = 8192
+MIN_FFT = 16
+
+
+@lru_cache(maxsize=16)
+def _decimation_filter(decimation, taps_per_phase=8):
+    # -------------> Filtr antyaliasingowy dla pasma zespolonego o szerokości fs / decimation
+    return firwin(taps_per_phase * decimation + 1, 1.0 / decimation)
+
+
+def interpolate_peak(freqs, magnitude, index):
+    """Doprecyzowuje położenie maksimum parabolą przez trzy sąsiednie biny (w skali log)."""
+    if index <= 0 or index >= len(magnitude) - 1:
+        return freqs[index]
+    alpha, beta, gamma = np.log(magnitude[index - 1:index + 2] + 1e-20)
+    denominator = alpha - 2 * beta + gamma
+    if denominator == 0:
+        return freqs[index]
+    offset = 0.5 * (alpha - gamma) / denominator
+    return freqs[index] + offset * (freqs[1] - freqs[0])
+
+
+def zoom_spectrum(samples, fs, center, span, max_fft=DEFAULT_MAX_FFT):
+    """
+    Zoom-FFT: widmo pasma [center - span/2, center + span/2] o wysokiej rozdzielczości.
+    Sygnał jest przesuwany do zera (mnożenie przez zespoloną sinusoidę), decymowany filtrem
+    polifazowym i transformowany małą FFT. Używa najnowszych próbek sygnału.
+    Zwraca (częstotliwości, amplitudy) - sinus o amplitudzie A daje wartość A.
+    """
+    samples = np.asarray(samples)
+    span = min(float(span), fs / 2)
+    decimation = max(1, int(fs / (1.25 * span)))
+    fir = _decimation_filter(decimation)
+
+    # -------------> Najdłuższa FFT (potęga dwójki), dla której wystarczy próbek
+    available = (len(samples) - len(fir)) // decimation
+    if available < MIN_FFT:
+        return np.array([]), np.array([])
+    n_fft = min(max_fft, 2 ** int(np.log2(available)))
+
+    needed = n_fft * decimation + len(fir)
+    segment = samples[-needed:].astype(np.float64)
+    n = np.arange(len(samples) - needed, len(samples))
+    mixed = segment * np.exp(-2j * np.pi * center * n / fs)
+
+    # -------------> upfirdn liczy tylko próbki wyjściowe po decymacji (struktura polifazowa)
+    decimated = upfirdn(fir, mixed, down=decimation)
+    # -------------> Pomijamy stan przejściowy filtra na początku
+    skip = len(fir) // decimation + 1
+    decimated = decimated[skip:skip + n_fft]
+    if len(decimated) < n_fft:
+        n_fft = 2 ** int(np.log2(len(decimated)))
+        decimated = decimated[-n_fft:]
+
+    window = np.hanning(n_fft)
+    spectrum = np.fft.fftshift(np.fft.fft(decimated * window))
+    freqs = center + np.fft.fftshift(np.fft.fftfreq(n_fft, decimation / fs))
+    magnitude = 2.0 * np.abs(spectrum) / window.sum()
+
+    in_band = np.abs(freqs - center) <= span / 2
+    return freqs[in_band], magnitude[in_band]
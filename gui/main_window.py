@@ -1,24 +1,44 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QSlider, QLabel,
     QComboBox, QFileDialog, QMessageBox, QProgressBar, QGroupBox,
-    QDialog, QLineEdit
+    QDialog, QLineEdit, QCheckBox, QListWidget, QListWidgetItem
 )
-from PySide6.QtCore import Qt, QTimer, Signal, QThread, Slot
-from PySide6.QtGui import QFont, QIcon, QIntValidator
+from PySide6.QtCore import Qt, QTimer, Signal, QThread, Slot, QEvent
+from PySide6.QtGui import QFont, QIcon, QIntValidator, QDoubleValidator
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
 from collections import deque
+from datetime import datetime
 import numpy as np
-import sounddevice as sd
 import traceback
+import time
 import os
 
 from audio.recorder import AudioRecorder
+from audio.segments import SegmentWriter, BackgroundSegmentWriter
+from audio.generator import ToneGenerator
 from audio.saver import save_wav, validate_filename, get_supported_formats
-from audio.loader import load_wav
-from plots.plot_utils import plot_time_domain, plot_frequency_domain, setup_plot_style, plot_spectrogram
-from threads.worker import AnalysisWorker
+from audio.loader import load_wav, read_wav_metadata
+from plots.plot_utils import (plot_time_domain, plot_frequency_domain, setup_plot_style, plot_spectrogram,
+                              compute_spectrogram, plot_envelope, plot_distortion,
+                              plot_comparison)
+from storage.cache import AnalysisCache, analysis_cache_entry
+from gui.scheduler import FrameScheduler
+from threads.worker import AnalysisWorker, TIME_VIEW_OUTPUTS, SPECTRUM_VIEW_OUTPUTS, ALL_OUTPUTS
+from threads.export import ExportWorker
+from threads.loader import FileLoadWorker
+from threads.measurement import MeasurementWorker
+from threads.comparison import ComparisonWorker
+from threads.queue import (FileQueue, STATUS_LABELS, STATUS_LOADING, STATUS_DONE, STATUS_CACHED, STATUS_FAILED,
+                           STATUS_CANCELLED)
+from plots.export import render_analysis, render_spectrogram, export_batch
+from storage.export import AnalysisExportWriter, export_analysis, DEFAULT_EXPORT_DIR
+from storage.stream import SpectrumServer, port_from_environment
+from dsp.gate import SilenceGate, DEFAULT_THRESHOLD_DB
+from audio.measurement import sweep_frequencies
+from storage.memory import (MemoryBudget, AllocationTracer, array_bytes, budget_from_environment, TRACEMALLOC_ENV,
+                            DEFAULT_SPILL_DIR)
 
 import resources_rc
 
@@ -27,7 +47,17 @@ class LiveAudioAnalyzer(QWidget):
     recording_started = Signal()
     recording_stopped = Signal()
     error_occurred = Signal(str)
-    analysis_trigger = Signal(np.ndarray, int)
+    analysis_trigger = Signal(np.ndarray, int, object)  # -------------> object: pozycja przekracza 2^31 po ~13.5 h
+    analysis_settings_changed = Signal(dict)
+    analysis_reset = Signal()
+    export_requested = Signal(object)
+    export_writer_changed = Signal(object)
+    stream_server_changed = Signal(object)
+    subscription_changed = Signal(str, object)
+    file_load_requested = Signal(int, str)
+    spill_requested = Signal(object, str)
+    measurement_requested = Signal(object)
+    comparison_requested = Signal(object)
 
     def __init__(self):
         super().__init__()
@@ -40,15 +70,92 @@ class LiveAudioAnalyzer(QWidget):
         self.worker = AnalysisWorker()
         self.worker.moveToThread(self.thread)
         self.analysis_trigger.connect(self.worker.run_analysis)
+        self.analysis_settings_changed.connect(self.worker.update_settings)
+        self.analysis_reset.connect(self.worker.reset_stream)
+        self.export_writer_changed.connect(self.worker.set_export_writer)
+        self.stream_server_changed.connect(self.worker.set_stream_server)
+        self.subscription_changed.connect(self.worker.set_subscription)
+        self.stream_server = None
         self.worker.results_ready.connect(self.update_plots_from_results)
         self.thread.start()
 
+        # -------------> Osobny wątek eksportu - zapis wykresów nie blokuje GUI ani analizy
+        self.export_thread = QThread()
+        self.export_worker = ExportWorker()
+        self.export_worker.moveToThread(self.export_thread)
+        self.export_requested.connect(self.export_worker.run_job)
+        self.export_worker.progress.connect(self.on_export_progress)
+        self.export_worker.finished.connect(self.on_export_finished)
+        self.export_worker.failed.connect(self.on_export_failed)
+        self.export_thread.start()
+
+        # -------------> Wczytywanie plików w tle: podgląd od razu, pełne próbki po zdekodowaniu
+        self.loader_thread = QThread()
+        self.file_loader = FileLoadWorker()
+        self.file_load_generation = 0  # -------------> Numer bieżącego zlecenia wczytania pliku
+        self.file_loader.moveToThread(self.loader_thread)
+        self.file_load_requested.connect(self.file_loader.load)
+        self.file_loader.overview_ready.connect(self.on_file_overview)
+        self.file_loader.loaded.connect(self.on_file_loaded)
+        self.file_loader.failed.connect(self.on_file_load_failed)
+        self.file_loader.cancelled.connect(self.on_file_load_cancelled)
+        self.spill_requested.connect(self.file_loader.spill)
+        self.file_loader.spilled.connect(self.on_samples_spilled)
+        self.loader_thread.start()
+
+        # -------------> Pomiar THD+N: generator gra bodziec, wejście jest nagrywane i analizowane w tle
+        self.measurement_thread = QThread()
+        self.measurement_worker = MeasurementWorker()
+        self.measurement_worker.moveToThread(self.measurement_thread)
+        self.measurement_requested.connect(self.measurement_worker.run)
+        self.measurement_worker.progress.connect(self.on_measurement_progress)
+        self.measurement_worker.finished.connect(self.on_measurement_finished)
+        self.measurement_worker.failed.connect(self.on_measurement_failed)
+        self.measurement_thread.start()
+        self.measuring = False
+
+        # -------------> Porównanie aktywnego pliku z innym (wyrównanie korelacją wzajemną) w tle
+        self.comparison_thread = QThread()
+        self.comparison_worker = ComparisonWorker()
+        self.comparison_worker.moveToThread(self.comparison_thread)
+        self.comparison_requested.connect(self.comparison_worker.run)
+        self.comparison_worker.finished.connect(self.on_comparison_finished)
+        self.comparison_worker.failed.connect(self.on_comparison_failed)
+        self.comparison_thread.start()
+        self.comparison = None
+
         self.duration = 5
         self.is_recording = False
         self.last_samples = np.array([])
         self.input_devices = []
         self.current_fs = 44100
         self.app_mode = 'live'
+        self.spectrum_mode = 'fft'
+        # -------------> Pasmo trybu zoom: środek i szerokość w Hz
+        self.zoom_center = 440.0
+        self.zoom_span = 100.0
+        self.continuous_mode = False
+        self.segment_directory = os.path.join(os.path.expanduser("~"), "AudioAnalyzer", "segments")
+        # -------------> Aktywny plik i wyniki z cache (próbki wczytujemy dopiero, gdy są potrzebne)
+        self.current_file = None
+        self.current_metadata = None
+        self.cached_results = None
+        self.last_results = None
+        # -------------> Widoki zapisują się na potrzebne wyniki - worker liczy tylko te etapy
+        self.views_visible = None
+        self._set_views_visible(True)
+        self.input_silent = False
+
+        try:
+            self.analysis_cache = AnalysisCache()
+        except Exception as e:
+            print(f"Cache analizy niedostępny: {e}")
+            self.analysis_cache = None
+        # -------------> Wiele plików naraz: wczytywanie i analiza w puli, wyniki w cache
+        self.file_queue = FileQueue(self.analysis_cache)
+        self.file_queue.status_changed.connect(self.on_queue_status)
+        self.queue_items = {}
+        self.queue_statuses = {}
 
         try:
             self.recorder = AudioRecorder()
@@ -58,18 +165,25 @@ class LiveAudioAnalyzer(QWidget):
             QMessageBox.critical(self, "Błąd inicjalizacji", f"Nie można zainicjować nagrywania audio:\n{str(e)}")
             self.recorder = None
 
+        self.tone_generator = ToneGenerator()
+
         setup_plot_style()
         self.init_ui()
         self.recording_started.connect(self.on_recording_started)
         self.recording_stopped.connect(self.on_recording_stopped)
         self.error_occurred.connect(self.on_error)
         self._populate_device_list()
+        self.init_memory_budget()
         self.update_ui_for_mode()
 
     def _populate_device_list(self):
+        if not self.recorder:
+            self.device_combo.addItem("Brak mikrofonów")
+            self.device_combo.setEnabled(False)
+            return
+        backend = self.recorder.backend
         try:
-            devices = sd.query_devices()
-            self.input_devices = [dev for dev in devices if dev['max_input_channels'] > 0]
+            self.input_devices = backend.query_input_devices()
             self.device_combo.clear()
             if not self.input_devices:
                 self.device_combo.addItem("Brak mikrofonów")
@@ -78,7 +192,7 @@ class LiveAudioAnalyzer(QWidget):
                 return
             for device in self.input_devices: self.device_combo.addItem(device['name'])
             try:
-                default_device_name = sd.query_devices(kind='input')['name']
+                default_device_name = backend.default_input_device_name()
                 self.device_combo.setCurrentText(default_device_name)
             except Exception:
                 pass
@@ -110,6 +224,24 @@ class LiveAudioAnalyzer(QWidget):
         self.loaded_file_label = QLabel("Aktywne źródło: Mikrofon")
         self.loaded_file_label.setWordWrap(True)
         source_layout.addWidget(self.loaded_file_label)
+        self.cancel_load_button = QPushButton("✖ Anuluj wczytywanie")
+        self.cancel_load_button.clicked.connect(lambda: self.file_loader.cancel())
+        self.cancel_load_button.setVisible(False)
+        source_layout.addWidget(self.cancel_load_button)
+        self.compare_button = QPushButton("⚖️ Porównaj z plikiem...")
+        self.compare_button.setToolTip("Wyrównuje wybrany plik do aktywnego (korelacja wzajemna) i pokazuje "
+                                       "przesunięcie, różnice poziomów, sygnał różnicowy i różnicę widm")
+        self.compare_button.clicked.connect(self.compare_with_file)
+        self.compare_button.setEnabled(False)
+        source_layout.addWidget(self.compare_button)
+        self.queue_label = QLabel("Kolejka plików:")
+        source_layout.addWidget(self.queue_label)
+        self.queue_list = QListWidget()
+        self.queue_list.setMaximumHeight(150)
+        self.queue_list.itemClicked.connect(self.on_queue_item_clicked)
+        source_layout.addWidget(self.queue_list)
+        for widget in [self.queue_label, self.queue_list]:
+            widget.setVisible(False)
         self.file_info_duration_label = QLabel()
         self.file_info_samplerate_label = QLabel()
         self.file_info_channels_label = QLabel()
@@ -126,11 +258,87 @@ class LiveAudioAnalyzer(QWidget):
         self.tone_freq_input = QLineEdit("440")
         self.tone_freq_input.setValidator(QIntValidator(20, 20000))
         freq_layout.addWidget(self.tone_freq_input)
+        self.tone_freq_input.textChanged.connect(self.update_tone_frequency)
         tone_layout.addLayout(freq_layout)
+        self.tone_waveform_combo = QComboBox()
+        self.tone_waveform_combo.addItem("Sinus", 'sine')
+        self.tone_waveform_combo.addItem("Sweep 20 Hz - 20 kHz", 'sweep')
+        self.tone_waveform_combo.addItem("Szum biały", 'white')
+        self.tone_waveform_combo.addItem("Szum różowy", 'pink')
+        self.tone_waveform_combo.currentIndexChanged.connect(self.update_tone_waveform)
+        tone_layout.addWidget(self.tone_waveform_combo)
+        self.tone_analyze_checkbox = QCheckBox("Analizuj generowany sygnał")
+        self.tone_analyze_checkbox.setChecked(True)
+        tone_layout.addWidget(self.tone_analyze_checkbox)
         self.play_tone_button = QPushButton("🔊 Odtwórz i analizuj ton")
         self.play_tone_button.clicked.connect(self.play_test_tone)
         tone_layout.addWidget(self.play_tone_button)
+        self.measure_sweep_checkbox = QCheckBox("Sweep 20 Hz - 20 kHz (24 punkty)")
+        tone_layout.addWidget(self.measure_sweep_checkbox)
+        self.measure_button = QPushButton("📏 Pomiar THD+N")
+        self.measure_button.setToolTip("Gra ton generatorem, nagrywa wybrane wejście i mierzy THD, THD+N, SNR "
+                                       "oraz poziomy harmonicznych")
+        self.measure_button.clicked.connect(self.start_measurement)
+        tone_layout.addWidget(self.measure_button)
         control_layout.addWidget(tone_group)
+        analysis_group = QGroupBox("Analiza")
+        analysis_layout = QVBoxLayout(analysis_group)
+        analysis_layout.addWidget(QLabel("Tryb widma:"))
+        self.spectrum_mode_combo = QComboBox()
+        self.spectrum_mode_combo.addItem("FFT (liniowe)", 'fft')
+        self.spectrum_mode_combo.addItem("CQT (półtony)", 'cqt')
+        self.spectrum_mode_combo.addItem("Zoom (pasmo)", 'zoom')
+        self.spectrum_mode_combo.addItem("PSD Welch (uśrednione)", 'welch')
+        self.spectrum_mode_combo.currentIndexChanged.connect(self.update_spectrum_mode)
+        analysis_layout.addWidget(self.spectrum_mode_combo)
+        self.zoom_band_widget = QWidget()
+        zoom_layout = QHBoxLayout(self.zoom_band_widget)
+        zoom_layout.setContentsMargins(0, 0, 0, 0)
+        zoom_layout.addWidget(QLabel("Środek [Hz]:"))
+        self.zoom_center_input = QLineEdit(f"{self.zoom_center:g}")
+        self.zoom_center_input.setValidator(QDoubleValidator(1.0, 24000.0, 2))
+        self.zoom_center_input.editingFinished.connect(self.update_zoom_band_from_inputs)
+        zoom_layout.addWidget(self.zoom_center_input)
+        zoom_layout.addWidget(QLabel("Szerokość [Hz]:"))
+        self.zoom_span_input = QLineEdit(f"{self.zoom_span:g}")
+        self.zoom_span_input.setValidator(QDoubleValidator(1.0, 24000.0, 2))
+        self.zoom_span_input.editingFinished.connect(self.update_zoom_band_from_inputs)
+        zoom_layout.addWidget(self.zoom_span_input)
+        self.zoom_band_widget.setVisible(False)
+        analysis_layout.addWidget(self.zoom_band_widget)
+        self.welch_widget = QWidget()
+        welch_layout = QHBoxLayout(self.welch_widget)
+        welch_layout.setContentsMargins(0, 0, 0, 0)
+        welch_layout.addWidget(QLabel("Segment:"))
+        self.welch_segment_combo = QComboBox()
+        for length in (1024, 2048, 4096, 8192, 16384, 32768, 65536):
+            self.welch_segment_combo.addItem(f"{length}", length)
+        self.welch_segment_combo.setCurrentIndex(self.welch_segment_combo.findData(4096))
+        self.welch_segment_combo.currentIndexChanged.connect(self.update_welch_settings)
+        welch_layout.addWidget(self.welch_segment_combo)
+        welch_layout.addWidget(QLabel("Nakładanie:"))
+        self.welch_overlap_combo = QComboBox()
+        for percent in (0, 25, 50, 75):
+            self.welch_overlap_combo.addItem(f"{percent}%", percent / 100)
+        self.welch_overlap_combo.setCurrentIndex(self.welch_overlap_combo.findData(0.5))
+        self.welch_overlap_combo.currentIndexChanged.connect(self.update_welch_settings)
+        welch_layout.addWidget(self.welch_overlap_combo)
+        self.welch_widget.setVisible(False)
+        analysis_layout.addWidget(self.welch_widget)
+        silence_layout = QHBoxLayout()
+        self.silence_checkbox = QCheckBox("Pomijaj ciszę <")
+        self.silence_checkbox.setToolTip("Na żywo: w ciszy analiza i odświeżanie są wstrzymane.\n"
+                                         "Pliki: fragmenty ciszy są zaznaczane i pomijane w widmie.")
+        self.silence_checkbox.toggled.connect(self.update_silence_settings)
+        silence_layout.addWidget(self.silence_checkbox)
+        self.silence_threshold_combo = QComboBox()
+        for threshold in (-70, -60, -50, -40):
+            self.silence_threshold_combo.addItem(f"{threshold} dBFS", float(threshold))
+        self.silence_threshold_combo.setCurrentIndex(self.silence_threshold_combo.findData(DEFAULT_THRESHOLD_DB))
+        self.silence_threshold_combo.currentIndexChanged.connect(self.update_silence_settings)
+        silence_layout.addWidget(self.silence_threshold_combo)
+        analysis_layout.addLayout(silence_layout)
+        control_layout.addWidget(analysis_group)
         self.recording_group = QGroupBox("Ustawienia nagrywania")
         recording_layout = QVBoxLayout(self.recording_group)
         recording_layout.addWidget(QLabel("Wybierz mikrofon:"))
@@ -144,6 +352,14 @@ class LiveAudioAnalyzer(QWidget):
         self.slider.setValue(self.duration)
         self.slider.valueChanged.connect(self.update_duration)
         recording_layout.addWidget(self.slider)
+        self.continuous_checkbox = QCheckBox("Tryb ciągły (bez limitu czasu)")
+        self.continuous_checkbox.toggled.connect(self.update_continuous_mode)
+        recording_layout.addWidget(self.continuous_checkbox)
+        self.segment_dir_button = QPushButton("📁 Folder segmentów WAV")
+        self.segment_dir_button.setToolTip(self.segment_directory)
+        self.segment_dir_button.clicked.connect(self.choose_segment_directory)
+        self.segment_dir_button.setVisible(False)
+        recording_layout.addWidget(self.segment_dir_button)
         self.button = QPushButton("🎙️ Start analizy")
         self.button.setMinimumHeight(40)
         self.button.clicked.connect(self.toggle_stream)
@@ -164,6 +380,23 @@ class LiveAudioAnalyzer(QWidget):
         self.spectrogram_button = QPushButton("📊 Pokaż spektrogram")
         self.spectrogram_button.clicked.connect(self.show_spectrogram)
         save_layout.addWidget(self.spectrogram_button)
+        self.batch_export_button = QPushButton("🗂️ Eksport wsadowy wykresów")
+        self.batch_export_button.clicked.connect(self.batch_export_plots)
+        save_layout.addWidget(self.batch_export_button)
+        self.export_results_button = QPushButton("📦 Eksport wyników analizy (.npy)")
+        self.export_results_button.clicked.connect(self.export_analysis_results)
+        save_layout.addWidget(self.export_results_button)
+        self.live_export_checkbox = QCheckBox("Zapisuj wyniki na żywo (.npy)")
+        self.live_export_checkbox.setToolTip(DEFAULT_EXPORT_DIR)
+        save_layout.addWidget(self.live_export_checkbox)
+        self.stream_server_checkbox = QCheckBox("Udostępniaj wyniki na żywo (TCP)")
+        self.stream_server_checkbox.setToolTip(f"Ramki binarne poziomów i widma dla zewnętrznych paneli "
+                                               f"(127.0.0.1:{port_from_environment()})")
+        self.stream_server_checkbox.toggled.connect(self.toggle_stream_server)
+        save_layout.addWidget(self.stream_server_checkbox)
+        self.export_progress_bar = QProgressBar()
+        self.export_progress_bar.setVisible(False)
+        save_layout.addWidget(self.export_progress_bar)
         control_layout.addWidget(save_group)
         self.status_label = QLabel("Gotowy.")
         control_layout.addWidget(self.status_label)
@@ -185,35 +418,151 @@ class LiveAudioAnalyzer(QWidget):
 
         self.ax_time = self.figure.add_subplot(2, 1, 1)
         self.ax_fft = self.figure.add_subplot(2, 1, 2)
+        # -------------> Powiększenie/przesunięcie osi widma narzędziami paska wyznacza pasmo trybu zoom
+        self.canvas.mpl_connect('button_release_event', self.on_canvas_button_release)
         self.update_empty_plots()
         return plot_container
 
     def init_timers(self):
-        self.plot_timer = QTimer()
-        self.plot_timer.timeout.connect(self.trigger_analysis)
+        # -------------> Interwał odświeżania dopasowany do zmierzonego czasu analizy i rysowania
+        self.frame_scheduler = FrameScheduler(parent=self)
+        self.frame_scheduler.frame_due.connect(self.trigger_analysis)
+        self._last_stream_position = None
         self.stop_timer = QTimer()
         self.stop_timer.setSingleShot(True)
         self.stop_timer.timeout.connect(self.stop_recording)
         self.progress_timer = QTimer()
         self.progress_timer.timeout.connect(self.update_progress)
 
+    def init_memory_budget(self):
+        """
+        Rozlicza duże bufory sesji w budżecie pamięci (AUDIO_ANALYZER_MEMORY_MB). Po przekroczeniu
+        limitu najpierw skracana jest historia nagrania w RAM (starsze próbki idą do segmentów WAV),
+        potem próbki pliku są przenoszone do pliku mapowanego w pamięć.
+        """
+        self._pending_payload = None
+        self._spill_files = []
+        self._spill_pending = False
+        self.memory_budget = MemoryBudget(budget_from_environment())
+        if self.recorder:
+            self.memory_budget.register('nagranie', self.recorder.buffered_bytes, self._limit_recorder_history)
+        self.memory_budget.register('próbki', lambda: array_bytes(self.last_samples), self._spill_samples)
+        # -------------> Kopia wysłana do workera, jeśli to inna tablica niż last_samples (np. w trakcie nagrania)
+        self.memory_budget.register('dane w locie', lambda: 0 if self._pending_payload is self.last_samples
+                                    else array_bytes(self._pending_payload))
+        self.memory_budget.register('worker', self.worker.buffered_bytes)
+        self.memory_budget.register('porównanie', lambda: array_bytes(self.comparison['difference'])
+                                    if self.comparison else 0, self._drop_comparison)
+
+        # -------------> AUDIO_ANALYZER_TRACEMALLOC=1 - raport alokacji gorącej pętli co kilka sekund
+        self.allocation_tracer = None
+        self._memory_checks = 0
+        if os.environ.get(TRACEMALLOC_ENV, '').lower() in ('1', 'true', 'yes'):
+            self.allocation_tracer = AllocationTracer()
+            self.allocation_tracer.start()
+        self.memory_timer = QTimer(self)
+        self.memory_timer.timeout.connect(self.check_memory)
+        self.memory_timer.start(1000)
+
+    def check_memory(self):
+        actions = self.memory_budget.enforce()
+        if actions:
+            self.status_label.setText("Mało pamięci: " + "; ".join(actions))
+        self._memory_checks += 1
+        if self.allocation_tracer and self._memory_checks % 10 == 0:
+            print(self.memory_budget.report())
+            print("\n".join(self.allocation_tracer.report()))
+
+    def _limit_recorder_history(self, excess):
+        if not self.is_recording or not self.recorder._buffered_frames:
+            return None
+        bytes_per_frame = self.recorder.buffered_bytes() / self.recorder._buffered_frames
+        fs = self.recorder.get_sample_rate()
+        # -------------> Co najmniej sekunda historii - tyle potrzebuje analiza i wykres
+        history_frames = max(fs, int((self.recorder.buffered_bytes() - excess) / bytes_per_frame))
+        if self.recorder.history_frames and history_frames >= self.recorder.history_frames:
+            return None
+        segment_writer = None
+        if self.recorder.segment_writer is None:
+            # -------------> Osobny katalog sesji i bez retencji - zrzut ma zachować całe nagranie
+            session = datetime.now().strftime(f"session_%Y%m%d_%H%M%S_{os.getpid()}")
+            segment_writer = BackgroundSegmentWriter(SegmentWriter(
+                os.path.join(DEFAULT_SPILL_DIR, session), fs, self.recorder.channels, max_segments=0,
+                prefix="spill"))
+        self.recorder.limit_history(history_frames, segment_writer)
+        target = self.recorder.segment_writer.directory
+        return f"historia nagrania w RAM skrócona do {history_frames / fs:.0f} s (całość w {target})"
+
+    def _spill_samples(self, excess):
+        if self._spill_pending or isinstance(self.last_samples, np.memmap) or self.last_samples.size == 0 \
+                or self.is_recording:
+            return None
+        os.makedirs(DEFAULT_SPILL_DIR, exist_ok=True)
+        path = os.path.join(DEFAULT_SPILL_DIR, f"samples_{os.getpid()}_{len(self._spill_files)}.npy")
+        self._spill_files.append(path)
+        # -------------> Zapis ponad 1 GB trwa - robi go wątek wczytywania, GUI podmienia tablicę po zapisie
+        self._spill_pending = True
+        self.spill_requested.emit(self.last_samples, path)
+        return f"przenoszenie próbek ({self.last_samples.nbytes / 2 ** 20:.0f} MB) do {path}"
+
+    @Slot(object, str, str)
+    def on_samples_spilled(self, samples, path, error_message):
+        self._spill_pending = False
+        if error_message:
+            print(f"Nie udało się przenieść próbek do {path}: {error_message}")
+            return
+        # -------------> W międzyczasie mógł zostać otwarty inny plik - wtedy zapis jest już niepotrzebny
+        if samples is not self.last_samples:
+            os.remove(path)
+            self._spill_files.remove(path)
+            return
+        self.last_samples = np.load(path, mmap_mode='r')
+        if self.last_results:
+            self.last_results['samples'] = self.last_samples
+        print(f"Próbki przeniesiono do {path}")
+
     def trigger_analysis(self):
         try:
             samples_to_analyze = np.array([])
+            stream_position = 0
             if self.is_recording:
+                if self.recorder.is_silent():
+                    # -------------> Cisza: bez sklejania nagrania, analizy i rysowania - tylko opróżniamy wejście
+                    self.recorder.drain()
+                    self._set_input_silent(True)
+                    return
+                self._set_input_silent(False)
                 samples_to_analyze = self.recorder.get_full_recording()
+                stream_position = self.recorder.get_total_frames()
+            elif self.app_mode == 'generator' and self.tone_generator.is_playing():
+                samples_to_analyze = self.tone_generator.get_full_recording()
+                stream_position = self.tone_generator.get_total_frames()
             elif self.app_mode == 'file' and self.last_samples.size > 0:
                 samples_to_analyze = self.last_samples
-                self.plot_timer.stop()
+                stream_position = len(samples_to_analyze)
+                self.frame_scheduler.stop()
 
+            # -------------> Źródło nie dostarczyło nowych próbek (pauza, zacięcie) - nie ma czego przerysować
+            if self.app_mode != 'file' and stream_position == self._last_stream_position:
+                return
             if samples_to_analyze.size > 0:
-                self.analysis_trigger.emit(samples_to_analyze, self.current_fs)
+                self._last_stream_position = stream_position
+                self.frame_scheduler.frame_started()
+                self._pending_payload = samples_to_analyze
+                self.analysis_trigger.emit(samples_to_analyze, self.current_fs, stream_position)
         except Exception as e:
             print(f"Błąd w trigger_analysis: {e}")
             traceback.print_exc()
 
     @Slot(dict)
     def update_plots_from_results(self, results):
+        try:
+            self._draw_results(results)
+        finally:
+            self._pending_payload = None
+            self.frame_scheduler.frame_finished()
+
+    def _draw_results(self, results):
         if not results:
             self.update_empty_plots()
             return
@@ -221,25 +570,189 @@ class LiveAudioAnalyzer(QWidget):
         try:
             samples = results['samples']
             self.last_samples = samples
+            self.last_results = results
+            self.status_label.setToolTip("Koszt etapów analizy:\n" + "\n".join(
+                f"{name}: {cost:.2f} ms" for name, cost in results.get('stage_costs', [])))
+            # -------------> Wyniki mogą być niepełne - ukryte widoki nie zamawiają swoich etapów
+            has_time = all(key in results for key in TIME_VIEW_OUTPUTS)
+            has_spectrum = all(key in results for key in SPECTRUM_VIEW_OUTPUTS)
+            if not (has_time or has_spectrum):
+                return
             duration = len(samples) / self.current_fs if self.current_fs > 0 else 0
+            start_time = (results['stream_position'] - len(samples)) / self.current_fs if self.current_fs > 0 else 0
 
-            plot_time_domain(self.ax_time, samples, duration, results['rms'], results['peak'])
-            plot_frequency_domain(self.ax_fft, results['xf'], results['yf_db'], results['dominant_freq'],
-                                  results['note'], self.current_fs)
+            if has_time:
+                plot_time_domain(self.ax_time, samples, duration, results['rms'], results['peak'],
+                                 results.get('loudness'), results.get('stats'), start_time, results.get('onsets'),
+                                 results.get('silent_regions'))
+            if has_spectrum:
+                plot_frequency_domain(self.ax_fft, results['xf'], results['yf_db'], results['dominant_freq'],
+                                      results['note'], self.current_fs,
+                                      log_scale=(results.get('spectrum_mode') == 'cqt'),
+                                      freq_range=results.get('freq_range'),
+                                      ylabel=self._spectrum_ylabel(results.get('spectrum_mode')))
 
             self.canvas.draw()
+            if self.app_mode == 'file' and self.current_file and not self.is_recording and has_time and has_spectrum:
+                self.store_analysis_in_cache(results)
+                if self.queue_statuses.get(self.current_file) == STATUS_LOADING:
+                    self.on_queue_status(self.current_file, STATUS_DONE, f"{results['dominant_freq']:.1f} Hz")
         except Exception as e:
             print(f"Błąd w update_plots_from_results: {e}")
             traceback.print_exc()
 
+    def _analysis_cache_params(self, spectrum_mode=None):
+        params = {'kind': 'analysis', 'spectrum_mode': spectrum_mode or self.spectrum_mode}
+        if params['spectrum_mode'] == 'zoom':
+            params['zoom_band'] = [self.zoom_center, self.zoom_span]
+        elif params['spectrum_mode'] == 'welch':
+            params['welch'] = [self.welch_segment_combo.currentData(), self.welch_overlap_combo.currentData()]
+        if self._silence_threshold() is not None:
+            params['silence_threshold_db'] = self._silence_threshold()
+        return params
+
+    @staticmethod
+    def _spectrum_ylabel(spectrum_mode):
+        return "Gęstość mocy [dB/Hz]" if spectrum_mode == 'welch' else "Amplituda [dB]"
+
+    def store_analysis_in_cache(self, results):
+        if not self.analysis_cache or self.current_metadata is None:
+            return
+        arrays, info = analysis_cache_entry(results, self.current_metadata)
+        self.analysis_cache.put(self.current_file, self._analysis_cache_params(results.get('spectrum_mode')),
+                                arrays, info)
+
+    def show_cached_analysis(self, arrays, info):
+        """Rysuje wykresy z wyników zapisanych w cache - bez dostępu do próbek."""
+        self.cached_results = (arrays, info)
+        self.last_results = None
+        plot_envelope(self.ax_time, arrays['env_min'], arrays['env_max'], info['metadata']['duration'],
+                      info['rms'], info['peak'], info.get('loudness'), info.get('stats'),
+                      onsets=arrays['onsets'] if 'onsets' in arrays else None,
+                      silent_regions=arrays['silent_regions'] if 'silent_regions' in arrays else None)
+        plot_frequency_domain(self.ax_fft, arrays['xf'], arrays['yf_db'], info['dominant_freq'], info['note'],
+                              self.current_fs, log_scale=(info.get('spectrum_mode') == 'cqt'),
+                              freq_range=arrays['freq_range'] if 'freq_range' in arrays else None,
+                              ylabel=self._spectrum_ylabel(info.get('spectrum_mode')))
+        self.canvas.draw()
+
+    def ensure_samples_loaded(self):
+        """Wczytuje próbki aktywnego pliku, jeśli wykresy pochodzą z cache."""
+        if self.last_samples.size == 0 and self.app_mode == 'file' and self.current_file:
+            samples, sample_rate, _ = load_wav(self.current_file)
+            self.last_samples = samples
+            self.current_fs = sample_rate
+        return self.last_samples
+
+    def has_data(self):
+        return self.last_samples.size > 0 or self.cached_results is not None
+
     def update_empty_plots(self):
         plot_time_domain(self.ax_time, np.array([]), 0, 0, 0)
         plot_frequency_domain(self.ax_fft, np.array([]), np.array([]), 0, None, self.current_fs)
         self.canvas.draw()
 
+    def update_spectrum_mode(self, index):
+        previous_mode = self.spectrum_mode
+        self.spectrum_mode = self.spectrum_mode_combo.itemData(index)
+        self.zoom_band_widget.setVisible(self.spectrum_mode == 'zoom')
+        self.welch_widget.setVisible(self.spectrum_mode == 'welch')
+        if self.spectrum_mode == 'zoom' and previous_mode == 'fft' and self.has_data():
+            # -------------> Startowe pasmo to aktualnie widoczny fragment liniowego widma
+            low, high = self.ax_fft.get_xlim()
+            self.set_zoom_band((low + high) / 2, high - low, reanalyze=False)
+        self.analysis_settings_changed.emit({'spectrum_mode': self.spectrum_mode, 'zoom_center': self.zoom_center,
+                                             'zoom_span': self.zoom_span})
+        self.reanalyze()
+
+    def set_zoom_band(self, center, span, reanalyze=True):
+        """Ustawia pasmo trybu zoom (ograniczone do zakresu 0 - fs/2) i przelicza widmo."""
+        nyquist = self.current_fs / 2
+        span = min(max(float(span), 1.0), nyquist)
+        center = min(max(float(center), span / 2), nyquist - span / 2)
+        self.zoom_center, self.zoom_span = center, span
+        self.zoom_center_input.setText(f"{center:.2f}")
+        self.zoom_span_input.setText(f"{span:.2f}")
+        if reanalyze:
+            self.analysis_settings_changed.emit({'zoom_center': center, 'zoom_span': span})
+            self.reanalyze()
+
+    def _silence_threshold(self):
+        return self.silence_threshold_combo.currentData() if self.silence_checkbox.isChecked() else None
+
+    def update_silence_settings(self):
+        """Bramka ciszy wejścia (nagrywanie) i wykrywanie ciszy w analizie (pliki, bufor nagrania)."""
+        threshold_db = self._silence_threshold()
+        if self.recorder:
+            self.recorder.set_silence_gate(SilenceGate(self.recorder.get_sample_rate(), threshold_db)
+                                           if threshold_db is not None else None)
+        self.analysis_settings_changed.emit({'silence_threshold_db': threshold_db})
+        self.reanalyze()
+
+    def _set_input_silent(self, silent):
+        if silent == self.input_silent:
+            return
+        self.input_silent = silent
+        # -------------> W ciszy wystarczy rzadko sprawdzać bramkę - wykresy i tak się nie zmieniają
+        self.frame_scheduler.set_idle(silent)
+        self.status_label.setText("Cisza na wejściu - analiza wstrzymana." if silent else "Nagrywanie...")
+
+    def update_welch_settings(self):
+        self.analysis_settings_changed.emit({'welch_segment_length': self.welch_segment_combo.currentData(),
+                                             'welch_overlap': self.welch_overlap_combo.currentData()})
+        self.reanalyze()
+
+    def update_zoom_band_from_inputs(self):
+        try:
+            center = float(self.zoom_center_input.text().replace(',', '.'))
+            span = float(self.zoom_span_input.text().replace(',', '.'))
+        except ValueError:
+            return
+        if (center, span) != (self.zoom_center, self.zoom_span):
+            self.set_zoom_band(center, span)
+
+    def on_canvas_button_release(self, event):
+        # -------------> Reagujemy tylko na zoom/pan paska narzędzi na osi widma w trybie zoom
+        if self.spectrum_mode != 'zoom' or event.inaxes is not self.ax_fft or not self.canvas.toolbar.mode:
+            return
+        low, high = self.ax_fft.get_xlim()
+        if high > low:
+            self.set_zoom_band((low + high) / 2, high - low)
+
+    def reanalyze(self):
+        """Przelicza widmo po zmianie ustawień. Podczas nagrywania robi to i tak następny tick timera."""
+        # -------------> Poza nagrywaniem przeliczamy widmo od razu (lub bierzemy je z cache)
+        if self.is_recording or self.tone_generator.is_playing() or not self.has_data():
+            return
+        if self.app_mode == 'file' and self.current_file and self.analysis_cache:
+            cached = self.analysis_cache.get(self.current_file, self._analysis_cache_params())
+            if cached:
+                self.show_cached_analysis(*cached)
+                return
+        try:
+            samples = self.ensure_samples_loaded()
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd wczytywania", f"Nie udało się wczytać pliku:\n{e}")
+            return
+        self.analysis_trigger.emit(samples, self.current_fs, len(samples))
+
     def update_duration(self, value):
         self.duration = value
-        self.time_label.setText(f"Czas nagrania: {self.duration} s")
+        if self.continuous_mode:
+            self.time_label.setText(f"Historia na wykresie: {self.duration} s")
+        else:
+            self.time_label.setText(f"Czas nagrania: {self.duration} s")
+
+    def update_continuous_mode(self, checked):
+        self.continuous_mode = checked
+        self.segment_dir_button.setVisible(checked)
+        self.update_duration(self.duration)
+
+    def choose_segment_directory(self):
+        directory = QFileDialog.getExistingDirectory(self, "Folder segmentów WAV", self.segment_directory)
+        if directory:
+            self.segment_directory = directory
+            self.segment_dir_button.setToolTip(directory)
 
     def toggle_stream(self):
         if not self.is_recording:
@@ -248,7 +761,8 @@ class LiveAudioAnalyzer(QWidget):
             self.stop_recording()
 
     def start_recording(self):
-        if self.app_mode == 'file': self.switch_to_live_mode()
+        # -------------> Ton odtwarzany bez analizy może grać dalej (pomiar przez mikrofon / pętlę zwrotną)
+        if self.app_mode != 'live': self.switch_to_live_mode()
         if hasattr(self.canvas.toolbar, 'home'): self.canvas.toolbar.home()
         if not self.recorder:
             self.error_occurred.emit("Recorder nie jest zainicjowany")
@@ -260,17 +774,31 @@ class LiveAudioAnalyzer(QWidget):
         device_id = self.input_devices[selected_index]['index']
         try:
             self.last_samples = np.array([])
-            self.recorder.start(self.duration, device_id=device_id)
+            self.current_file = None
+            self.cached_results = None
+            self.last_results = None
+            self.analysis_reset.emit()
+            if self.continuous_mode:
+                # -------------> W pamięci zostaje tylko historia, całość trafia do rotowanych segmentów
+                segment_writer = SegmentWriter(self.segment_directory, self.recorder.get_sample_rate(),
+                                               self.recorder.channels)
+                self.recorder.start(self.duration, device_id=device_id, continuous=True,
+                                    segment_writer=segment_writer)
+            else:
+                self.recorder.start(self.duration, device_id=device_id)
             self.is_recording = True
             self.button.setText("⏹️ Stop analizy")
             self.button.setStyleSheet("background-color: #ff4444;")
             self.update_ui_for_mode()
-            self.progress_bar.setVisible(True)
-            self.progress_bar.setRange(0, self.duration * 10)
-            self.progress_bar.setValue(0)
-            self.plot_timer.start(100)
-            self.stop_timer.start(self.duration * 1000)
-            self.progress_timer.start(100)
+            self._start_live_export(self.recorder.get_sample_rate())
+            self._last_stream_position = None
+            self.frame_scheduler.start()
+            if not self.continuous_mode:
+                self.progress_bar.setVisible(True)
+                self.progress_bar.setRange(0, self.duration * 10)
+                self.progress_bar.setValue(0)
+                self.stop_timer.start(self.duration * 1000)
+                self.progress_timer.start(100)
             self.recording_started.emit()
         except Exception as e:
             self.error_occurred.emit(f"Błąd podczas rozpoczynania nagrywania: {str(e)}")
@@ -280,7 +808,8 @@ class LiveAudioAnalyzer(QWidget):
         try:
             self.recorder.stop()
             self.is_recording = False
-            self.plot_timer.stop()
+            self.frame_scheduler.stop()
+            self._set_input_silent(False)
             self.stop_timer.stop()
             self.progress_timer.stop()
             self.button.setText("🎙️ Start analizy")
@@ -289,6 +818,7 @@ class LiveAudioAnalyzer(QWidget):
             self.last_samples = self.recorder.get_full_recording()
             self.update_ui_for_mode()
             self.trigger_analysis()
+            self._stop_live_export()
             self.recording_stopped.emit()
         except Exception as e:
             self.error_occurred.emit(f"Błąd podczas zatrzymywania nagrywania: {str(e)}")
@@ -300,45 +830,188 @@ class LiveAudioAnalyzer(QWidget):
 
     def update_ui_for_mode(self):
         is_live_mode = (self.app_mode == 'live')
-        has_data = (self.last_samples.size > 0)
+        has_data = self.has_data()
         self.device_combo.setEnabled(is_live_mode)
         self.slider.setEnabled(is_live_mode)
+        self.continuous_checkbox.setEnabled(is_live_mode and not self.is_recording)
         self.time_label.setEnabled(is_live_mode)
         can_operate = has_data and not self.is_recording
         self.save_button.setEnabled(can_operate)
         self.save_plot_button.setEnabled(can_operate)
         self.spectrogram_button.setEnabled(can_operate)
+        self.compare_button.setEnabled(self.app_mode == 'file' and self.current_file is not None)
         file_info_visible = (self.app_mode == 'file')
         for label in [self.file_info_duration_label, self.file_info_samplerate_label, self.file_info_channels_label,
                       self.file_info_bitdepth_label]:
             label.setVisible(file_info_visible)
 
     def process_audio_file(self, filepath):
+        if self.tone_generator.is_playing(): self.stop_test_tone()
+        # -------------> Poprzedni plik mógł się jeszcze wczytywać - nowy numer zlecenia przerywa go
+        # -------------> w wątku wczytywania i odrzuca jego sygnały
+        self.file_load_generation += 1
+        self.file_loader.request(self.file_load_generation)
         try:
-            samples, sample_rate, metadata = load_wav(filepath)
-            self.last_samples = samples
-            self.current_fs = sample_rate
+            self.analysis_reset.emit()
+            self.current_file = filepath
+            self.comparison = None
+            self.cached_results = None
+            self.last_results = None
+            self.last_samples = np.array([])
+
+            # -------------> Trafienie w cache: wykresy od razu, bez czytania próbek
+            cached = self.file_queue.get(filepath, self._analysis_cache_params())
+            if cached:
+                arrays, info = cached
+                metadata = info['metadata']
+                self.current_fs = metadata['sample_rate']
+            else:
+                # -------------> Sam nagłówek - próbki dekoduje FileLoadWorker w tle
+                metadata = read_wav_metadata(filepath)
+                self.current_fs = metadata['sample_rate']
+
+            self.current_metadata = metadata
             self.app_mode = 'file'
-            self.loaded_file_label.setText(f"<b>Aktywny plik:</b>\n{os.path.basename(filepath)}")
-            self.file_info_duration_label.setText(f"<b>Długość:</b> {metadata['duration']:.2f} s")
-            self.file_info_samplerate_label.setText(f"<b>Próbkowanie:</b> {metadata['sample_rate']} Hz")
-            self.file_info_channels_label.setText(f"<b>Kanały:</b> {metadata['channels']}")
-            self.file_info_bitdepth_label.setText(f"<b>Głębia bitowa:</b> {metadata['bit_depth']}-bit")
-            self.status_label.setText("Załadowano plik.")
+            self.show_file_info(filepath, metadata)
             self.update_ui_for_mode()
-            self.plot_timer.start(100)
+            if cached:
+                self.show_cached_analysis(arrays, info)
+                self.status_label.setText("Załadowano plik (z cache).")
+                if filepath in self.queue_items and filepath not in self.queue_statuses:
+                    self.on_queue_status(filepath, STATUS_CACHED, "")
+            else:
+                if filepath in self.queue_items:
+                    self.on_queue_status(filepath, STATUS_LOADING, "")
+                self.status_label.setText("Wczytywanie pliku...")
+                self.cancel_load_button.setVisible(True)
+                self.file_load_requested.emit(self.file_load_generation, filepath)
         except Exception as e:
+            self.current_file = None
             QMessageBox.critical(self, "Błąd wczytywania", f"Nie udało się wczytać pliku:\n{e}")
 
+    def _is_current_load(self, generation, filepath):
+        # -------------> Sama ścieżka nie wystarcza - ponowne otwarcie tego samego pliku anuluje poprzednie zlecenie
+        return generation == self.file_load_generation and filepath == self.current_file
+
+    @Slot(int, str, object, object, float)
+    def on_file_overview(self, generation, filepath, env_min, env_max, fraction):
+        if not self._is_current_load(generation, filepath):
+            return
+        plot_envelope(self.ax_time, env_min, env_max, self.current_metadata['duration'], None, None)
+        self.canvas.draw_idle()
+        self.status_label.setText(f"Wczytywanie pliku... {fraction * 100:.0f}%")
+
+    @Slot(int, str, np.ndarray, int)
+    def on_file_loaded(self, generation, filepath, samples, sample_rate):
+        if not self._is_current_load(generation, filepath):
+            return
+        self.cancel_load_button.setVisible(False)
+        self.last_samples = samples
+        self.current_fs = sample_rate
+        self.status_label.setText("Załadowano plik.")
+        self.frame_scheduler.start()
+
+    @Slot(int, str, str)
+    def on_file_load_failed(self, generation, filepath, error_message):
+        if not self._is_current_load(generation, filepath):
+            return
+        self.cancel_load_button.setVisible(False)
+        self.current_file = None
+        if filepath in self.queue_items:
+            self.on_queue_status(filepath, STATUS_FAILED, error_message)
+        self.status_label.setText("Błąd wczytywania.")
+        QMessageBox.critical(self, "Błąd wczytywania", f"Nie udało się wczytać pliku:\n{error_message}")
+
+    @Slot(int, str)
+    def on_file_load_cancelled(self, generation, filepath):
+        if not self._is_current_load(generation, filepath):
+            return
+        self.cancel_load_button.setVisible(False)
+        self.current_file = None
+        if filepath in self.queue_items:
+            self.on_queue_status(filepath, STATUS_CANCELLED, "")
+        self.status_label.setText("Anulowano wczytywanie.")
+
+    def show_file_info(self, filepath, metadata):
+        self.loaded_file_label.setText(f"<b>Aktywny plik:</b>\n{os.path.basename(filepath)}")
+        self.file_info_duration_label.setText(f"<b>Długość:</b> {metadata['duration']:.2f} s")
+        self.file_info_samplerate_label.setText(f"<b>Próbkowanie:</b> {metadata['sample_rate']} Hz")
+        self.file_info_channels_label.setText(f"<b>Kanały:</b> {metadata['channels']}")
+        self.file_info_bitdepth_label.setText(f"<b>Głębia bitowa:</b> {metadata['bit_depth']}-bit")
+
     def load_audio_file(self):
-        filepath, _ = QFileDialog.getOpenFileName(self, "Otwórz plik audio", "", "Pliki WAV (*.wav)")
-        if filepath:
+        filepaths, _ = QFileDialog.getOpenFileNames(self, "Otwórz pliki audio", "", "Pliki WAV (*.wav)")
+        if filepaths:
+            self.open_files(filepaths)
+
+    def _analysis_settings(self):
+        """Bieżące ustawienia analizy w postaci przyjmowanej przez AnalysisWorker.update_settings."""
+        return {'spectrum_mode': self.spectrum_mode, 'zoom_center': self.zoom_center, 'zoom_span': self.zoom_span,
+                'welch_segment_length': self.welch_segment_combo.currentData(),
+                'welch_overlap': self.welch_overlap_combo.currentData(),
+                'silence_threshold_db': self._silence_threshold()}
+
+    def open_files(self, paths):
+        """
+        Otwiera pliki WAV (katalogi są rozwijane do zawartych w nich plików .wav). Pierwszy plik
+        staje się aktywny od razu, pozostałe są analizowane w tle przez kolejkę plików.
+        """
+        filepaths = []
+        for path in paths:
+            if os.path.isdir(path):
+                filepaths.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                                 if name.lower().endswith('.wav'))
+            elif path.lower().endswith('.wav'):
+                filepaths.append(path)
+        if not filepaths:
+            return
+        if len(filepaths) > 1 or self.queue_items:
+            params, settings = self._analysis_cache_params(), self._analysis_settings()
+            for filepath in filepaths:
+                self._queue_item(filepath)
+            for filepath in filepaths[1:]:
+                self.file_queue.submit(filepath, params, settings)
+            self.queue_list.setCurrentItem(self.queue_items[filepaths[0]])
+        self.process_audio_file(filepaths[0])
+
+    def _queue_item(self, filepath):
+        item = self.queue_items.get(filepath)
+        if item is None:
+            item = QListWidgetItem(os.path.basename(filepath))
+            item.setData(Qt.UserRole, filepath)
+            item.setToolTip(filepath)
+            self.queue_list.addItem(item)
+            self.queue_items[filepath] = item
+            for widget in [self.queue_label, self.queue_list]:
+                widget.setVisible(True)
+        return item
+
+    @Slot(str, str, str)
+    def on_queue_status(self, filepath, status, detail):
+        item = self.queue_items.get(filepath)
+        if item is None:
+            return
+        text = f"{os.path.basename(filepath)} — {STATUS_LABELS[status]}"
+        item.setText(f"{text} ({detail})" if detail and status not in (STATUS_DONE, STATUS_CACHED) else text)
+        item.setToolTip(f"{filepath}\n{detail}" if detail else filepath)
+        self.queue_statuses[filepath] = status
+        done = sum(1 for state in self.queue_statuses.values() if state in (STATUS_DONE, STATUS_CACHED))
+        self.queue_label.setText(f"Kolejka plików: {done}/{self.queue_list.count()}")
+
+    def on_queue_item_clicked(self, item):
+        filepath = item.data(Qt.UserRole)
+        if filepath != self.current_file:
             self.process_audio_file(filepath)
 
     def switch_to_live_mode(self):
         if self.is_recording: self.stop_recording()
+        if self.app_mode == 'generator' and self.tone_generator.is_playing(): self.stop_test_tone()
         self.app_mode = 'live'
         self.last_samples = np.array([])
+        self.current_file = None
+        self.comparison = None
+        self.cached_results = None
+        self.analysis_reset.emit()
         self.current_fs = self.recorder.get_sample_rate() if self.recorder else 44100
         self.loaded_file_label.setText("<b>Aktywne źródło:</b> Mikrofon")
         for label in [self.file_info_duration_label, self.file_info_samplerate_label, self.file_info_channels_label,
@@ -349,73 +1022,359 @@ class LiveAudioAnalyzer(QWidget):
         self.update_empty_plots()
 
     def play_test_tone(self):
+        if self.tone_generator.is_playing():
+            self.stop_test_tone()
+            return
         try:
             frequency = int(self.tone_freq_input.text())
-            tone_duration = 1.0;
-            amplitude = 0.5;
-            fs = 44100
-            t = np.linspace(0., tone_duration, int(fs * tone_duration), endpoint=False)
-            samples = amplitude * np.sin(2 * np.pi * frequency * t)
-            self.status_label.setText(f"Odtwarzanie tonu {frequency} Hz...")
-            sd.play(samples.astype(np.float32), fs)
-            self.app_mode = 'file'
-            self.last_samples = samples
-            self.current_fs = fs
-            self.loaded_file_label.setText(f"<b>Aktywny sygnał:</b>\nTon testowy {frequency} Hz")
-            for label in [self.file_info_duration_label, self.file_info_samplerate_label, self.file_info_channels_label,
-                          self.file_info_bitdepth_label]:
-                label.setText("")
-            self.update_ui_for_mode()
-            self.plot_timer.start(100)
-            sd.wait()
-            self.status_label.setText("Zakończono odtwarzanie.")
+            if self.is_recording and self.tone_analyze_checkbox.isChecked(): self.stop_recording()
+            self.tone_generator.set_frequency(frequency)
+            self.tone_generator.set_waveform(self.tone_waveform_combo.currentData())
+            self.tone_generator.set_capture(self.tone_analyze_checkbox.isChecked())
+            self.tone_generator.start()
+            signal_name = self.tone_waveform_combo.currentText()
+            if self.tone_generator.waveform == 'sine':
+                signal_name = f"Ton testowy {frequency} Hz"
+            self.play_tone_button.setText("⏹️ Zatrzymaj generator")
+            self.status_label.setText(f"Odtwarzanie: {signal_name}...")
+
+            if self.tone_analyze_checkbox.isChecked():
+                # -------------> Generowany sygnał trafia do analizy tak jak bloki z mikrofonu
+                self.app_mode = 'generator'
+                self.analysis_reset.emit()
+                self.current_file = None
+                self.cached_results = None
+                self.last_results = None
+                self.last_samples = np.array([])
+                self.current_fs = self.tone_generator.get_sample_rate()
+                self.loaded_file_label.setText(f"<b>Aktywny sygnał:</b>\n{signal_name}")
+                for label in [self.file_info_duration_label, self.file_info_samplerate_label,
+                              self.file_info_channels_label, self.file_info_bitdepth_label]:
+                    label.setText("")
+                self.update_ui_for_mode()
+                self._start_live_export(self.current_fs)
+                self._last_stream_position = None
+                self.frame_scheduler.start()
         except ValueError:
             QMessageBox.warning(self, "Błąd", "Wprowadź poprawną liczbę jako częstotliwość.")
         except Exception as e:
             QMessageBox.critical(self, "Błąd odtwarzania", f"Nie udało się odtworzyć dźwięku:\n{str(e)}")
 
+    def start_measurement(self):
+        if self.measuring:
+            # -------------> Bezpośrednie wywołanie - slot w wątku pomiaru jest zajęty pomiarem
+            self.measurement_worker.cancel()
+            return
+        if not self.recorder or not self.input_devices:
+            self.error_occurred.emit("Pomiar wymaga urządzenia wejściowego.")
+            return
+        try:
+            frequency = int(self.tone_freq_input.text())
+        except ValueError:
+            QMessageBox.warning(self, "Błąd", "Wprowadź poprawną liczbę jako częstotliwość.")
+            return
+        if self.is_recording: self.stop_recording()
+        if self.tone_generator.is_playing(): self.stop_test_tone()
+        fs = self.recorder.get_sample_rate()
+        frequencies = sweep_frequencies(fs=fs) if self.measure_sweep_checkbox.isChecked() else [frequency]
+        self.measuring = True
+        self.measure_button.setText("⏹️ Przerwij pomiar")
+        self.button.setEnabled(False)
+        self.progress_bar.setRange(0, len(frequencies))
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.status_label.setText("Pomiar zniekształceń...")
+        self.measurement_requested.emit({
+            'frequencies': frequencies,
+            'backend': self.recorder.backend,
+            'fs': fs,
+            'input_device': self.input_devices[self.device_combo.currentIndex()]['index']
+        })
+
+    def _finish_measurement(self):
+        self.measuring = False
+        self.measure_button.setText("📏 Pomiar THD+N")
+        self.button.setEnabled(True)
+        self.progress_bar.setVisible(False)
+
+    @Slot(int, int)
+    def on_measurement_progress(self, done, total):
+        self.progress_bar.setValue(done)
+        self.status_label.setText(f"Pomiar zniekształceń... {done}/{total}")
+
+    @Slot(object)
+    def on_measurement_finished(self, results):
+        self._finish_measurement()
+        if not results:
+            self.status_label.setText("Przerwano pomiar.")
+            return
+        plot_distortion(self.ax_fft, results)
+        self.canvas.draw()
+        if len(results) == 1:
+            result = results[0]
+            self.status_label.setText(f"THD+N: {result['thdn_percent']:.4f}%, SNR: {result['snr_db']:.1f} dB")
+        else:
+            self.status_label.setText(f"Zmierzono {len(results)} częstotliwości.")
+
+    @Slot(str)
+    def on_measurement_failed(self, error_message):
+        self._finish_measurement()
+        self.status_label.setText("Błąd pomiaru.")
+        QMessageBox.critical(self, "Błąd pomiaru", f"Nie udało się wykonać pomiaru:\n{error_message}")
+
+    def compare_with_file(self):
+        if not self.current_file:
+            return
+        filepath, _ = QFileDialog.getOpenFileName(self, "Wybierz plik do porównania", "", "WAV Files (*.wav)")
+        if not filepath:
+            return
+        self.compare_button.setEnabled(False)
+        self.status_label.setText("Wyrównywanie i porównywanie plików...")
+        self.comparison_requested.emit((self.current_file, filepath, 10.0))
+
+    @Slot(object)
+    def on_comparison_finished(self, comparison):
+        self.update_ui_for_mode()
+        if comparison['reference'] != self.current_file:
+            # -------------> W międzyczasie wybrano inny plik - wynik już nieaktualny
+            return
+        self.comparison = comparison
+        plot_comparison(self.ax_time, self.ax_fft, comparison)
+        self.canvas.draw()
+        self.status_label.setText(f"Porównano z {os.path.basename(comparison['file'])}: przesunięcie "
+                                  f"{comparison['offset_seconds'] * 1000:.2f} ms, "
+                                  f"null {comparison['null_depth_db']:.1f} dB")
+
+    @Slot(str)
+    def on_comparison_failed(self, error_message):
+        self.update_ui_for_mode()
+        self.status_label.setText("Błąd porównania.")
+        QMessageBox.critical(self, "Błąd porównania", f"Nie udało się porównać plików:\n{error_message}")
+
+    def _drop_comparison(self, excess):
+        # -------------> Wykres zostaje - zwalniamy tylko sygnał różnicowy
+        if not self.comparison:
+            return None
+        self.comparison = None
+        return "zwolniono sygnał różnicowy porównania"
+
+    def stop_test_tone(self):
+        self.tone_generator.stop()
+        self.play_tone_button.setText("🔊 Odtwórz i analizuj ton")
+        if self.app_mode == 'generator':
+            self.frame_scheduler.stop()
+            self.last_samples = self.tone_generator.get_full_recording()
+            if self.last_samples.size > 0:
+                self.analysis_trigger.emit(self.last_samples, self.current_fs, self.tone_generator.get_total_frames())
+            self._stop_live_export()
+        self.status_label.setText("Zakończono odtwarzanie.")
+        self.update_ui_for_mode()
+
+    def update_tone_frequency(self, text):
+        try:
+            frequency = int(text)
+        except ValueError:
+            return
+        # -------------> Zmiana w trakcie odtwarzania - faza pozostaje ciągła
+        if 20 <= frequency <= 20000:
+            self.tone_generator.set_frequency(frequency)
+
+    def update_tone_waveform(self, index):
+        self.tone_generator.set_waveform(self.tone_waveform_combo.itemData(index))
+
     def save_recording(self):
-        if self.last_samples.size == 0: return
+        if not self.has_data(): return
         path, _ = QFileDialog.getSaveFileName(self, "Zapisz dźwięk", "nagranie.wav", "Pliki WAV (*.wav)")
         if path:
             try:
                 path = validate_filename(path, "wav")
-                save_wav(path, self.last_samples, self.current_fs)
+                save_wav(path, self.ensure_samples_loaded(), self.current_fs)
                 QMessageBox.information(self, "Sukces", f"Nagranie zapisano do:\n{path}")
             except Exception as e:
                 QMessageBox.critical(self, "Błąd zapisu", f"Nie udało się zapisać pliku:\n{str(e)}")
 
     def save_plots(self):
-        if self.last_samples.size == 0: return
+        if not self.has_data(): return
+        snapshot = self._export_snapshot()
+        if snapshot is None:
+            self.status_label.setText("Brak pełnych wyników analizy do zapisania - poczekaj na zakończenie analizy.")
+            return
         path, _ = QFileDialog.getSaveFileName(self, "Zapisz wykresy jako...", "wykresy.png",
                                               "PNG Files (*.png);;JPEG Files (*.jpg *.jpeg);;SVG Files (*.svg)")
         if path:
+            def job(progress):
+                render_analysis(snapshot, path, dpi=300, progress=progress)
+                return f"Wykresy zapisano do:\n{path}"
+
+            self.start_export(job, "Zapisywanie wykresów...")
+
+    def _export_snapshot(self):
+        """
+        Zbiera dane bieżącej analizy potrzebne do ponownego narysowania wykresów poza GUI.
+        Zwraca None, jeśli nie ma jeszcze pełnych wyników (np. zaraz po wczytaniu pliku albo gdy
+        ostatnia analiza policzyła tylko etapy widocznych widoków).
+        """
+        results = self.last_results
+        if results is not None and all(key in results for key in ALL_OUTPUTS):
+            snapshot = {key: results.get(key) for key in ('samples', 'rms', 'peak', 'loudness', 'stats', 'xf', 'yf_db',
+                                                          'dominant_freq', 'note', 'spectrum_mode', 'freq_range',
+                                                          'onsets', 'silent_regions')}
+            snapshot['duration'] = len(results['samples']) / self.current_fs
+            snapshot['start_time'] = (results['stream_position'] - len(results['samples'])) / self.current_fs
+        elif self.cached_results is not None:
+            arrays, info = self.cached_results
+            snapshot = dict(arrays)
+            snapshot.update({key: info.get(key) for key in ('rms', 'peak', 'loudness', 'stats', 'dominant_freq',
+                                                            'note', 'spectrum_mode')})
+            snapshot['duration'] = info['metadata']['duration']
+        else:
+            return None
+        snapshot['fs'] = self.current_fs
+        return snapshot
+
+    def _start_live_export(self, fs):
+        """Podłącza do workera strumieniowy zapis wyników (STFT, wysokość, statystyki) nowej sesji."""
+        if not self.live_export_checkbox.isChecked():
+            return
+        directory = os.path.join(DEFAULT_EXPORT_DIR, time.strftime("session-%Y%m%d-%H%M%S"))
+        try:
+            self.export_writer_changed.emit(AnalysisExportWriter(directory, fs))
+            self.status_label.setText(f"Zapis wyników: {directory}")
+        except OSError as e:
+            QMessageBox.warning(self, "Błąd zapisu", f"Nie udało się rozpocząć zapisu wyników:\n{e}")
+
+    def _stop_live_export(self):
+        # -------------> Kolejność sygnałów gwarantuje, że ostatnia analiza trafi jeszcze do pliku
+        self.export_writer_changed.emit(None)
+
+    def toggle_stream_server(self, checked):
+        if checked:
+            server = SpectrumServer(port=port_from_environment())
+            server.sample_rate = self.current_fs
             try:
-                self.figure.savefig(path, dpi=300, bbox_inches='tight')
-                QMessageBox.information(self, "Sukces", f"Wykresy zapisano do:\n{path}")
-            except Exception as e:
-                QMessageBox.critical(self, "Błąd zapisu", f"Nie udało się zapisać wykresów:\n{str(e)}")
+                port = server.start()
+            except OSError as e:
+                self.stream_server_checkbox.setChecked(False)
+                QMessageBox.warning(self, "Błąd serwera", f"Nie udało się otworzyć portu strumieniowania:\n{e}")
+                return
+            self.stream_server = server
+            self.stream_server_changed.emit(server)
+            self.status_label.setText(f"Strumieniowanie wyników: 127.0.0.1:{port}")
+        elif self.stream_server is not None:
+            # -------------> Najpierw odłączamy od workera - publikacja w locie trafi do pustej listy klientów
+            self.stream_server_changed.emit(None)
+            self.stream_server.stop()
+            self.stream_server = None
+            self.status_label.setText("Zatrzymano strumieniowanie wyników.")
+
+    def export_analysis_results(self):
+        if not self.has_data(): return
+        directory = QFileDialog.getExistingDirectory(self, "Folder na wyniki analizy")
+        if not directory:
+            return
+        try:
+            samples = self.ensure_samples_loaded()
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd wczytywania", f"Nie udało się wczytać pliku:\n{e}")
+            return
+        results, fs = self.last_results, self.current_fs
+        if results is None and self.cached_results is not None:
+            arrays, info = self.cached_results
+            results = {**arrays, **info}
+
+        def job(progress):
+            export_analysis(directory, samples, fs, results)
+            return f"Wyniki analizy zapisano do:\n{directory}"
+
+        self.start_export(job, "Eksport wyników analizy...")
+
+    def start_export(self, job, message):
+        self.export_progress_bar.setRange(0, 0)
+        self.export_progress_bar.setVisible(True)
+        self.status_label.setText(message)
+        self.export_requested.emit(job)
+
+    def batch_export_plots(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "Wybierz pliki do eksportu", "", "WAV Files (*.wav)")
+        if not files:
+            return
+        output_dir = QFileDialog.getExistingDirectory(self, "Folder na wykresy")
+        if not output_dir:
+            return
+
+        def job(progress):
+            summary = export_batch(files, output_dir, progress=progress)
+            message = f"Zapisano {len(summary['exported'])} wykresów do:\n{output_dir}"
+            if summary['errors']:
+                message += f"\nBłędy: {len(summary['errors'])} plików (szczegóły w konsoli)"
+            return message
+
+        self.start_export(job, f"Eksport wykresów {len(files)} plików...")
+
+    @Slot(int, int)
+    def on_export_progress(self, done, total):
+        self.export_progress_bar.setRange(0, total)
+        self.export_progress_bar.setValue(done)
+
+    @Slot(str)
+    def on_export_finished(self, message):
+        self.export_progress_bar.setVisible(False)
+        self.status_label.setText("Eksport zakończony.")
+        QMessageBox.information(self, "Sukces", message)
+
+    @Slot(str)
+    def on_export_failed(self, error_message):
+        self.export_progress_bar.setVisible(False)
+        self.status_label.setText("Błąd eksportu.")
+        QMessageBox.critical(self, "Błąd zapisu", f"Nie udało się zapisać wykresów:\n{error_message}")
+
+    def load_spectrogram(self):
+        """Zwraca spektrogram aktywnego sygnału z cache lub liczy go i zapisuje w cache."""
+        # -------------> Spektrogram istnieje w wersji FFT i CQT - tryb zoom korzysta z liniowej
+        mode = 'cqt' if self.spectrum_mode == 'cqt' else 'fft'
+        params = {'kind': 'spectrogram', 'mode': mode}
+        use_cache = self.app_mode == 'file' and self.current_file and self.analysis_cache
+        if use_cache:
+            cached = self.analysis_cache.get(self.current_file, params)
+            if cached:
+                arrays, _ = cached
+                return arrays['freqs'], arrays['times'], arrays['spectrogram_db']
+
+        spectrogram = compute_spectrogram(self.ensure_samples_loaded(), self.current_fs, mode)
+        if use_cache:
+            freqs, times, spectrogram_db = spectrogram
+            self.analysis_cache.put(self.current_file, params,
+                                    {'freqs': freqs, 'times': times, 'spectrogram_db': spectrogram_db}, {})
+        return spectrogram
 
     def show_spectrogram(self):
-        if self.last_samples.size == 0: return
+        if not self.has_data(): return
+        try:
+            spectrogram = self.load_spectrogram()
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd", f"Nie udało się obliczyć spektrogramu:\n{e}")
+            return
         dialog = QDialog(self)
         dialog.setWindowTitle("Spektrogram")
         dialog.setMinimumSize(800, 600)
         fig = Figure(facecolor='black')
         canvas = FigureCanvas(fig)
         ax = fig.add_subplot(111)
-        plot_spectrogram(fig, ax, self.last_samples, self.current_fs)
+        mode = 'cqt' if self.spectrum_mode == 'cqt' else 'fft'
+        plot_spectrogram(fig, ax, self.last_samples, self.current_fs, mode=mode, spectrogram=spectrogram)
         save_button = QPushButton("💾 Zapisz spektrogram")
 
         def save_action():
             path, _ = QFileDialog.getSaveFileName(dialog, "Zapisz spektrogram jako...", "spektrogram.png",
                                                   "PNG Files (*.png);;JPEG Files (*.jpg *.jpeg);;SVG Files (*.svg)")
             if path:
-                try:
-                    fig.savefig(path, dpi=300, bbox_inches='tight')
-                    QMessageBox.information(dialog, "Sukces", f"Spektrogram zapisano do:\n{path}")
-                except Exception as e:
-                    QMessageBox.critical(dialog, "Błąd zapisu", f"Nie udało się zapisać pliku:\n{str(e)}")
+                fs = self.current_fs
+
+                def job(progress):
+                    render_spectrogram(spectrogram, fs, path, mode=mode, dpi=300)
+                    return f"Spektrogram zapisano do:\n{path}"
+
+                self.start_export(job, "Zapisywanie spektrogramu...")
 
         save_button.clicked.connect(save_action)
         layout = QVBoxLayout(dialog)
@@ -423,6 +1382,9 @@ class LiveAudioAnalyzer(QWidget):
         layout.addWidget(save_button)
         canvas.draw()
         dialog.exec()
+        # -------------> Dialog jest dzieckiem okna - bez tego każda figura spektrogramu zostaje w pamięci
+        fig.clear()
+        dialog.deleteLater()
 
     def on_recording_started(self):
         self.status_label.setText("Nagrywanie...")
@@ -437,16 +1399,73 @@ class LiveAudioAnalyzer(QWidget):
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
-            url = event.mimeData().urls()[0]
-            if url.isLocalFile() and url.toLocalFile().lower().endswith('.wav'):
-                event.acceptProposedAction()
+            for url in event.mimeData().urls():
+                path = url.toLocalFile() if url.isLocalFile() else ""
+                if path.lower().endswith('.wav') or os.path.isdir(path):
+                    event.acceptProposedAction()
+                    return
 
     def dropEvent(self, event):
-        filepath = event.mimeData().urls()[0].toLocalFile()
-        self.process_audio_file(filepath)
+        self.open_files([url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()])
+
+    def _set_views_visible(self, visible):
+        """
+        Zapisuje widoki na wyniki (lub je wypisuje, gdy okno jest ukryte). Plik przeanalizowany
+        przy ukrytym oknie jest analizowany ponownie po jego pokazaniu.
+        """
+        if visible == self.views_visible:
+            return
+        self.views_visible = visible
+        self.subscription_changed.emit('przebieg', TIME_VIEW_OUTPUTS if visible else None)
+        self.subscription_changed.emit('widmo', SPECTRUM_VIEW_OUTPUTS if visible else None)
+        if visible and self.app_mode == 'file' and self.last_results is not None \
+                and 'yf_db' not in self.last_results and self.last_samples.size > 0:
+            self.reanalyze()
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.WindowStateChange:
+            self.frame_scheduler.set_hidden(self.isMinimized())
+            self._set_views_visible(not self.isMinimized())
+        super().changeEvent(event)
+
+    def hideEvent(self, event):
+        self.frame_scheduler.set_hidden(True)
+        self._set_views_visible(False)
+        super().hideEvent(event)
+
+    def showEvent(self, event):
+        self.frame_scheduler.set_hidden(self.isMinimized())
+        self._set_views_visible(not self.isMinimized())
+        super().showEvent(event)
 
     def closeEvent(self, event):
         if self.is_recording: self.stop_recording()
+        if self.tone_generator.is_playing(): self.tone_generator.stop()
         self.thread.quit()
         self.thread.wait()
+        # -------------> Wątek workera już stoi - zamykamy zapis wyników bezpośrednio
+        self.worker.set_export_writer(None)
+        self.worker.set_stream_server(None)
+        if self.stream_server is not None:
+            self.stream_server.stop()
+        self.export_thread.quit()
+        self.export_thread.wait()
+        self.file_loader.cancel()
+        self.loader_thread.quit()
+        self.loader_thread.wait()
+        self.file_queue.shutdown()
+        self.measurement_worker.cancel()
+        self.measurement_thread.quit()
+        self.measurement_thread.wait()
+        self.comparison_thread.quit()
+        self.comparison_thread.wait()
+        self.memory_timer.stop()
+        if self.allocation_tracer:
+            print(self.memory_budget.report())
+            self.allocation_tracer.stop()
+        for path in self._spill_files:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Nie udało się usunąć pliku {path}: {e}")
         event.accept()
\ No newline at end of file
@@ -0,0 +1,97 @@
+from PySide6.QtCore import QObject, QTimer, Signal
+import time
+
+
+class FrameScheduler(QObject):
+    """
+    Zegar odświeżania wykresów dopasowujący się do zmierzonego kosztu klatki (analiza + rysowanie).
+    Interwał liczony jest od narysowania klatki do zlecenia następnej i dobierany tak, aby praca
+    nad klatkami zajmowała najwyżej target_load czasu, w granicach [min_interval, max_interval] ms.
+    Nowa klatka nie jest zlecana, dopóki poprzednia nie zostanie narysowana, więc wolna maszyna
+    nie buduje kolejki zaległych analiz.
+    Gdy okno jest ukryte lub zminimalizowane, odświeżanie zwalnia do hidden_interval,
+    a gdy na wejściu jest cisza (nie ma czego analizować) - do idle_interval.
+    """
+    frame_due = Signal()
+
+    def __init__(self, min_interval=33, max_interval=500, hidden_interval=1000, idle_interval=250,
+                 target_load=0.5, smoothing=0.2, stall_timeout=2.0, parent=None):
+        super().__init__(parent)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.hidden_interval = hidden_interval
+        self.idle_interval = idle_interval
+        self.target_load = target_load
+        self.smoothing = smoothing
+        self.stall_timeout = stall_timeout
+
+        self.hidden = False
+        self.idle = False
+        self.frame_cost = None  # -------------> Wygładzony (EMA) czas klatki w sekundach
+        self.frames_skipped = 0
+        self._frame_started_at = None
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._on_timeout)
+
+    def start(self):
+        self._frame_started_at = None
+        self.timer.start(self.interval())
+
+    def stop(self):
+        self.timer.stop()
+        self._frame_started_at = None
+
+    def isActive(self):
+        return self.timer.isActive()
+
+    def interval(self):
+        """Bieżący interwał odświeżania w ms."""
+        if self.hidden:
+            return self.hidden_interval
+        if self.idle:
+            return self.idle_interval
+        if self.frame_cost is None:
+            return 100
+        # -------------> Przerwa, przy której koszt / (koszt + przerwa) = target_load
+        interval = 1000 * self.frame_cost * (1.0 - self.target_load) / self.target_load
+        return int(min(max(interval, self.min_interval), self.max_interval))
+
+    def set_hidden(self, hidden):
+        if hidden != self.hidden:
+            self.hidden = hidden
+            if self.timer.isActive():
+                self.timer.setInterval(self.interval())
+
+    def set_idle(self, idle):
+        if idle != self.idle:
+            self.idle = idle
+            if self.timer.isActive():
+                self.timer.setInterval(self.interval())
+
+    def _on_timeout(self):
+        if self._frame_started_at is not None:
+            # -------------> Poprzednia klatka jeszcze w drodze - pomijamy tick (chyba że utknęła)
+            if time.perf_counter() - self._frame_started_at < self.stall_timeout:
+                self.frames_skipped += 1
+                return
+            self._frame_started_at = None
+        self.frame_due.emit()
+
+    def frame_started(self):
+        """Wywoływane, gdy klatka została zlecona do analizy."""
+        self._frame_started_at = time.perf_counter()
+
+    def frame_finished(self):
+        """Wywoływane po narysowaniu klatki - aktualizuje koszt klatki i interwał."""
+        if self._frame_started_at is None:
+            return
+        cost = time.perf_counter() - self._frame_started_at
+        self._frame_started_at = None
+        if self.frame_cost is None:
+            self.frame_cost = cost
+        else:
+            self.frame_cost += self.smoothing * (cost - self.frame_cost)
+        if self.timer.isActive():
+            # -------------> Restart odlicza interwał od końca klatki
+            self.timer.start(self.interval())
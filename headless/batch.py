@@ -0,0 +1,432 @@
+"""
+Tryb wsadowy bez GUI.
+Użycie:
+    python -m headless.batch analyze plik1.wav [plik2.wav ...] [--block-size N]
+    python -m headless.batch index katalog1 [katalog2 ...] [--db ścieżka] [--workers N]
+    python -m headless.batch search [--note A4] [--min-duration 2] [--max-lufs -14] ... [--db ścieżka]
+    python -m headless.batch onsets plik1.wav [plik2.wav ...] [--segments]
+    python -m headless.batch render plik1.wav [plik2.wav ...] --output katalog [--kinds waveform spectrum] [--workers N]
+    python -m headless.batch thd [--frequencies 1000 ...] [--sweep 20 20000 24] [--loopback [--speed 20]]
+                                 [--input-device N] [--output-device N] [--replay nagranie.wav ...]
+    python -m headless.batch compare referencja.wav plik1.wav [plik2.wav ...] [--max-lag 10] [--difference-dir katalog]
+    python -m headless.batch serve [--port 8765] [--device N] [--max-rate 20] [--seconds N]
+    python -m headless.batch listen [--port 8765] [--frames N] [--rate 5] [--types levels spectrum waterfall]
+    python -m headless.batch monitor --rule "level>-6" [--rule "band:45-65>-50@2" ...] [--events-file plik.jsonl]
+                                     [--udp 127.0.0.1:9000] [--device N] [--seconds N] [--replay nagranie.wav ...]
+Wyniki są wypisywane jako jedna linia JSON na plik.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+from audio.loader import iter_wav_blocks
+from dsp.loudness import LoudnessMeter
+from dsp.stats import RunningStats
+from dsp.onsets import OnsetDetector, segment_boundaries
+from plots.plot_utils import frequency_to_note
+
+
+def _to_json(value):
+    # -------------> -inf (cisza) nie jest poprawnym JSON-em - zamieniamy na null
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    return value
+
+
+def analyze_file(filepath, block_size=65536):
+    """
+    Analizuje plik WAV blokami, bez wczytywania go w całości.
+    Zwraca słownik z pomiarami głośności, statystykami sygnału oraz dominującą częstotliwością
+    wyznaczoną z widma mocy uśrednionego po blokach.
+    """
+    sample_rate = None
+    meter = None
+    stats = None
+    window = np.hanning(block_size)
+    power_sum = np.zeros(block_size // 2 + 1)
+    for sample_rate, block in iter_wav_blocks(filepath, block_size):
+        if meter is None:
+            meter = LoudnessMeter(sample_rate, block.shape[1] if block.ndim > 1 else 1)
+            stats = RunningStats(sample_rate)
+        meter.process(block)
+        stats.update(block)
+
+        mono = block.mean(axis=1) if block.ndim > 1 else block
+        frame = np.zeros(block_size)
+        frame[:len(mono)] = mono
+        power_sum += np.abs(np.fft.rfft(frame * window)) ** 2
+
+    results = {
+        'file': filepath,
+        'sample_rate': sample_rate,
+        'duration': meter.samples_processed / sample_rate if meter else 0.0
+    }
+    if meter:
+        results.update(meter.get_results())
+        results.update({key: value for key, value in stats.get_results().items() if key != 'samples'})
+        dominant_freq = float(np.fft.rfftfreq(block_size, 1 / sample_rate)[np.argmax(power_sum[1:]) + 1])
+        results['dominant_freq'] = dominant_freq
+        results['note'] = frequency_to_note(dominant_freq)
+    return results
+
+
+def detect_file_onsets(filepath, block_size=65536, **detector_options):
+    """
+    Wykrywa onsety w pliku WAV blokami (bez wczytywania całości).
+    Zwraca słownik z czasami onsetów [s] i segmentami [(początek, koniec)] między nimi.
+    """
+    detector = None
+    samples = 0
+    sample_rate = None
+    for sample_rate, block in iter_wav_blocks(filepath, block_size):
+        if detector is None:
+            detector = OnsetDetector(sample_rate, **detector_options)
+        detector.process(block)
+        samples += len(block)
+    onsets = detector.onsets if detector else []
+    duration = samples / sample_rate if sample_rate else 0.0
+    return {'file': filepath, 'duration': duration, 'onsets': onsets,
+            'segments': segment_boundaries(onsets, duration)}
+
+
+def comparison_json(result):
+    """Wynik compare_signals bez tablic (sygnału różnicowego i widm)."""
+    return _to_json({key: value for key, value in result.items() if key not in ('difference', 'spectrum')})
+
+
+def measurement_json(result):
+    """Wynik harmonic_analysis bez widma (do wypisania jako JSON)."""
+    return _to_json({key: value for key, value in result.items() if key != 'spectrum'})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m headless.batch", description="Analiza plików WAV bez GUI")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    analyze_parser = subparsers.add_parser('analyze', help="Pomiary głośności i statystyki plików")
+    analyze_parser.add_argument('files', nargs='+')
+    analyze_parser.add_argument('--block-size', type=int, default=65536)
+
+    index_parser = subparsers.add_parser('index', help="Przyrostowa indeksacja katalogów do bazy SQLite")
+    index_parser.add_argument('directories', nargs='+')
+    index_parser.add_argument('--db', default=None)
+    index_parser.add_argument('--workers', type=int, default=None)
+
+    search_parser = subparsers.add_parser('search', help="Wyszukiwanie plików w indeksie")
+    search_parser.add_argument('--db', default=None)
+    search_parser.add_argument('--min-duration', type=float)
+    search_parser.add_argument('--max-duration', type=float)
+    search_parser.add_argument('--sample-rate', type=int)
+    search_parser.add_argument('--min-lufs', type=float)
+    search_parser.add_argument('--max-lufs', type=float)
+    search_parser.add_argument('--min-freq', type=float)
+    search_parser.add_argument('--max-freq', type=float)
+    search_parser.add_argument('--note')
+    search_parser.add_argument('--limit', type=int, default=100)
+
+    onsets_parser = subparsers.add_parser('onsets', help="Wykrywanie onsetów i podział na segmenty")
+    onsets_parser.add_argument('files', nargs='+')
+    onsets_parser.add_argument('--block-size', type=int, default=65536)
+    onsets_parser.add_argument('--segments', action='store_true', help="Dołącz segmenty między onsetami")
+
+    render_parser = subparsers.add_parser('render', help="Równoległy eksport wykresów do plików graficznych")
+    render_parser.add_argument('files', nargs='+')
+    render_parser.add_argument('--output', required=True)
+    render_parser.add_argument('--kinds', nargs='+', choices=['waveform', 'spectrum', 'spectrogram'], default=None)
+    render_parser.add_argument('--dpi', type=int, default=150)
+    render_parser.add_argument('--format', default='png')
+    render_parser.add_argument('--workers', type=int, default=None)
+
+    thd_parser = subparsers.add_parser('thd', help="Pomiar THD, THD+N, SNR i harmonicznych (generator -> wejście)")
+    thd_parser.add_argument('--frequencies', type=float, nargs='+', default=None)
+    thd_parser.add_argument('--sweep', type=float, nargs=3, metavar=('START', 'END', 'POINTS'), default=None)
+    thd_parser.add_argument('--loopback', action='store_true', help="Wirtualna pętla zwrotna zamiast karty dźwiękowej")
+    thd_parser.add_argument('--speed', type=float, default=1.0, help="Tempo pętli zwrotnej (1 = czas rzeczywisty)")
+    thd_parser.add_argument('--input-device', type=int, default=None)
+    thd_parser.add_argument('--output-device', type=int, default=None)
+    thd_parser.add_argument('--sample-rate', type=int, default=44100)
+    thd_parser.add_argument('--amplitude', type=float, default=0.5)
+    thd_parser.add_argument('--n-fft', type=int, default=4096)
+    thd_parser.add_argument('--frames', type=int, default=8)
+    thd_parser.add_argument('--harmonics', type=int, default=10)
+    thd_parser.add_argument('--replay', nargs='+', default=None, help="Zmierz nagrane pliki WAV zamiast grać bodziec")
+
+    compare_parser = subparsers.add_parser('compare', help="Wyrównanie i porównanie plików z referencją")
+    compare_parser.add_argument('reference')
+    compare_parser.add_argument('files', nargs='+')
+    compare_parser.add_argument('--max-lag', type=float, default=10.0, help="Zakres szukania przesunięcia [s]")
+    compare_parser.add_argument('--difference-dir', default=None, help="Zapisz sygnały różnicowe jako WAV")
+
+    serve_parser = subparsers.add_parser('serve', help="Analiza wejścia na żywo i strumieniowanie wyników przez TCP")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=None, help="Domyślnie AUDIO_ANALYZER_STREAM_PORT lub 8765")
+    serve_parser.add_argument('--device', type=int, default=None)
+    serve_parser.add_argument('--sample-rate', type=int, default=44100)
+    serve_parser.add_argument('--window', type=float, default=1.0, help="Długość analizowanego okna [s]")
+    serve_parser.add_argument('--interval', type=float, default=0.05, help="Odstęp między analizami [s]")
+    serve_parser.add_argument('--max-rate', type=float, default=20.0, help="Limit aktualizacji na klienta [1/s]")
+    serve_parser.add_argument('--seconds', type=float, default=None, help="Czas działania (domyślnie do Ctrl+C)")
+
+    listen_parser = subparsers.add_parser('listen', help="Klient testowy strumienia - ramki jako JSON")
+    listen_parser.add_argument('--host', default='127.0.0.1')
+    listen_parser.add_argument('--port', type=int, default=None)
+    listen_parser.add_argument('--frames', type=int, default=None, help="Zakończ po N ramkach")
+    listen_parser.add_argument('--rate', type=int, default=0, help="Żądany limit aktualizacji [1/s]")
+    listen_parser.add_argument('--types', nargs='+', choices=['levels', 'spectrum', 'waterfall'], default=None)
+
+    monitor_parser = subparsers.add_parser('monitor', help="Demon progowy: reguły na wejściu, zdarzenia jako JSON")
+    monitor_parser.add_argument('--rule', dest='rules', action='append', required=True,
+                                help="Np. level>-6, peak>-1, clip>0, band:45-65>-50@2, silence>30 (@ - podtrzymanie [s])")
+    monitor_parser.add_argument('--device', type=int, default=None)
+    monitor_parser.add_argument('--sample-rate', type=int, default=44100)
+    monitor_parser.add_argument('--block', type=float, default=0.1, help="Długość bloku sprawdzania reguł [s]")
+    monitor_parser.add_argument('--interval', type=float, default=0.25, help="Odstęp między odczytami wejścia [s]")
+    monitor_parser.add_argument('--level-window', type=float, default=1.0, help="Okno poziomu i szczytu [s]")
+    monitor_parser.add_argument('--silence-threshold', type=float, default=-60.0, help="Próg ciszy [dBFS]")
+    monitor_parser.add_argument('--events-file', default=None, help="Dopisuj zdarzenia do pliku (JSON Lines)")
+    monitor_parser.add_argument('--udp', default=None, metavar='HOST:PORT', help="Wysyłaj zdarzenia jako datagramy UDP")
+    monitor_parser.add_argument('--quiet', action='store_true', help="Bez zdarzeń na stdout")
+    monitor_parser.add_argument('--seconds', type=float, default=None, help="Czas działania (domyślnie do Ctrl+C)")
+    monitor_parser.add_argument('--replay', nargs='+', default=None, help="Sprawdź reguły na plikach WAV")
+
+    args = parser.parse_args(argv)
+    status = 0
+    if args.command == 'analyze':
+        for filepath in args.files:
+            try:
+                print(json.dumps(_to_json(analyze_file(filepath, args.block_size))))
+            except Exception as e:
+                print(f"Błąd podczas analizy pliku {filepath}: {e}", file=sys.stderr)
+                status = 1
+    elif args.command == 'onsets':
+        for filepath in args.files:
+            try:
+                result = detect_file_onsets(filepath, args.block_size)
+                if not args.segments:
+                    del result['segments']
+                print(json.dumps(result))
+            except Exception as e:
+                print(f"Błąd podczas wykrywania onsetów w pliku {filepath}: {e}", file=sys.stderr)
+                status = 1
+    elif args.command in ('index', 'search'):
+        # -------------> Import lokalny - storage.index sam korzysta z analyze_file
+        from storage.index import FeatureIndex, DEFAULT_INDEX_PATH
+        index = FeatureIndex(args.db or DEFAULT_INDEX_PATH)
+        try:
+            if args.command == 'index':
+                print(json.dumps(index.update(args.directories, workers=args.workers)))
+            else:
+                rows = index.search(args.min_duration, args.max_duration, args.sample_rate, args.min_lufs,
+                                    args.max_lufs, args.min_freq, args.max_freq, args.note, args.limit)
+                for row in rows:
+                    print(json.dumps(row))
+        finally:
+            index.close()
+    elif args.command == 'render':
+        # -------------> Import lokalny - matplotlib ładujemy tylko, gdy rysujemy
+        from plots.export import export_batch
+
+        def report(done, total):
+            print(f"{done}/{total}", file=sys.stderr)
+
+        summary = export_batch(args.files, args.output, args.kinds, args.dpi, args.format, args.workers, report)
+        print(json.dumps(summary))
+        status = 1 if summary['errors'] else 0
+    elif args.command == 'thd':
+        status = _run_thd(args)
+    elif args.command == 'serve':
+        status = _run_serve(args)
+    elif args.command == 'listen':
+        status = _run_listen(args)
+    elif args.command == 'monitor':
+        status = _run_monitor(args)
+    elif args.command == 'compare':
+        from audio.measurement import compare_files
+        for filepath in args.files:
+            try:
+                result = compare_files(args.reference, filepath, args.max_lag)
+                if args.difference_dir:
+                    from audio.saver import save_wav
+                    name = os.path.splitext(os.path.basename(filepath))[0]
+                    result['difference_file'] = os.path.join(args.difference_dir, f"{name}_roznica.wav")
+                    save_wav(result['difference_file'], result['difference'], result['sample_rate'])
+                print(json.dumps(comparison_json(result)))
+            except Exception as e:
+                print(f"Błąd porównania pliku {filepath}: {e}", file=sys.stderr)
+                status = 1
+    return status
+
+
+def _run_thd(args):
+    # -------------> Import lokalny - urządzenia audio otwieramy tylko przy pomiarze
+    from audio.backends import VirtualBackend, get_default_backend
+    from audio.loader import load_wav
+    from audio.measurement import ThdMeasurement, measure_recording, sweep_frequencies
+
+    status = 0
+    if args.replay:
+        frequency = args.frequencies[0] if args.frequencies else None
+        for filepath in args.replay:
+            try:
+                samples, sample_rate, _ = load_wav(filepath)
+                result = measure_recording(samples, sample_rate, frequency, n_harmonics=args.harmonics)
+                print(json.dumps({'file': filepath, **measurement_json(result)}))
+            except Exception as e:
+                print(f"Błąd pomiaru pliku {filepath}: {e}", file=sys.stderr)
+                status = 1
+        return status
+
+    if args.sweep:
+        start, end, points = args.sweep
+        frequencies = sweep_frequencies(start, end, int(points), args.sample_rate)
+    else:
+        frequencies = args.frequencies or [1000.0]
+    if args.loopback:
+        backend = VirtualBackend(speed=args.speed, samplerate=args.sample_rate)
+        input_device = len(backend.sources) - 1
+    else:
+        backend = get_default_backend()
+        input_device = args.input_device
+    measurement = ThdMeasurement(backend, args.sample_rate, args.n_fft, args.frames, args.amplitude,
+                                 n_harmonics=args.harmonics, input_device=input_device,
+                                 output_device=args.output_device)
+    try:
+        for result in measurement.sweep(frequencies):
+            print(json.dumps(measurement_json(result)))
+    except Exception as e:
+        print(f"Błąd pomiaru: {e}", file=sys.stderr)
+        status = 1
+    return status
+
+
+def _run_serve(args):
+    # -------------> Import lokalny - wejście audio i wątki serwera uruchamiamy tylko w tym trybie
+    from audio.recorder import AudioRecorder
+    from storage.stream import SpectrumServer, port_from_environment
+    from threads.worker import AnalysisWorker
+
+    fs = args.sample_rate
+    server = SpectrumServer(args.host, args.port if args.port is not None else port_from_environment(),
+                            max_rate=args.max_rate)
+    server.sample_rate = fs
+    server.start()
+    worker = AnalysisWorker()
+    worker.set_stream_server(server)
+    recorder = AudioRecorder(fs)
+    recorder.start(args.window, device_id=args.device, continuous=True)
+    deadline = time.monotonic() + args.seconds if args.seconds else None
+    last_position = 0
+    analyses = 0
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            time.sleep(args.interval)
+            samples = recorder.get_full_recording()
+            position = recorder.get_total_frames()
+            # -------------> Bez nowych próbek nie ma czego publikować
+            if position == last_position or samples.size == 0:
+                continue
+            last_position = position
+            worker.analyze(samples, fs, position)
+            analyses += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.stop()
+        clients = server.client_stats()
+        server.stop()
+    print(json.dumps({'analyses': analyses, 'clients': clients}))
+    return 0
+
+
+def _run_listen(args):
+    from storage.stream import (StreamClient, port_from_environment, ALL_FRAMES, FRAME_HELLO, FRAME_LEVELS,
+                                FRAME_SPECTRUM, FRAME_WATERFALL)
+
+    types = {'levels': FRAME_LEVELS, 'spectrum': FRAME_SPECTRUM, 'waterfall': FRAME_WATERFALL}
+    names = {FRAME_HELLO: 'hello', FRAME_LEVELS: 'levels', FRAME_SPECTRUM: 'spectrum', FRAME_WATERFALL: 'waterfall'}
+    mask = sum(1 << types[name] for name in args.types) if args.types else ALL_FRAMES
+    client = StreamClient(args.host, args.port if args.port is not None else port_from_environment())
+    client.subscribe(mask, args.rate)
+    received = 0
+    try:
+        while args.frames is None or received < args.frames:
+            frame_type, sequence, timestamp, data = client.read_frame()
+            if 'levels_db' in data:
+                # -------------> Zamiast całej tablicy: liczba pasm i najgłośniejsze pasmo
+                levels = data.pop('levels_db')
+                peak = int(np.argmax(levels))
+                if data.get('log_scale', True):
+                    edges = np.geomspace(data['f_min'], data['f_max'], len(levels) + 1)
+                    center = math.sqrt(edges[peak] * edges[peak + 1])
+                else:
+                    center = data['f_min'] + (peak + 0.5) * (data['f_max'] - data['f_min']) / len(levels)
+                data.update({'bands': len(levels), 'peak_db': float(levels[peak]), 'peak_frequency': center})
+            print(json.dumps(_to_json({'type': names.get(frame_type, frame_type), 'sequence': sequence,
+                                       'time': timestamp, **data})))
+            received += 1
+    except (KeyboardInterrupt, ConnectionError):
+        pass
+    finally:
+        client.close()
+    return 0
+
+
+def _run_monitor(args):
+    from headless.daemon import EventWriter, ThresholdMonitor, parse_rule, replay_file, run_monitor
+
+    try:
+        rules = [parse_rule(spec) for spec in args.rules]
+        udp_address = None
+        if args.udp:
+            host, _, port = args.udp.rpartition(':')
+            udp_address = (host or '127.0.0.1', int(port))
+    except ValueError as e:
+        print(f"Błąd konfiguracji monitora: {e}", file=sys.stderr)
+        return 2
+    options = {'block_seconds': args.block, 'level_window': args.level_window,
+               'silence_threshold_db': args.silence_threshold}
+    writer = EventWriter(args.events_file, udp_address, stdout=not args.quiet)
+    status = 0
+    try:
+        if args.replay:
+            for filepath in args.replay:
+                try:
+                    # -------------> Każdy plik od nowa: reguły bez stanu z poprzedniego pliku
+                    summary = replay_file(filepath, [parse_rule(spec) for spec in args.rules], writer, **options)
+                    print(json.dumps(summary), file=sys.stderr)
+                except Exception as e:
+                    print(f"Błąd monitorowania pliku {filepath}: {e}", file=sys.stderr)
+                    status = 1
+            return status
+
+        import signal
+        from audio.recorder import AudioRecorder
+
+        def terminate(signum, frame):
+            raise KeyboardInterrupt
+
+        # -------------> Demon zatrzymywany przez SIGTERM kończy się jak po Ctrl+C (z podsumowaniem)
+        signal.signal(signal.SIGTERM, terminate)
+        monitor = ThresholdMonitor(args.sample_rate, rules, **options)
+        recorder = AudioRecorder(args.sample_rate)
+        # -------------> Tryb ciągły z krótką historią - pamięć nie rośnie przy wielodniowej pracy
+        recorder.start(max(args.interval, args.block) * 4, device_id=args.device, continuous=True)
+        try:
+            summary = run_monitor(recorder, monitor, writer, args.interval, args.seconds)
+        finally:
+            recorder.stop()
+        print(json.dumps(summary), file=sys.stderr)
+    finally:
+        writer.close()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
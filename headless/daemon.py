@@ -0,0 +1,261 @@
+"""
+Demon monitorujący wejście audio bez GUI: reguły progowe (poziom, szczyt, przester, energia pasma,
+czas ciszy) są sprawdzane na każdym bloku, a przekroczenia trafiają jako zdarzenia JSON na stdout,
+do pliku i/lub na lokalny port UDP. Liczone są tylko statystyki przyrostowe i energia pasm
+(filtry IIR ze stanem) - bez FFT i bez rysowania, więc demon zajmuje ułamek rdzenia.
+Użycie: python -m headless.batch monitor --rule "level>-6" --rule "band:45-65>-50@2" --rule "silence>30"
+"""
+import json
+import re
+import socket
+import time
+from datetime import datetime
+
+import numpy as np
+from scipy.signal import butter, sosfilt
+
+from audio.loader import iter_wav_blocks
+from dsp.gate import SilenceGate, DEFAULT_THRESHOLD_DB
+from dsp.stats import RunningStats
+
+METRICS = ('level', 'peak', 'clip', 'band', 'silence')
+# -------------> Metryki w dBFS gaszą alarm dopiero po powrocie o DEFAULT_HYSTERESIS_DB poza próg
+DB_METRICS = ('level', 'peak', 'band')
+DEFAULT_HYSTERESIS_DB = 3.0
+DEFAULT_BLOCK_SECONDS = 0.1
+
+_RULE_PATTERN = re.compile(r"^\s*(level|peak|clip|silence|band:(\d+(?:\.\d+)?)-(\d+(?:\.\d+)?))\s*([<>])\s*"
+                           r"(-?\d+(?:\.\d+)?)\s*(?:@\s*(\d+(?:\.\d+)?))?\s*$")
+
+
+def _db(value):
+    return float(20 * np.log10(max(value, 1e-10)))
+
+
+class Rule:
+    """
+    Reguła progowa: metric op threshold, np. level > -6 dBFS. Alarm zgłaszany jest, gdy warunek trwa
+    co najmniej hold_seconds, a odwoływany, gdy wartość wróci poza próg o hysteresis - tylko zmiany
+    stanu są zdarzeniami, więc wartość drgająca przy progu nie zasypuje logu.
+    Metryki: level (RMS okna, dBFS), peak (szczyt okna, dBFS), clip (przesterowane próbki w bloku),
+    band (RMS pasma band=(f_min, f_max) w bloku, dBFS), silence (czas trwającej ciszy w sekundach).
+    """
+
+    def __init__(self, metric, op, threshold, band=None, hold_seconds=0.0, hysteresis=None, name=None):
+        if metric not in METRICS:
+            raise ValueError(f"Nieznana metryka reguły: '{metric}'")
+        if op not in ('>', '<'):
+            raise ValueError(f"Nieznany operator reguły: '{op}'")
+        if metric == 'band' and (band is None or not 0 < band[0] < band[1]):
+            raise ValueError("Reguła 'band' wymaga pasma f_min-f_max (0 < f_min < f_max)")
+        self.metric = metric
+        self.op = op
+        self.threshold = float(threshold)
+        self.band = tuple(band) if band is not None else None
+        self.hold_seconds = float(hold_seconds)
+        self.hysteresis = float(hysteresis if hysteresis is not None else
+                                DEFAULT_HYSTERESIS_DB if metric in DB_METRICS else 0.0)
+        self.name = name or self._describe()
+        self.active = False
+        self._exceeded_since = None
+
+    def _describe(self):
+        metric = f"band:{self.band[0]:g}-{self.band[1]:g}" if self.metric == 'band' else self.metric
+        hold = f"@{self.hold_seconds:g}" if self.hold_seconds else ""
+        return f"{metric}{self.op}{self.threshold:g}{hold}"
+
+    def check(self, value, timestamp):
+        """Zwraca 'alarm' lub 'clear' przy zmianie stanu reguły, w pozostałych przypadkach None."""
+        if not self.active:
+            exceeded = value > self.threshold if self.op == '>' else value < self.threshold
+            if not exceeded:
+                self._exceeded_since = None
+                return None
+            if self._exceeded_since is None:
+                self._exceeded_since = timestamp
+            if timestamp - self._exceeded_since >= self.hold_seconds:
+                self.active = True
+                return 'alarm'
+            return None
+        cleared = (value <= self.threshold - self.hysteresis if self.op == '>'
+                   else value >= self.threshold + self.hysteresis)
+        if cleared:
+            self.active = False
+            self._exceeded_since = None
+            return 'clear'
+        return None
+
+
+def parse_rule(spec):
+    """
+    Reguła z zapisu tekstowego: metryka, operator, próg i opcjonalnie @czas podtrzymania [s],
+    np. "level>-6", "peak>-1", "clip>0", "band:45-65>-50@2", "silence>30", "level<-70@10".
+    """
+    match = _RULE_PATTERN.match(spec)
+    if match is None:
+        raise ValueError(f"Niepoprawna reguła: '{spec}' (oczekiwano np. level>-6, band:45-65>-50@2, silence>30)")
+    metric, band_min, band_max, op, threshold, hold = match.groups()
+    band = None
+    if metric.startswith('band'):
+        metric, band = 'band', (float(band_min), float(band_max))
+    return Rule(metric, op, float(threshold), band, float(hold) if hold else 0.0, name=spec.replace(' ', ''))
+
+
+class ThresholdMonitor:
+    """
+    Sprawdza reguły na kolejnych blokach wejścia. Liczy tylko to, czego reguły potrzebują:
+    RunningStats (poziom i szczyt okna level_window, przester), filtr pasmowy Butterwortha ze stanem
+    dla każdego pasma i bramkę ciszy z histerezą dla reguł 'silence'. Czas zdarzeń to pozycja
+    w strumieniu (sekundy od startu), więc nagranie odtworzone z pliku daje te same zdarzenia co na żywo.
+    """
+
+    def __init__(self, fs, rules, block_seconds=DEFAULT_BLOCK_SECONDS, level_window=1.0,
+                 silence_threshold_db=DEFAULT_THRESHOLD_DB, clip_threshold=0.999):
+        self.fs = fs
+        self.rules = list(rules)
+        self.block_size = max(1, int(round(block_seconds * fs)))
+        self.stats = RunningStats(fs, level_window, clip_threshold)
+        self._bands = {}
+        for rule in self.rules:
+            if rule.metric == 'band' and rule.band not in self._bands:
+                f_max = min(rule.band[1], 0.49 * fs)
+                if rule.band[0] >= f_max:
+                    raise ValueError(f"Pasmo reguły '{rule.name}' leży powyżej częstotliwości Nyquista")
+                sos = butter(4, [rule.band[0], f_max], btype='bandpass', fs=fs, output='sos')
+                self._bands[rule.band] = [sos, np.zeros((sos.shape[0], 2))]
+        self.gate = SilenceGate(fs, silence_threshold_db) if any(r.metric == 'silence' for r in self.rules) else None
+        self._silence_started = None
+        self._pending = None  # -------------> Niepełny blok czekający na kolejne próbki
+        self.position = 0
+        self.blocks = 0
+        self.values = {}
+
+    @property
+    def stream_time(self):
+        return self.position / self.fs
+
+    def process(self, samples):
+        """
+        Przetwarza nowe próbki dowolnej długości i zwraca listę zdarzeń. Reguły są sprawdzane na pełnych
+        blokach block_size - reszta czeka na kolejne próbki, więc wynik nie zależy od podziału wejścia.
+        """
+        samples = np.asarray(samples)
+        if self._pending is not None:
+            samples = np.concatenate((self._pending, samples))
+            self._pending = None
+        events = []
+        complete = len(samples) - len(samples) % self.block_size
+        for start in range(0, complete, self.block_size):
+            events.extend(self._process_block(samples[start:start + self.block_size]))
+        if complete < len(samples):
+            self._pending = samples[complete:]
+        return events
+
+    def _process_block(self, block):
+        clip_before = self.stats.clip_count
+        self.stats.update(block)
+        self.position += len(block)
+        self.blocks += 1
+        timestamp = self.stream_time
+
+        stats = self.stats.get_results()
+        values = {'level': _db(stats['window_rms']), 'peak': _db(stats['window_peak']),
+                  'clip': self.stats.clip_count - clip_before}
+        if self._bands:
+            mono = block.mean(axis=1) if block.ndim > 1 else block
+            band_levels = {}
+            for band, state in self._bands.items():
+                filtered, state[1] = sosfilt(state[0], mono, zi=state[1])
+                band_levels[band] = _db(np.sqrt(np.dot(filtered, filtered) / len(filtered)))
+            values['band'] = band_levels
+        if self.gate is not None:
+            if self.gate.process(block):
+                self._silence_started = None
+            elif self._silence_started is None:
+                # -------------> Bramka zamyka się po czasie podtrzymania - cisza trwa już tyle dłużej
+                self._silence_started = timestamp - self.gate.hold_frames / self.fs
+            values['silence'] = timestamp - self._silence_started if self._silence_started is not None else 0.0
+        self.values = values
+
+        events = []
+        for rule in self.rules:
+            value = values['band'][rule.band] if rule.metric == 'band' else values[rule.metric]
+            change = rule.check(value, timestamp)
+            if change is not None:
+                events.append({'event': change, 'rule': rule.name, 'value': round(float(value), 2),
+                               'threshold': rule.threshold, 'stream_time': round(timestamp, 3),
+                               'time': datetime.now().isoformat(timespec='milliseconds')})
+        return events
+
+
+class EventWriter:
+    """
+    Zapisuje zdarzenia jako linie JSON: na stdout, dopisuje do pliku (zapis od razu na dysk)
+    i/lub wysyła jako datagramy UDP na udp_address (host, port). UDP nie wymaga połączenia
+    ani odbiorcy, więc wolny lub nieobecny słuchacz nigdy nie wstrzymuje monitorowania.
+    """
+
+    def __init__(self, path=None, udp_address=None, stdout=True):
+        self.stdout = stdout
+        self.file = open(path, 'a', encoding='utf-8') if path else None
+        self.udp_address = udp_address
+        self.socket = None
+        if udp_address:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.setblocking(False)
+        self.count = 0
+
+    def write(self, event):
+        line = json.dumps(event)
+        self.count += 1
+        if self.stdout:
+            print(line, flush=True)
+        if self.file:
+            self.file.write(line + "\n")
+            self.file.flush()
+        if self.socket:
+            try:
+                self.socket.sendto(line.encode('utf-8'), self.udp_address)
+            except OSError as e:
+                print(f"Błąd wysyłania zdarzenia UDP: {e}")
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+
+
+def run_monitor(recorder, monitor, writer, interval=0.25, seconds=None):
+    """
+    Pętla demona: co interval sekund odbiera nowe próbki z uruchomionego AudioRecorder i sprawdza
+    reguły. Kończy się po seconds (None - do KeyboardInterrupt). Zwraca podsumowanie z zużyciem CPU.
+    """
+    started, cpu_started = time.monotonic(), time.process_time()
+    deadline = started + seconds if seconds else None
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            time.sleep(interval)
+            samples = recorder.get_realtime_buffer()
+            if samples.size:
+                for event in monitor.process(samples):
+                    writer.write(event)
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.monotonic() - started
+    return {'blocks': monitor.blocks, 'events': writer.count, 'stream_seconds': round(monitor.stream_time, 3),
+            'cpu_percent': round(100 * (time.process_time() - cpu_started) / elapsed, 2) if elapsed else 0.0}
+
+
+def replay_file(filepath, rules, writer, **monitor_options):
+    """Sprawdza reguły na pliku WAV czytanym blokami (test reguł bez wejścia audio). Zwraca podsumowanie."""
+    monitor = None
+    for sample_rate, block in iter_wav_blocks(filepath):
+        if monitor is None:
+            monitor = ThresholdMonitor(sample_rate, rules, **monitor_options)
+        for event in monitor.process(block):
+            writer.write({'file': filepath, **event})
+    return {'file': filepath, 'blocks': monitor.blocks if monitor else 0,
+            'stream_seconds': round(monitor.stream_time, 3) if monitor else 0.0}
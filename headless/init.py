@@ -0,0 +1,5 @@
+from .batch import analyze_file, detect_file_onsets
+from .daemon import ThresholdMonitor, Rule, parse_rule, EventWriter, run_monitor, replay_file
+
+__all__ = ['analyze_file', 'detect_file_onsets', 'ThresholdMonitor', 'Rule', 'parse_rule', 'EventWriter',
+           'run_monitor', 'replay_file']
@@ -0,0 +1,150 @@
+"""
+Eksport wykresów bez udziału GUI: figury są rysowane od nowa na płótnie Agg, więc można
+je renderować w wątku roboczym lub w osobnych procesach (eksport wsadowy wielu plików).
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from audio.loader import load_wav
+from dsp.loudness import LoudnessMeter
+from dsp.stats import RunningStats
+from dsp.welch import welch_psd
+from dsp.onsets import OnsetDetector
+from plots.plot_utils import (plot_frequency_domain, plot_envelope, plot_spectrogram, compute_envelope,
+                              compute_spectrogram, frequency_to_note, setup_plot_style)
+
+EXPORT_KINDS = ['waveform', 'spectrum', 'spectrogram']
+
+
+def _new_figure(rows=1, figsize=(12, 8)):
+    fig = Figure(facecolor='black', figsize=figsize, tight_layout=True)
+    FigureCanvasAgg(fig)
+    axes = [fig.add_subplot(rows, 1, row + 1) for row in range(rows)]
+    return fig, axes
+
+
+def _draw_waveform(ax, snapshot):
+    if 'env_min' not in snapshot:
+        snapshot['env_min'], snapshot['env_max'] = compute_envelope(snapshot['samples'])
+    plot_envelope(ax, snapshot['env_min'], snapshot['env_max'], snapshot['duration'], snapshot['rms'],
+                  snapshot['peak'], snapshot.get('loudness'), snapshot.get('stats'), snapshot.get('start_time', 0.0),
+                  snapshot.get('onsets'), snapshot.get('silent_regions'))
+
+
+def _draw_spectrum(ax, snapshot):
+    spectrum_mode = snapshot.get('spectrum_mode')
+    plot_frequency_domain(ax, snapshot['xf'], snapshot['yf_db'], snapshot['dominant_freq'], snapshot['note'],
+                          snapshot['fs'], log_scale=(spectrum_mode == 'cqt'), freq_range=snapshot.get('freq_range'),
+                          ylabel="Gęstość mocy [dB/Hz]" if spectrum_mode == 'welch' else "Amplituda [dB]")
+
+
+def render_analysis(snapshot, path, dpi=300, progress=None):
+    """
+    Zapisuje przebieg czasowy i widmo (układ jak w oknie głównym) do pliku graficznego.
+    snapshot to słownik z wynikami analizy: próbki ('samples') albo obwiednia ('env_min', 'env_max'),
+    'duration', 'rms', 'peak', 'xf', 'yf_db', 'dominant_freq', 'note', 'fs' i opcjonalnie
+    'start_time', 'loudness', 'stats', 'spectrum_mode', 'freq_range', 'onsets', 'silent_regions'.
+    progress(krok, liczba_kroków) jest wywoływane po każdym etapie.
+    """
+    report = progress or (lambda done, total: None)
+    fig, (ax_time, ax_fft) = _new_figure(rows=2)
+    _draw_waveform(ax_time, snapshot)
+    report(1, 3)
+    _draw_spectrum(ax_fft, snapshot)
+    report(2, 3)
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    report(3, 3)
+    return path
+
+
+def render_spectrogram(spectrogram, fs, path, mode='fft', dpi=300):
+    """Zapisuje gotowy wynik compute_spectrogram do pliku graficznego."""
+    fig, (ax,) = _new_figure(figsize=(12, 6))
+    plot_spectrogram(fig, ax, np.array([]), fs, mode=mode, spectrogram=spectrogram)
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    return path
+
+
+def render_file(filepath, output_dir, kinds=None, dpi=150, image_format='png'):
+    """
+    Analizuje plik WAV i zapisuje wybrane wykresy (EXPORT_KINDS) jako
+    <katalog>/<nazwa>_<rodzaj>.<format>. Widmo to uśredniona PSD metody Welcha.
+    Zwraca listę zapisanych ścieżek.
+    """
+    kinds = kinds or EXPORT_KINDS
+    setup_plot_style()
+    samples, fs, _ = load_wav(filepath)
+    base = os.path.join(output_dir, os.path.splitext(os.path.basename(filepath))[0])
+    snapshot = {'samples': samples, 'fs': fs, 'duration': len(samples) / fs}
+    paths = []
+
+    if 'waveform' in kinds or 'spectrum' in kinds:
+        stats = RunningStats(fs)
+        stats.update(samples)
+        meter = LoudnessMeter(fs, 1)
+        meter.process(samples)
+        snapshot['stats'] = stats.get_results()
+        snapshot['loudness'] = meter.get_results()
+        snapshot['rms'] = snapshot['stats']['rms']
+        snapshot['peak'] = snapshot['stats']['peak']
+
+    if 'waveform' in kinds:
+        detector = OnsetDetector(fs)
+        detector.process(samples)
+        snapshot['onsets'] = detector.onsets
+        fig, (ax,) = _new_figure(figsize=(12, 4))
+        _draw_waveform(ax, snapshot)
+        paths.append(f"{base}_waveform.{image_format}")
+        fig.savefig(paths[-1], dpi=dpi, bbox_inches='tight')
+
+    if 'spectrum' in kinds:
+        xf, psd = welch_psd(samples, fs)
+        dominant_freq = float(xf[np.argmax(psd[1:]) + 1]) if len(psd) > 1 else 0.0
+        snapshot.update({'xf': xf, 'yf_db': 10 * np.log10(psd + 1e-24), 'dominant_freq': dominant_freq,
+                         'note': frequency_to_note(dominant_freq), 'spectrum_mode': 'welch'})
+        fig, (ax,) = _new_figure(figsize=(12, 4))
+        _draw_spectrum(ax, snapshot)
+        paths.append(f"{base}_spectrum.{image_format}")
+        fig.savefig(paths[-1], dpi=dpi, bbox_inches='tight')
+
+    if 'spectrogram' in kinds:
+        paths.append(render_spectrogram(compute_spectrogram(samples, fs), fs,
+                                        f"{base}_spectrogram.{image_format}", dpi=dpi))
+    return paths
+
+
+def _safe_render(job):
+    filepath, output_dir, kinds, dpi, image_format = job
+    try:
+        return filepath, render_file(filepath, output_dir, kinds, dpi, image_format), None
+    except Exception as e:
+        return filepath, [], str(e)
+
+
+def export_batch(files, output_dir, kinds=None, dpi=150, image_format='png', workers=None, progress=None):
+    """
+    Renderuje wykresy wielu plików równolegle w puli procesów.
+    progress(done, total) jest wywoływane po każdym pliku.
+    Zwraca słownik {'exported': [ścieżki], 'errors': {plik: komunikat}}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(filepath, output_dir, kinds, dpi, image_format) for filepath in files]
+    exported = []
+    errors = {}
+    if not jobs:
+        return {'exported': exported, 'errors': errors}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_safe_render, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            filepath, paths, error = future.result()
+            if error:
+                print(f"Błąd eksportu wykresów {filepath}: {error}")
+                errors[filepath] = error
+            exported.extend(paths)
+            if progress:
+                progress(done, len(jobs))
+    return {'exported': exported, 'errors': errors}
@@ -1,6 +1,15 @@
-from .plot_utils import plot_time_domain, plot_frequency_domain, setup_plot_style, plot_spectrogram
+from .plot_utils import (plot_time_domain, plot_frequency_domain, setup_plot_style, plot_spectrogram,
+                         compute_spectrogram, compute_envelope, plot_envelope)
+from .export import render_analysis, render_spectrogram, render_file, export_batch
 
 __all__ = ['plot_time_domain',
            'plot_frequency_domain',
            'setup_plot_style',
-           'plot_spectrogram']
\ No newline at end of file
+           'plot_spectrogram',
+           'compute_spectrogram',
+           'compute_envelope',
+           'plot_envelope',
+           'render_analysis',
+           'render_spectrogram',
+           'render_file',
+           'export_batch']
\ No newline at end of file
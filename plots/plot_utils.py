@@ -2,6 +2,9 @@ import numpy as np
 import matplotlib.pyplot as plt
 import math
 
+from dsp.cqt import cqt_spectrogram
+from dsp.fft import power_spectrogram
+
 
 def frequency_to_note(frequency):
     """
@@ -20,9 +23,14 @@ def frequency_to_note(frequency):
     return f"{note_name}{octave}"
 
 
-def plot_time_domain(ax, samples, duration, rms, peak):
+def plot_time_domain(ax, samples, duration, rms, peak, loudness=None, stats=None, start_time=0.0, onsets=None,
+                     silent_regions=None):
     """
     Rysuje sygnał w dziedzinie czasu na podstawie dostarczonych danych.
+    Opcjonalne słowniki loudness (LoudnessMeter) i stats (RunningStats) dopisują dodatkowe pomiary.
+    start_time przesuwa oś czasu (nagrywanie ciągłe pokazuje tylko ostatnią historię).
+    onsets to czasy wykrytych onsetów [s], zaznaczane pionowymi liniami.
+    silent_regions to fragmenty ciszy (początek, koniec) w sekundach od początku bufora, zaciemniane.
     """
     ax.clear()
     ax.set_facecolor('black')
@@ -30,27 +38,97 @@ def plot_time_domain(ax, samples, duration, rms, peak):
         ax.text(0.5, 0.5, 'Brak danych', transform=ax.transAxes, color='white', ha='center', va='center')
         return
 
-    time_axis = np.linspace(0, duration, len(samples))
+    time_axis = np.linspace(start_time, start_time + duration, len(samples))
     if samples.ndim > 1 and samples.shape[1] > 1:
         ax.plot(time_axis, samples[:, 0], color='cyan', linewidth=0.8)
         ax.plot(time_axis, samples[:, 1], color='red', linewidth=0.8)
     else:
         ax.plot(time_axis, samples, color='cyan', linewidth=0.8)
 
+    _draw_silence(ax, silent_regions, start_time)
+    _draw_onsets(ax, onsets)
+    _style_time_axes(ax, start_time, duration)
+    _draw_time_info(ax, rms, peak, loudness, stats)
+
+
+def compute_envelope(samples, n_points=4096):
+    """
+    Redukuje sygnał do obwiedni min/max w n_points przedziałach (mono).
+    Zwraca dwie tablice float32 - wystarczające do narysowania przebiegu bez pełnych danych.
+    """
+    mono = samples.mean(axis=1) if samples.ndim > 1 else samples
+    if len(mono) == 0:
+        return np.array([], dtype=np.float32), np.array([], dtype=np.float32)
+    n_points = min(n_points, len(mono))
+    usable = len(mono) // n_points * n_points
+    buckets = mono[:usable].reshape(n_points, -1)
+    env_min, env_max = buckets.min(axis=1), buckets.max(axis=1)
+    if usable < len(mono):
+        # -------------> Resztę próbek dołączamy do ostatniego przedziału
+        env_min[-1] = min(env_min[-1], mono[usable:].min())
+        env_max[-1] = max(env_max[-1], mono[usable:].max())
+    return env_min.astype(np.float32), env_max.astype(np.float32)
+
+
+def plot_envelope(ax, env_min, env_max, duration, rms, peak, loudness=None, stats=None, start_time=0.0,
+                  onsets=None, silent_regions=None):
+    """Rysuje przebieg czasowy na podstawie obwiedni min/max (np. z cache analizy lub przy eksporcie)."""
+    ax.clear()
+    ax.set_facecolor('black')
+    if len(env_min) == 0:
+        ax.text(0.5, 0.5, 'Brak danych', transform=ax.transAxes, color='white', ha='center', va='center')
+        return
+
+    time_axis = np.linspace(start_time, start_time + duration, len(env_min))
+    ax.fill_between(time_axis, env_min, env_max, color='cyan', linewidth=0.8)
+    _draw_silence(ax, silent_regions, start_time)
+    _draw_onsets(ax, onsets)
+    _style_time_axes(ax, start_time, duration)
+    _draw_time_info(ax, rms, peak, loudness, stats)
+
+
+def _draw_silence(ax, silent_regions, start_time):
+    if silent_regions is not None:
+        for start, end in silent_regions:
+            ax.axvspan(start_time + start, start_time + end, color='gray', alpha=0.3, linewidth=0)
+
+
+def _draw_onsets(ax, onsets):
+    if onsets is not None and len(onsets):
+        ax.vlines(onsets, -1.1, 1.1, colors='orange', linewidth=0.8, alpha=0.8)
+
+
+def _style_time_axes(ax, start_time, duration):
     ax.grid(True, alpha=0.3, color='white')
-    ax.set_xlim(0, duration)
+    ax.set_xlim(start_time, start_time + duration)
     ax.set_ylim(-1.1, 1.1)
     ax.set_title("Sygnał w dziedzinie czasu", color='white', fontsize=12)
     ax.set_xlabel("Czas [s]", color='white')
     ax.set_ylabel("Amplituda", color='white')
     ax.tick_params(colors='white')
-    ax.text(0.02, 0.98, f'RMS: {rms:.3f}\nPeak: {peak:.3f}', transform=ax.transAxes, color='yellow',
+
+
+def _draw_time_info(ax, rms, peak, loudness, stats):
+    # -------------> Brak pomiarów (np. podgląd pliku w trakcie wczytywania) - bez ramki z opisem
+    if rms is None:
+        return
+    info_text = f'RMS: {rms:.3f}\nPeak: {peak:.3f}'
+    if stats:
+        info_text += (f"\nRMS okna: {stats['window_rms']:.3f}\nDC: {stats['dc_offset']:+.4f}"
+                      f"\nPrzesterowane próbki: {stats['clip_count']}")
+    if loudness:
+        info_text += (f"\nLUFS M/S/I: {loudness['lufs_momentary']:.1f} / {loudness['lufs_short_term']:.1f} / "
+                      f"{loudness['lufs_integrated']:.1f}\nTrue peak: {loudness['true_peak_db']:.1f} dBTP")
+    ax.text(0.02, 0.98, info_text, transform=ax.transAxes, color='yellow',
             verticalalignment='top', fontsize=9, bbox=dict(boxstyle='round', facecolor='black', alpha=0.7))
 
 
-def plot_frequency_domain(ax, xf, yf_db, dominant_freq, note, fs):
+def plot_frequency_domain(ax, xf, yf_db, dominant_freq, note, fs, log_scale=False, freq_range=None,
+                          ylabel="Amplituda [dB]"):
     """
     Rysuje widmo częstotliwościowe na podstawie dostarczonych danych.
+    Dla widma CQT (log_scale=True) oś częstotliwości jest logarytmiczna.
+    freq_range (od, do) ogranicza oś do pasma - używane przez tryb zoom.
     """
     ax.clear()
     ax.set_facecolor('black')
@@ -60,7 +138,13 @@ def plot_frequency_domain(ax, xf, yf_db, dominant_freq, note, fs):
 
     ax.plot(xf, yf_db, color='magenta', linewidth=0.8)
     ax.grid(True, alpha=0.3, color='white')
-    ax.set_xlim(0, min(fs / 2, 8000))
+    if log_scale:
+        ax.set_xscale('log')
+        ax.set_xlim(xf[0], xf[-1])
+    elif freq_range is not None:
+        ax.set_xlim(*freq_range)
+    else:
+        ax.set_xlim(0, min(fs / 2, 8000))
     if yf_db.size > 0:
         # -------------> Filtrujemy wartości -inf, aby uniknąć błędów
         finite_yf_db = yf_db[np.isfinite(yf_db)]
@@ -69,10 +153,12 @@ def plot_frequency_domain(ax, xf, yf_db, dominant_freq, note, fs):
 
     ax.set_title("Widmo częstotliwościowe", color='white', fontsize=12)
     ax.set_xlabel("Częstotliwość [Hz]", color='white')
-    ax.set_ylabel("Amplituda [dB]", color='white')
+    ax.set_ylabel(ylabel, color='white')
     ax.tick_params(colors='white')
 
-    info_text = f'Dominująca częstotliwość: {dominant_freq:.0f} Hz'
+    # -------------> W wąskim paśmie pokazujemy ułamki herca
+    precision = 2 if freq_range is not None else 0
+    info_text = f'Dominująca częstotliwość: {dominant_freq:.{precision}f} Hz'
     if note:
         info_text += f'\nNajbliższa nuta: {note}'
     ax.text(0.02, 0.98, info_text, transform=ax.transAxes, color='yellow',
@@ -91,24 +177,152 @@ def setup_plot_style():
     plt.rcParams['ytick.color'] = 'white'
 
 
-def plot_spectrogram(fig, ax, samples, fs):
-    """Rysuje spektrogram, uśredniając sygnał stereo do mono."""
+def compute_spectrogram(samples, fs, mode='fft'):
+    """
+    Liczy spektrogram sygnału uśrednionego do mono.
+    Zwraca (częstotliwości, czasy, macierz w dB jako float32) - gotowe do zapisania w cache.
+    """
+    if samples.ndim > 1 and samples.shape[1] > 1:
+        samples_mono = samples.mean(axis=1)
+    else:
+        samples_mono = samples if samples.ndim == 1 else samples.flatten()
+
+    if mode == 'cqt':
+        freqs, times, magnitude = cqt_spectrogram(samples_mono, fs)
+        spectrogram_db = 20 * np.log10(magnitude + 1e-12)
+    else:
+        freqs, times, pxx = power_spectrogram(samples_mono, fs, n_fft=1024, hop_length=512)
+        spectrogram_db = 10 * np.log10(pxx + 1e-20)
+    return freqs, times, spectrogram_db.astype(np.float32)
+
+
+def plot_spectrogram(fig, ax, samples, fs, mode='fft', spectrogram=None):
+    """
+    Rysuje spektrogram, uśredniając sygnał stereo do mono.
+    W trybie 'cqt' oś częstotliwości ma biny półtonowe (transformata stałego Q).
+    Gotowy wynik compute_spectrogram można podać w spectrogram - próbki nie są wtedy potrzebne.
+    """
     ax.clear()
     ax.set_facecolor('black')
-    if len(samples) == 0:
+    if spectrogram is None and len(samples) == 0:
         ax.text(0.5, 0.5, 'Brak danych', transform=ax.transAxes, color='white', ha='center', va='center')
         return
 
-    if samples.ndim > 1 and samples.shape[1] > 1:
-        samples_mono = samples.mean(axis=1)
-    else:
-        samples_mono = samples if samples.ndim == 1 else samples.flatten()
+    if spectrogram is None:
+        spectrogram = compute_spectrogram(samples, fs, mode)
+    freqs, times, spectrogram_db = spectrogram
 
-    Pxx, freqs, bins, im = ax.specgram(samples_mono, NFFT=1024, Fs=fs, noverlap=512, cmap='viridis')
+    if mode == 'cqt':
+        im = ax.pcolormesh(times, freqs, spectrogram_db, shading='nearest', cmap='viridis')
+        ax.set_yscale('log')
+        title = "Spektrogram CQT (Mono)"
+    else:
+        # -------------> Ten sam układ co Axes.specgram: połowa kroku ramki marginesu na osi czasu
+        pad = (times[1] - times[0]) / 2 if len(times) > 1 else 0
+        im = ax.imshow(np.flipud(spectrogram_db), extent=(times[0] - pad, times[-1] + pad, freqs[0], freqs[-1]),
+                       aspect='auto', cmap='viridis')
+        title = "Spektrogram (Mono)"
     cbar = fig.colorbar(im, ax=ax)
     cbar.set_label('Intensywność [dB]', color='white')
     cbar.ax.yaxis.set_tick_params(color='white')
-    ax.set_title("Spektrogram (Mono)", color='white', fontsize=12)
+    ax.set_title(title, color='white', fontsize=12)
     ax.set_xlabel("Czas [s]", color='white')
     ax.set_ylabel("Częstotliwość [Hz]", color='white')
-    ax.tick_params(colors='white')
\ No newline at end of file
+    ax.tick_params(colors='white')
+
+def plot_distortion(ax, results):
+    """
+    Rysuje wynik pomiaru zniekształceń (audio.measurement). Dla jednego punktu: uśrednione widmo w dBFS
+    z zaznaczonymi harmonicznymi i podsumowaniem; dla sweepa: THD i THD+N w funkcji częstotliwości.
+    """
+    ax.clear()
+    ax.set_facecolor('black')
+    if not results:
+        ax.text(0.5, 0.5, 'Brak danych', transform=ax.transAxes, color='white', ha='center', va='center')
+        return
+
+    if len(results) == 1:
+        result = results[0]
+        freqs, power = result['spectrum']
+        ax.plot(freqs[1:], 10 * np.log10(2 * power[1:] + 1e-30), color='magenta', linewidth=0.8)
+        harmonics = result['harmonics']
+        ax.plot([h['frequency'] for h in harmonics], [h['level_dbfs'] for h in harmonics], 'o', color='orange',
+                markersize=4)
+        ax.set_xlim(max(freqs[1], 10.0), freqs[-1])
+        ax.set_ylim(-180, 10)
+        ax.set_title("Widmo pomiaru zniekształceń", color='white', fontsize=12)
+        ax.set_ylabel("Poziom [dBFS]", color='white')
+        info_text = (f"Ton: {result['fundamental']:.1f} Hz, {result['fundamental_dbfs']:.2f} dBFS\n"
+                     f"THD: {result['thd_percent']:.4f}% ({result['thd_db']:.1f} dB)\n"
+                     f"THD+N: {result['thdn_percent']:.4f}% ({result['thdn_db']:.1f} dB)\n"
+                     f"SNR: {result['snr_db']:.1f} dB")
+    else:
+        frequencies = [result['fundamental'] for result in results]
+        ax.plot(frequencies, [result['thdn_db'] for result in results], 'o-', color='magenta', markersize=3,
+                label="THD+N")
+        ax.plot(frequencies, [result['thd_db'] for result in results], 'o-', color='orange', markersize=3,
+                label="THD")
+        ax.set_xlim(min(frequencies) / 1.1, max(frequencies) * 1.1)
+        ax.legend(loc='upper right', facecolor='black', labelcolor='white')
+        ax.set_title("Zniekształcenia w funkcji częstotliwości", color='white', fontsize=12)
+        ax.set_ylabel("Poziom względem tonu [dB]", color='white')
+        worst = max(results, key=lambda result: result['thdn_db'])
+        info_text = f"Najgorsze THD+N: {worst['thdn_db']:.1f} dB przy {worst['fundamental']:.0f} Hz"
+
+    ax.set_xscale('log')
+    ax.grid(True, alpha=0.3, color='white')
+    ax.set_xlabel("Częstotliwość [Hz]", color='white')
+    ax.tick_params(colors='white')
+    ax.text(0.02, 0.98, info_text, transform=ax.transAxes, color='yellow',
+            verticalalignment='top', fontsize=9, bbox=dict(boxstyle='round', facecolor='black', alpha=0.7))
+
+
+def plot_comparison(ax_time, ax_freq, comparison):
+    """
+    Rysuje wynik porównania plików (dsp.alignment.compare_signals): obwiednię wyrównanego
+    sygnału różnicowego z podsumowaniem przesunięcia i poziomów oraz różnicę widm Welcha
+    z wartościami w pasmach oktawowych.
+    """
+    fs = comparison['sample_rate']
+    difference = comparison['difference']
+    duration = len(difference) / fs
+    env_min, env_max = compute_envelope(difference)
+    ax_time.clear()
+    ax_time.set_facecolor('black')
+    t = np.linspace(0, duration, len(env_min))
+    ax_time.fill_between(t, env_min, env_max, color='red', linewidth=0)
+    ax_time.set_xlim(0, max(duration, 1e-3))
+    ax_time.set_title("Sygnał różnicowy (po wyrównaniu)", color='white', fontsize=12)
+    ax_time.set_xlabel("Czas [s]", color='white')
+    ax_time.set_ylabel("Amplituda", color='white')
+    ax_time.grid(True, alpha=0.3, color='white')
+    ax_time.tick_params(colors='white')
+    info_text = (f"Przesunięcie: {comparison['offset_samples']:.2f} próbek "
+                 f"({comparison['offset_seconds'] * 1000:.2f} ms)\n"
+                 f"Korelacja: {comparison['correlation']:.4f}"
+                 f"{' (odwrócona polaryzacja)' if comparison['polarity_inverted'] else ''}\n"
+                 f"Różnica poziomu RMS: {comparison['level_delta_db']:+.2f} dB, "
+                 f"szczytu: {comparison['peak_delta_db']:+.2f} dB\n"
+                 f"Głębokość nulla: {comparison['null_depth_db']:.1f} dB "
+                 f"(po dopasowaniu wzmocnienia: {comparison['gain_matched_null_db']:.1f} dB)")
+    ax_time.text(0.02, 0.98, info_text, transform=ax_time.transAxes, color='yellow',
+                 verticalalignment='top', fontsize=9, bbox=dict(boxstyle='round', facecolor='black', alpha=0.7))
+
+    freqs, _, _, delta_db = comparison['spectrum']
+    ax_freq.clear()
+    ax_freq.set_facecolor('black')
+    ax_freq.plot(freqs[1:], delta_db[1:], color='orange', linewidth=0.8, label="Różnica widm")
+    bands = comparison['band_deltas_db']
+    if bands:
+        ax_freq.plot([float(center) for center in bands], list(bands.values()), 'o', color='magenta',
+                     markersize=5, label="Pasma oktawowe")
+    ax_freq.axhline(0, color='white', alpha=0.5, linewidth=0.8)
+    ax_freq.set_xscale('log')
+    ax_freq.set_xlim(max(freqs[1], 10.0), freqs[-1])
+    ax_freq.set_ylim(-24, 24)
+    ax_freq.set_title("Różnica widm (porównywany / referencja)", color='white', fontsize=12)
+    ax_freq.set_xlabel("Częstotliwość [Hz]", color='white')
+    ax_freq.set_ylabel("Różnica [dB]", color='white')
+    ax_freq.grid(True, alpha=0.3, color='white')
+    ax_freq.tick_params(colors='white')
+    ax_freq.legend(loc='lower left', facecolor='black', labelcolor='white')
@@ -0,0 +1,131 @@
+import numpy as np
+import hashlib
+import json
+import os
+import threading
+
+from plots.plot_utils import compute_envelope
+
+# -------------> Fragment z początku i końca pliku dołączany do odcisku (bez czytania całości)
+_FINGERPRINT_BYTES = 64 * 1024
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), "AudioAnalyzer", "cache")
+
+
+def file_fingerprint(filepath):
+    """
+    Zwraca odcisk zawartości pliku: rozmiar, czas modyfikacji oraz skrót SHA-1
+    pierwszych i ostatnich 64 KiB. Nie zależy od ścieżki, więc kopia pliku trafia w ten sam wpis.
+    """
+    stat = os.stat(filepath)
+    digest = hashlib.sha1()
+    digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(filepath, 'rb') as f:
+        digest.update(f.read(_FINGERPRINT_BYTES))
+        if stat.st_size > 2 * _FINGERPRINT_BYTES:
+            f.seek(-_FINGERPRINT_BYTES, os.SEEK_END)
+            digest.update(f.read(_FINGERPRINT_BYTES))
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Trwały cache wyników analizy plików audio w formacie .npz (tablice + metadane JSON).
+    Klucz to odcisk pliku oraz parametry analizy. Po przekroczeniu max_bytes
+    usuwane są najdawniej używane wpisy (LRU na podstawie czasu modyfikacji wpisu).
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_path(self, filepath, params):
+        key = hashlib.sha1()
+        key.update(file_fingerprint(filepath).encode())
+        key.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return os.path.join(self.directory, key.hexdigest() + ".npz")
+
+    def get(self, filepath, params):
+        """Zwraca (tablice, info) dla pliku i parametrów albo None, jeśli wpisu nie ma."""
+        try:
+            path = self._entry_path(filepath, params)
+            if not os.path.exists(path):
+                return None
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files if name != '__info__'}
+                info = json.loads(str(data['__info__']))
+            # -------------> Odświeżamy czas użycia na potrzeby LRU
+            os.utime(path)
+            return arrays, info
+        except Exception as e:
+            print(f"Błąd odczytu cache analizy: {e}")
+            return None
+
+    def put(self, filepath, params, arrays, info):
+        """Zapisuje tablice numpy i słownik info (serializowany do JSON) dla pliku i parametrów."""
+        try:
+            path = self._entry_path(filepath, params)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, __info__=np.array(json.dumps(info, default=float)), **arrays)
+            # -------------> Atomowa podmiana - przerwany zapis nie zostawi uszkodzonego wpisu
+            os.replace(tmp_path, path)
+            self._evict()
+        except Exception as e:
+            print(f"Błąd zapisu cache analizy: {e}")
+
+    def _evict(self):
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".npz"):
+                    path = os.path.join(self.directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def clear(self):
+        """Usuwa wszystkie wpisy z cache."""
+        with self.lock:
+            for name in os.listdir(self.directory):
+                if name.endswith(".npz"):
+                    os.remove(os.path.join(self.directory, name))
+
+
+def analysis_cache_entry(results, metadata):
+    """
+    Zamienia wyniki AnalysisWorker na wpis cache (tablice, info): widmo, obwiednię przebiegu,
+    onsety i pomiary - wszystko, czego potrzeba do narysowania wykresów bez próbek.
+    """
+    env_min, env_max = compute_envelope(results['samples'])
+    arrays = {'xf': results['xf'], 'yf_db': results['yf_db'], 'env_min': env_min, 'env_max': env_max}
+    if results.get('freq_range') is not None:
+        arrays['freq_range'] = np.asarray(results['freq_range'])
+    if results.get('onsets') is not None:
+        arrays['onsets'] = np.asarray(results['onsets'], dtype=np.float64)
+    if results.get('silent_regions') is not None:
+        arrays['silent_regions'] = np.asarray(results['silent_regions'], dtype=np.float64).reshape(-1, 2)
+    info = {
+        'metadata': metadata,
+        'rms': results['rms'],
+        'peak': results['peak'],
+        'dominant_freq': results['dominant_freq'],
+        'note': results['note'],
+        'spectrum_mode': results.get('spectrum_mode'),
+        'loudness': results.get('loudness'),
+        'stats': results.get('stats')
+    }
+    return arrays, info
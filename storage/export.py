@@ -0,0 +1,229 @@
+import numpy as np
+import json
+import os
+import time
+
+from dsp.zoom import interpolate_peak
+from plots.plot_utils import frequency_to_note
+
+DEFAULT_EXPORT_DIR = os.path.join(os.path.expanduser("~"), "AudioAnalyzer", "exports")
+SIDECAR_NAME = "analysis.json"
+# -------------> Stała długość nagłówka .npy - kształt rośnie, a nagłówek jest nadpisywany w miejscu
+_HEADER_BYTES = 256
+
+STATS_COLUMNS = ['time', 'rms', 'peak', 'dc_offset', 'window_rms', 'window_peak', 'clip_count',
+                 'lufs_momentary', 'lufs_short_term', 'lufs_integrated', 'true_peak_db']
+PITCH_COLUMNS = ['time', 'frequency', 'level_db']
+
+
+class AppendableArray:
+    """
+    Plik .npy, do którego dopisuje się wiersze partiami (chunk_rows) bez przepisywania danych.
+    Po każdej partii nagłówek jest aktualizowany, więc plik można w każdej chwili otworzyć
+    przez np.load(path, mmap_mode='r') - bez kopiowania danych do pamięci.
+    """
+
+    def __init__(self, path, dtype=np.float32, row_shape=(), chunk_rows=256):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.row_shape = tuple(row_shape)
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._pending = []
+        self._pending_rows = 0
+        self._file = open(path, 'wb')
+        self._write_header()
+
+    def _write_header(self):
+        header = {'descr': np.lib.format.dtype_to_descr(self.dtype), 'fortran_order': False,
+                  'shape': (self.rows,) + self.row_shape}
+        text = repr(header).encode('latin1')
+        # -------------> Magic (6) + wersja (2) + długość (2) + nagłówek wyrównany spacjami, zakończony '\n'
+        padding = _HEADER_BYTES - 10 - len(text) - 1
+        if padding < 0:
+            raise ValueError(f"Kształt {header['shape']} nie mieści się w nagłówku .npy")
+        self._file.seek(0)
+        self._file.write(np.lib.format.MAGIC_PREFIX + bytes([1, 0]))
+        self._file.write(np.uint16(_HEADER_BYTES - 10).tobytes())
+        self._file.write(text + b' ' * padding + b'\n')
+        self._file.seek(0, os.SEEK_END)
+
+    def append(self, rows):
+        rows = np.asarray(rows, dtype=self.dtype).reshape((-1,) + self.row_shape)
+        if len(rows) == 0:
+            return
+        self._pending.append(rows)
+        self._pending_rows += len(rows)
+        if self._pending_rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._file.write(np.concatenate(self._pending).tobytes())
+            self.rows += self._pending_rows
+            self._pending = []
+            self._pending_rows = 0
+        self._write_header()
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+class AnalysisExportWriter:
+    """
+    Strumieniowy zapis wyników analizy do katalogu z plikami .npy i opisem JSON (analysis.json):
+    - stft.npy: macierz modułów STFT w dB (ramki x biny, float32),
+    - pitch.npy: ścieżka wysokości dźwięku (czas, częstotliwość, poziom w dB) dla każdej ramki STFT,
+    - stats.npy: statystyki i głośność dopisywane przy każdej analizie (kolumny STATS_COLUMNS),
+    - spectrum_freqs.npy / spectrum_db.npy: ostatnie widmo z okna analizy.
+    process() przyjmuje wyłącznie nowe próbki, więc pamięć nie rośnie z długością sesji.
+    """
+
+    def __init__(self, directory, fs, n_fft=2048, hop_length=1024, chunk_rows=256):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fs = fs
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.window = np.hanning(n_fft)
+        self.freqs = np.fft.rfftfreq(n_fft, 1 / fs)
+        self.samples_processed = 0
+        self._buffer = np.zeros(0)
+        self.gaps = []  # -------------> Luki w strumieniu: [pierwszy wiersz STFT po luce, przesunięcie w próbkach]
+        self.spectrum = None
+        self.spectrum_mode = None
+        self.created = time.time()
+
+        self.stft = AppendableArray(os.path.join(directory, "stft.npy"), np.float32, (len(self.freqs),), chunk_rows)
+        self.pitch = AppendableArray(os.path.join(directory, "pitch.npy"), np.float64, (len(PITCH_COLUMNS),),
+                                     chunk_rows)
+        self.stats = AppendableArray(os.path.join(directory, "stats.npy"), np.float64, (len(STATS_COLUMNS),),
+                                     chunk_rows)
+        np.save(os.path.join(directory, "stft_freqs.npy"), self.freqs)
+        self._write_sidecar()
+
+    def process(self, samples):
+        """Dzieli nowe próbki (mono lub wielokanałowe) na ramki STFT i dopisuje ramki oraz ścieżkę wysokości."""
+        mono = samples.mean(axis=1) if samples.ndim > 1 else samples
+        buffer = np.concatenate([self._buffer, mono])
+        n_frames = max(0, (len(buffer) - self.n_fft) // self.hop_length + 1)
+        if n_frames == 0:
+            self._buffer = buffer
+            self.samples_processed += len(mono)
+            return
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop_length][:n_frames]
+        magnitude = np.abs(np.fft.rfft(frames * self.window, axis=1)) * (2.0 / self.window.sum())
+        magnitude_db = 20 * np.log10(magnitude + 1e-12)
+        self.stft.append(magnitude_db)
+
+        # -------------> Czas środka ramki liczony od początku strumienia
+        first_frame = (self.samples_processed - len(self._buffer)) / self.fs
+        times = first_frame + (np.arange(n_frames) * self.hop_length + self.n_fft / 2) / self.fs
+        peaks = np.argmax(magnitude[:, 1:], axis=1) + 1
+        pitch = [(t, interpolate_peak(self.freqs, row, index), row_db[index])
+                 for t, row, row_db, index in zip(times, magnitude, magnitude_db, peaks)]
+        self.pitch.append(pitch)
+
+        self._buffer = buffer[n_frames * self.hop_length:]
+        self.samples_processed += len(mono)
+
+    def skip(self, count):
+        """
+        Pomija count próbek ciszy, których nie przekazano: ramki STFT dla luki nie są zapisywane (czasy
+        w pitch.npy pozostają poprawne), a luka trafia do 'gaps' w analysis.json, aby odtworzyć czasy wierszy stft.npy.
+        """
+        if count <= 0:
+            return
+        # -------------> Wiersze od stft.rows zaczynają się o len(_buffer) + count próbek później niż bez luki
+        self.gaps.append([self.stft.rows, len(self._buffer) + count])
+        self.samples_processed += count
+        self._buffer = np.zeros(0)
+
+    def add_stats(self, stream_position, stats, loudness):
+        """Dopisuje wiersz statystyk dla końca bufora analizy (stream_position w próbkach)."""
+        values = {'time': stream_position / self.fs}
+        values.update(stats or {})
+        values.update(loudness or {})
+        self.stats.append([values.get(column, np.nan) for column in STATS_COLUMNS])
+
+    def set_spectrum(self, xf, yf_db, spectrum_mode=None):
+        """Zapamiętuje ostatnie widmo - na dysk trafia przy flush()/close(), nie przy każdej analizie."""
+        self.spectrum = (xf, yf_db)
+        self.spectrum_mode = spectrum_mode
+
+    def _save_spectrum(self):
+        if self.spectrum is not None:
+            xf, yf_db = self.spectrum
+            np.save(os.path.join(self.directory, "spectrum_freqs.npy"), np.asarray(xf))
+            np.save(os.path.join(self.directory, "spectrum_db.npy"), np.asarray(yf_db, dtype=np.float32))
+
+    def _write_sidecar(self, extra=None):
+        sidecar = {
+            'sample_rate': self.fs,
+            'created': self.created,
+            'samples_processed': self.samples_processed,
+            'stft': {'file': "stft.npy", 'freqs_file': "stft_freqs.npy", 'n_fft': self.n_fft,
+                     'hop_length': self.hop_length, 'window': 'hann', 'unit': 'dB', 'frames': self.stft.rows,
+                     'gaps': self.gaps},
+            'pitch': {'file': "pitch.npy", 'columns': PITCH_COLUMNS, 'rows': self.pitch.rows},
+            'stats': {'file': "stats.npy", 'columns': STATS_COLUMNS, 'rows': self.stats.rows},
+            'spectrum': {'freqs_file': "spectrum_freqs.npy", 'file': "spectrum_db.npy",
+                         'mode': self.spectrum_mode, 'unit': 'dB'}
+        }
+        sidecar.update(extra or {})
+        path = os.path.join(self.directory, SIDECAR_NAME)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(sidecar, f, indent=2, default=float)
+        os.replace(path + ".tmp", path)
+
+    def flush(self):
+        for array in (self.stft, self.pitch, self.stats):
+            array.flush()
+        self._save_spectrum()
+        self._write_sidecar()
+
+    def close(self, extra=None):
+        for array in (self.stft, self.pitch, self.stats):
+            array.close()
+        self._save_spectrum()
+        self._write_sidecar(extra)
+        print(f"Zapisano wyniki analizy: {self.directory} ({self.stft.rows} ramek STFT)")
+
+
+def export_analysis(directory, samples, fs, results=None, n_fft=2048, hop_length=1024):
+    """
+    Jednorazowy eksport analizy całego sygnału (np. wczytanego pliku): STFT i ścieżka wysokości
+    liczone z próbek blokami, a widmo, statystyki i głośność z wyników workera (results).
+    """
+    writer = AnalysisExportWriter(directory, fs, n_fft, hop_length)
+    block = hop_length * 256
+    for start in range(0, len(samples), block):
+        writer.process(samples[start:start + block])
+    extra = {}
+    if results:
+        writer.add_stats(results.get('stream_position', len(samples)), results.get('stats'), results.get('loudness'))
+        if results.get('xf') is not None:
+            writer.set_spectrum(results['xf'], results['yf_db'], results.get('spectrum_mode'))
+        if results.get('dominant_freq'):
+            extra['dominant_freq'] = float(results['dominant_freq'])
+            extra['note'] = frequency_to_note(results['dominant_freq'])
+    writer.close(extra)
+    return directory
+
+
+def load_analysis(directory, mmap_mode='r'):
+    """
+    Otwiera katalog z eksportem. Zwraca (metadane z analysis.json, słownik tablic);
+    tablice są domyślnie mapowane z pliku (mmap_mode='r'), więc nie są kopiowane do pamięci.
+    """
+    with open(os.path.join(directory, SIDECAR_NAME), encoding='utf-8') as f:
+        sidecar = json.load(f)
+    arrays = {}
+    for name in ('stft', 'stft_freqs', 'pitch', 'stats', 'spectrum_freqs', 'spectrum_db'):
+        path = os.path.join(directory, f"{name}.npy")
+        if os.path.exists(path):
+            arrays[name] = np.load(path, mmap_mode=mmap_mode)
+    return sidecar, arrays
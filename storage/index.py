@@ -0,0 +1,172 @@
+from concurrent.futures import ProcessPoolExecutor
+import math
+import os
+import sqlite3
+import time
+
+from audio.loader import read_wav_metadata
+from headless.batch import analyze_file
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), "AudioAnalyzer", "index.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL,
+    sample_rate INTEGER,
+    channels INTEGER,
+    bit_depth INTEGER,
+    rms REAL,
+    peak REAL,
+    lufs_integrated REAL,
+    true_peak_db REAL,
+    dominant_freq REAL,
+    note TEXT,
+    indexed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_files_duration ON files(duration);
+CREATE INDEX IF NOT EXISTS idx_files_sample_rate ON files(sample_rate);
+CREATE INDEX IF NOT EXISTS idx_files_lufs ON files(lufs_integrated);
+CREATE INDEX IF NOT EXISTS idx_files_dominant_freq ON files(dominant_freq);
+CREATE INDEX IF NOT EXISTS idx_files_note ON files(note);
+"""
+
+_FEATURE_COLUMNS = ['duration', 'sample_rate', 'channels', 'bit_depth', 'rms', 'peak', 'lufs_integrated',
+                    'true_peak_db', 'dominant_freq', 'note']
+
+
+def extract_features(filepath):
+    """
+    Wyciąga metadane i cechy pliku WAV (jak AnalysisWorker + głośność).
+    Funkcja modułowa, aby dało się ją uruchamiać w puli procesów.
+    """
+    metadata = read_wav_metadata(filepath)
+    results = analyze_file(filepath)
+    features = {key: metadata[key] for key in ('duration', 'channels', 'bit_depth', 'sample_rate')}
+    for key in ('rms', 'peak', 'lufs_integrated', 'true_peak_db', 'dominant_freq', 'note'):
+        value = results.get(key)
+        # -------------> -inf (cisza) zapisujemy jako NULL
+        if isinstance(value, float) and not math.isfinite(value):
+            value = None
+        features[key] = value
+    return features
+
+
+def _safe_extract(job):
+    filepath, size, mtime_ns = job
+    try:
+        return filepath, size, mtime_ns, extract_features(filepath), None
+    except Exception as e:
+        return filepath, size, mtime_ns, None, str(e)
+
+
+def _scan_wav_files(directory):
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith('.wav'):
+                path = os.path.abspath(os.path.join(root, name))
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime_ns
+
+
+class FeatureIndex:
+    """
+    Przyrostowy indeks cech plików WAV w bazie SQLite.
+    Ponowna aktualizacja analizuje tylko pliki, których rozmiar lub czas modyfikacji się zmienił.
+    """
+
+    def __init__(self, db_path=DEFAULT_INDEX_PATH):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, directories, workers=None, progress=None):
+        """
+        Skanuje katalogi i (re)indeksuje nowe lub zmienione pliki w puli procesów.
+        Usuwa z indeksu pliki, których już nie ma w skanowanych katalogach.
+        progress(done, total) jest wywoływane po każdym przeanalizowanym pliku.
+        Zwraca słownik z liczbą plików dodanych, pominiętych, usuniętych i błędnych.
+        """
+        known = {row['path']: (row['size'], row['mtime_ns'])
+                 for row in self.connection.execute("SELECT path, size, mtime_ns FROM files")}
+
+        jobs = []
+        seen = set()
+        roots = [os.path.abspath(directory) for directory in directories]
+        for root in roots:
+            for path, size, mtime_ns in _scan_wav_files(root):
+                seen.add(path)
+                if known.get(path) != (size, mtime_ns):
+                    jobs.append((path, size, mtime_ns))
+
+        # -------------> Usuwamy wpisy plików skasowanych z indeksowanych katalogów
+        removed = [path for path in known if path not in seen
+                   and any(path.startswith(root + os.sep) for root in roots)]
+        self.connection.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+
+        columns = ['path', 'size', 'mtime_ns'] + _FEATURE_COLUMNS + ['indexed_at']
+        insert_sql = (f"INSERT OR REPLACE INTO files ({', '.join(columns)}) "
+                      f"VALUES ({', '.join('?' for _ in columns)})")
+        errors = 0
+        done = 0
+        pending = []
+        if jobs:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for path, size, mtime_ns, features, error in executor.map(_safe_extract, jobs, chunksize=4):
+                    done += 1
+                    if features is None:
+                        # -------------> Błędny plik zapisujemy bez cech, żeby nie analizować go przy każdym skanie
+                        print(f"Błąd indeksowania {path}: {error}")
+                        errors += 1
+                        features = {}
+                    pending.append([path, size, mtime_ns] + [features.get(key) for key in _FEATURE_COLUMNS]
+                                   + [time.time()])
+                    # -------------> Zapis partiami - jedna transakcja na 100 plików
+                    if len(pending) >= 100:
+                        self.connection.executemany(insert_sql, pending)
+                        self.connection.commit()
+                        pending = []
+                    if progress:
+                        progress(done, len(jobs))
+
+        if pending:
+            self.connection.executemany(insert_sql, pending)
+        self.connection.commit()
+        return {'indexed': len(jobs) - errors, 'unchanged': len(seen) - len(jobs),
+                'removed': len(removed), 'errors': errors}
+
+    def search(self, min_duration=None, max_duration=None, sample_rate=None, min_lufs=None, max_lufs=None,
+               min_freq=None, max_freq=None, note=None, limit=100):
+        """Zwraca listę słowników z wpisami spełniającymi wszystkie podane kryteria."""
+        conditions = []
+        params = []
+        for column, operator, value in [('duration', '>=', min_duration), ('duration', '<=', max_duration),
+                                        ('sample_rate', '=', sample_rate),
+                                        ('lufs_integrated', '>=', min_lufs), ('lufs_integrated', '<=', max_lufs),
+                                        ('dominant_freq', '>=', min_freq), ('dominant_freq', '<=', max_freq),
+                                        ('note', '=', note)]:
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+
+        sql = "SELECT * FROM files"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY path LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
@@ -0,0 +1,25 @@
+from .cache import AnalysisCache, file_fingerprint
+from .index import FeatureIndex, extract_features
+from .export import AppendableArray, AnalysisExportWriter, export_analysis, load_analysis
+from .memory import MemoryBudget, AllocationTracer, array_bytes, budget_from_environment
+from .stream import SpectrumServer, StreamClient, pool_spectrum, decode_frame, port_from_environment
+
+__all__ = [
+    'AnalysisCache',
+    'file_fingerprint',
+    'FeatureIndex',
+    'extract_features',
+    'AppendableArray',
+    'AnalysisExportWriter',
+    'export_analysis',
+    'load_analysis',
+    'MemoryBudget',
+    'AllocationTracer',
+    'array_bytes',
+    'budget_from_environment',
+    'SpectrumServer',
+    'StreamClient',
+    'pool_spectrum',
+    'decode_frame',
+    'port_from_environment'
+]
@@ -0,0 +1,145 @@
+"""
+Rozliczanie pamięci sesji: duże bufory (nagranie, próbki pliku, dane w locie do workera)
+są rejestrowane w MemoryBudget razem z funkcją degradacji, którą budżet wywołuje po
+przekroczeniu limitu - zamiast czekać, aż system zabije proces. AllocationTracer (tracemalloc)
+pokazuje, które linie gorącej pętli alokują najwięcej między kolejnymi raportami.
+"""
+from collections import OrderedDict, deque
+import os
+import tracemalloc
+
+import numpy as np
+
+# -------------> Limit pamięci w MB (0 = bez limitu) i włączenie śledzenia alokacji
+MEMORY_BUDGET_ENV = 'AUDIO_ANALYZER_MEMORY_MB'
+TRACEMALLOC_ENV = 'AUDIO_ANALYZER_TRACEMALLOC'
+DEFAULT_BUDGET_MB = 1024
+DEFAULT_SPILL_DIR = os.path.join(os.path.expanduser("~"), "AudioAnalyzer", "spill")
+
+
+def array_bytes(*objects):
+    """
+    Bajty zajmowane w RAM przez tablice numpy (także w listach, krotkach i kolejkach).
+    Tablice mapowane z pliku (np.memmap) nie są liczone - ich strony może zwolnić system.
+    """
+    total = 0
+    for obj in objects:
+        if isinstance(obj, np.memmap):
+            continue
+        if isinstance(obj, np.ndarray):
+            total += obj.nbytes
+        elif isinstance(obj, (list, tuple, deque)):
+            total += array_bytes(*obj)
+    return total
+
+
+def budget_from_environment():
+    """Limit w bajtach z AUDIO_ANALYZER_MEMORY_MB (domyślnie DEFAULT_BUDGET_MB); None oznacza brak limitu."""
+    try:
+        megabytes = float(os.environ.get(MEMORY_BUDGET_ENV, DEFAULT_BUDGET_MB))
+    except ValueError:
+        print(f"Nieprawidłowa wartość {MEMORY_BUDGET_ENV}, używam {DEFAULT_BUDGET_MB} MB")
+        megabytes = DEFAULT_BUDGET_MB
+    return int(megabytes * 2 ** 20) if megabytes > 0 else None
+
+
+class MemoryBudget:
+    """
+    Rejestr dużych buforów sesji i ich łączny limit.
+    Każde konto to funkcja zwracająca bieżący rozmiar w bajtach i opcjonalna funkcja degradacji
+    degrade(nadmiar_w_bajtach), która zwalnia pamięć (przycina historię, przenosi dane na dysk)
+    i zwraca opis wykonanej akcji albo None. Degradacje są wywoływane w kolejności rejestracji.
+    """
+
+    def __init__(self, limit_bytes=None):
+        self.limit_bytes = limit_bytes
+        self.accounts = OrderedDict()
+        self.degradations = []  # -------------> Opisy wykonanych degradacji (dla raportu i GUI)
+
+    def register(self, name, sizer, degrade=None):
+        self.accounts[name] = (sizer, degrade)
+
+    def usage(self):
+        """Słownik {konto: bajty}."""
+        usage = {}
+        for name, (sizer, _) in self.accounts.items():
+            try:
+                usage[name] = int(sizer())
+            except Exception as e:
+                print(f"Błąd pomiaru pamięci '{name}': {e}")
+                usage[name] = 0
+        return usage
+
+    def total(self):
+        return sum(self.usage().values())
+
+    def enforce(self):
+        """Po przekroczeniu limitu degraduje kolejne konta, aż suma zmieści się w budżecie. Zwraca opisy akcji."""
+        if not self.limit_bytes:
+            return []
+        actions = []
+        for name, (sizer, degrade) in self.accounts.items():
+            excess = self.total() - self.limit_bytes
+            if excess <= 0:
+                break
+            if degrade is None:
+                continue
+            try:
+                action = degrade(excess)
+            except Exception as e:
+                print(f"Błąd degradacji '{name}': {e}")
+                continue
+            if action:
+                print(f"Przekroczono budżet pamięci ({self.limit_bytes / 2 ** 20:.1f} MB): {action}")
+                actions.append(action)
+        self.degradations.extend(actions)
+        return actions
+
+    def report(self):
+        usage = self.usage()
+        limit = f"{self.limit_bytes / 2 ** 20:.1f} MB" if self.limit_bytes else "bez limitu"
+        lines = [f"Pamięć buforów: {sum(usage.values()) / 2 ** 20:.1f} MB / {limit}"]
+        lines += [f"  {name}: {size / 2 ** 20:.1f} MB" for name, size in usage.items()]
+        lines += [f"  degradacja: {action}" for action in self.degradations]
+        return "\n".join(lines)
+
+
+class AllocationTracer:
+    """
+    Raport alokacji z tracemalloc: linie kodu, których zaalokowana pamięć urosła najbardziej
+    od poprzedniego raportu (lub od start()). Śledzenie spowalnia alokacje, dlatego jest opcjonalne.
+    """
+
+    def __init__(self, frames=1, top=10):
+        self.frames = frames
+        self.top = top
+        self._baseline = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self._baseline = self._snapshot()
+
+    def stop(self):
+        self._baseline = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+
+    def report(self, top=None):
+        """Zwraca linie raportu (przyrosty od poprzedniego raportu) i przesuwa punkt odniesienia."""
+        if self._baseline is None:
+            return []
+        snapshot = self._snapshot()
+        differences = snapshot.compare_to(self._baseline, 'lineno')
+        self._baseline = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"tracemalloc: {current / 2 ** 20:.1f} MB (szczyt {peak / 2 ** 20:.1f} MB)"]
+        lines += [f"  {stat}" for stat in differences[:top or self.top] if stat.size_diff]
+        return lines
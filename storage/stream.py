@@ -0,0 +1,334 @@
+"""
+Strumieniowanie wyników analizy na żywo do zewnętrznych paneli (TCP, domyślnie tylko localhost).
+
+Każda ramka to nagłówek FRAME_HEADER (20 bajtów, little-endian) i dane binarne:
+    magic b'AA', wersja, typ, numer aktualizacji, czas strumienia [s] (float64), długość danych.
+Typy ramek:
+    FRAME_HELLO     - JSON z wersją protokołu, częstotliwością próbkowania i parametrami (po połączeniu)
+    FRAME_LEVELS    - LEVELS_FORMAT: RMS, szczyt, LUFS (chwilowa, krótkoterminowa, zintegrowana),
+                      dominująca częstotliwość i numer MIDI nuty (-1 gdy brak)
+    FRAME_SPECTRUM  - SPECTRUM_FORMAT (tryb widma, liczba pasm, fmin, fmax, skala log) i poziomy int16
+                      w setnych dB, maksimum widma w każdym paśmie
+    FRAME_WATERFALL - WATERFALL_FORMAT (liczba pasm, fmin, fmax, poziom maksimum kolumny) i kolumna uint8
+                      na stałej siatce logarytmicznej: 255 = maksimum, 0 = WATERFALL_RANGE_DB poniżej
+Klient może wysłać CONTROL_FORMAT (komenda 1, maska typów 1 << typ, limit aktualizacji na sekundę).
+
+Publikacja nigdy nie czeka na klientów: każdy ma krótką kolejkę, z której przy przepełnieniu
+wypadają najstarsze aktualizacje, i własny wątek wysyłający w tempie nie większym niż jego limit.
+"""
+from collections import deque
+import json
+import math
+import os
+import select
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+STREAM_PORT_ENV = 'AUDIO_ANALYZER_STREAM_PORT'
+DEFAULT_PORT = 8765
+PROTOCOL_VERSION = 1
+
+FRAME_HEADER = struct.Struct('<2sBBIdI')
+FRAME_HELLO, FRAME_LEVELS, FRAME_SPECTRUM, FRAME_WATERFALL = 0, 1, 2, 3
+LEVELS_FORMAT = struct.Struct('<6fh')
+SPECTRUM_FORMAT = struct.Struct('<BBHff')
+WATERFALL_FORMAT = struct.Struct('<Hfff')
+CONTROL_FORMAT = struct.Struct('<BBH')
+CONTROL_SUBSCRIBE = 1
+ALL_FRAMES = (1 << FRAME_LEVELS) | (1 << FRAME_SPECTRUM) | (1 << FRAME_WATERFALL)
+WATERFALL_RANGE_DB = 120.0
+
+SPECTRUM_MODES = ['fft', 'cqt', 'zoom', 'welch']
+
+
+def port_from_environment():
+    """Port z AUDIO_ANALYZER_STREAM_PORT (domyślnie DEFAULT_PORT)."""
+    try:
+        return int(os.environ.get(STREAM_PORT_ENV, DEFAULT_PORT))
+    except ValueError:
+        print(f"Nieprawidłowa wartość {STREAM_PORT_ENV}, używam portu {DEFAULT_PORT}")
+        return DEFAULT_PORT
+
+
+def pack_frame(frame_type, sequence, timestamp, payload):
+    return FRAME_HEADER.pack(b'AA', PROTOCOL_VERSION, frame_type, sequence & 0xFFFFFFFF, timestamp,
+                             len(payload)) + payload
+
+
+def pool_spectrum(xf, yf_db, f_min, f_max, bands, log_scale=True):
+    """
+    Zmniejsza widmo do bands pasm między f_min i f_max - maksimum binów w każdym paśmie
+    (szczyty nie znikają przy decymacji). Pasma węższe od odstępu binów dostają wartość interpolowaną.
+    Zwraca (środki pasm, poziomy).
+    """
+    xf = np.asarray(xf, dtype=np.float64)
+    yf_db = np.asarray(yf_db, dtype=np.float32)
+    edges = np.geomspace(f_min, f_max, bands + 1) if log_scale else np.linspace(f_min, f_max, bands + 1)
+    centers = np.sqrt(edges[:-1] * edges[1:]) if log_scale else (edges[:-1] + edges[1:]) / 2
+    values = np.interp(centers, xf, yf_db).astype(np.float32)
+    starts = np.searchsorted(xf, edges[:-1])
+    stops = np.searchsorted(xf, edges[1:])
+    filled = stops > starts
+    if filled.any():
+        # -------------> Pasma przylegają do siebie, więc kolejne początki wyznaczają końce poprzednich pasm
+        values[filled] = np.maximum.reduceat(yf_db[:stops[filled][-1]], starts[filled])
+    return centers, values
+
+
+class _Client:
+    def __init__(self, connection, address, queue_size, max_rate):
+        self.connection = connection
+        self.address = address
+        self.queue = deque(maxlen=queue_size)
+        self.condition = threading.Condition()
+        self.mask = ALL_FRAMES
+        self.max_rate = max_rate
+        self.sent = 0
+        self.dropped = 0
+        self.connected = True
+        self.thread = None
+
+    def offer(self, update):
+        with self.condition:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(update)
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            self.connected = False
+            self.condition.notify()
+
+
+class SpectrumServer:
+    """
+    Serwer TCP publikujący wyniki AnalysisWorker (poziomy, widmo, wysokość dźwięku, kolumny wodospadu).
+    Ramki jednej aktualizacji są kodowane raz, niezależnie od liczby klientów, a publish() tylko
+    dokłada je do kolejek - wolny klient traci najstarsze aktualizacje, ale nie spowalnia analizy.
+    """
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, max_rate=20.0, queue_size=4, max_clients=8,
+                 spectrum_bands=512, waterfall_bands=128, send_timeout=5.0):
+        self.host = host
+        self.port = port
+        self.max_rate = max_rate
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self.spectrum_bands = spectrum_bands
+        self.waterfall_bands = waterfall_bands
+        self.send_timeout = send_timeout
+        self.sample_rate = None
+        self._socket = None
+        self._accept_thread = None
+        self._clients = []
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._running = False
+
+    def start(self):
+        """Otwiera port (port=0 - dowolny wolny) i zwraca numer faktycznie użytego portu."""
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(self.max_clients)
+        self._socket.settimeout(0.5)
+        self.port = self._socket.getsockname()[1]
+        self._running = True
+        self._accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._accept_thread.start()
+        print(f"Serwer widma nasłuchuje na {self.host}:{self.port}")
+        return self.port
+
+    def stop(self):
+        self._running = False
+        if self._accept_thread is not None:
+            self._accept_thread.join()
+            self._accept_thread = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            client.close()
+            client.thread.join()
+
+    def client_stats(self):
+        """Lista słowników z adresem, liczbą wysłanych i porzuconych aktualizacji każdego klienta."""
+        with self._lock:
+            return [{'address': f"{client.address[0]}:{client.address[1]}", 'sent': client.sent,
+                     'dropped': client.dropped, 'max_rate': client.max_rate} for client in self._clients]
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                connection, address = self._socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            connection.settimeout(self.send_timeout)
+            client = _Client(connection, address, self.queue_size, self.max_rate)
+            client.thread = threading.Thread(target=self._client_loop, args=(client,), daemon=True)
+            with self._lock:
+                if len(self._clients) >= self.max_clients:
+                    connection.close()
+                    continue
+                self._clients.append(client)
+            client.thread.start()
+
+    def _hello(self):
+        info = {'version': PROTOCOL_VERSION, 'sample_rate': self.sample_rate, 'max_rate': self.max_rate,
+                'spectrum_modes': SPECTRUM_MODES, 'waterfall_range_db': WATERFALL_RANGE_DB}
+        return pack_frame(FRAME_HELLO, self._sequence, 0.0, json.dumps(info).encode('utf-8'))
+
+    def _read_control(self, client):
+        """Odczytuje komendy klienta bez czekania. Zwraca False, gdy klient się rozłączył."""
+        connection = client.connection
+        while select.select([connection], [], [], 0)[0]:
+            data = connection.recv(CONTROL_FORMAT.size)
+            if not data:
+                return False
+            if len(data) == CONTROL_FORMAT.size:
+                command, mask, rate = CONTROL_FORMAT.unpack(data)
+                if command == CONTROL_SUBSCRIBE:
+                    client.mask = mask or ALL_FRAMES
+                    client.max_rate = min(float(rate), self.max_rate) if rate else self.max_rate
+        return True
+
+    def _client_loop(self, client):
+        print(f"Klient strumienia połączony: {client.address[0]}:{client.address[1]}")
+        next_send = 0.0
+        try:
+            client.connection.sendall(self._hello())
+            while self._running and client.connected:
+                if not self._read_control(client):
+                    break
+                with client.condition:
+                    # -------------> Limit tempa: czekamy do następnego slotu, w tym czasie kolejka może gubić stare
+                    delay = next_send - time.perf_counter()
+                    if delay > 0 or not client.queue:
+                        client.condition.wait(delay if delay > 0 else 0.1)
+                        continue
+                    update = client.queue.popleft()
+                frames = b''.join(frame for frame_type, frame in update if client.mask & (1 << frame_type))
+                if frames:
+                    client.connection.sendall(frames)
+                    client.sent += 1
+                next_send = time.perf_counter() + 1.0 / client.max_rate if client.max_rate > 0 else 0.0
+        except OSError as e:
+            print(f"Klient strumienia {client.address[0]}:{client.address[1]} rozłączony: {e}")
+        finally:
+            client.connection.close()
+            with self._lock:
+                if client in self._clients:
+                    self._clients.remove(client)
+
+    def encode(self, results, fs):
+        """Koduje wyniki analizy do listy (typ, ramka) - wspólnej dla wszystkich klientów."""
+        self._sequence += 1
+        timestamp = results.get('stream_position', 0) / fs
+        loudness = results.get('loudness') or {}
+
+        def value(x):
+            return float('nan') if x is None else float(x)
+
+        dominant = float(results.get('dominant_freq') or 0.0)
+        midi = int(round(69 + 12 * math.log2(dominant / 440.0))) if dominant > 0 else -1
+        levels = LEVELS_FORMAT.pack(value(results.get('rms')), value(results.get('peak')),
+                                    value(loudness.get('lufs_momentary')), value(loudness.get('lufs_short_term')),
+                                    value(loudness.get('lufs_integrated')), dominant, midi)
+        frames = [(FRAME_LEVELS, pack_frame(FRAME_LEVELS, self._sequence, timestamp, levels))]
+
+        xf, yf_db = results.get('xf'), results.get('yf_db')
+        if xf is not None and len(xf) > 1:
+            mode = results.get('spectrum_mode', 'fft')
+            # -------------> Zoom to wąskie pasmo - skala liniowa; pozostałe tryby od najniższego niezerowego binu
+            log_scale = mode != 'zoom'
+            f_min = float(xf[1] if log_scale and xf[0] <= 0 else xf[0])
+            f_max = float(xf[-1])
+            bands = min(self.spectrum_bands, len(xf))
+            _, pooled = pool_spectrum(xf, yf_db, f_min, f_max, bands, log_scale)
+            header = SPECTRUM_FORMAT.pack(SPECTRUM_MODES.index(mode) if mode in SPECTRUM_MODES else 0,
+                                          int(log_scale), bands, f_min, f_max)
+            levels_cdb = np.clip(np.round(pooled * 100), -32768, 32767).astype('<i2')
+            frames.append((FRAME_SPECTRUM, pack_frame(FRAME_SPECTRUM, self._sequence, timestamp,
+                                                      header + levels_cdb.tobytes())))
+
+            if mode != 'zoom':
+                w_min, w_max = 20.0, fs / 2
+                _, column = pool_spectrum(xf, yf_db, w_min, w_max, self.waterfall_bands)
+                # -------------> Skala względem maksimum kolumny - poziomy widma nie są w dBFS (zależą od trybu i N)
+                top = float(column.max())
+                scaled = np.clip(255 + (column - top) * (255.0 / WATERFALL_RANGE_DB), 0, 255)
+                header = WATERFALL_FORMAT.pack(self.waterfall_bands, w_min, w_max, top)
+                frames.append((FRAME_WATERFALL, pack_frame(FRAME_WATERFALL, self._sequence, timestamp,
+                                                           header + scaled.astype(np.uint8).tobytes())))
+        return frames
+
+    def publish(self, results, fs):
+        """Wywoływane po każdej analizie (w wątku workera). Bez klientów nic nie jest kodowane."""
+        self.sample_rate = fs
+        with self._lock:
+            clients = list(self._clients)
+        if not clients or not results:
+            return
+        update = self.encode(results, fs)
+        for client in clients:
+            client.offer(update)
+
+
+def _receive_exactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Serwer zamknął połączenie")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def decode_frame(frame_type, payload):
+    """Dekoduje dane ramki do słownika (odwrotność SpectrumServer.encode)."""
+    if frame_type == FRAME_HELLO:
+        return json.loads(payload.decode('utf-8'))
+    if frame_type == FRAME_LEVELS:
+        names = ['rms', 'peak', 'lufs_momentary', 'lufs_short_term', 'lufs_integrated', 'dominant_freq', 'midi']
+        return dict(zip(names, LEVELS_FORMAT.unpack(payload)))
+    if frame_type == FRAME_SPECTRUM:
+        mode, log_scale, bands, f_min, f_max = SPECTRUM_FORMAT.unpack_from(payload)
+        levels = np.frombuffer(payload, '<i2', bands, SPECTRUM_FORMAT.size).astype(np.float32) / 100
+        return {'spectrum_mode': SPECTRUM_MODES[mode], 'log_scale': bool(log_scale), 'f_min': f_min,
+                'f_max': f_max, 'levels_db': levels}
+    if frame_type == FRAME_WATERFALL:
+        bands, f_min, f_max, top = WATERFALL_FORMAT.unpack_from(payload)
+        column = np.frombuffer(payload, np.uint8, bands, WATERFALL_FORMAT.size)
+        return {'f_min': f_min, 'f_max': f_max,
+                'levels_db': top - (255 - column.astype(np.float32)) * (WATERFALL_RANGE_DB / 255.0)}
+    return {'payload': payload}
+
+
+class StreamClient:
+    """Prosty klient protokołu (panel testowy, narzędzia wiersza poleceń)."""
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, timeout=10.0):
+        self.connection = socket.create_connection((host, port), timeout=timeout)
+
+    def subscribe(self, mask=ALL_FRAMES, max_rate=0):
+        self.connection.sendall(CONTROL_FORMAT.pack(CONTROL_SUBSCRIBE, mask, int(max_rate)))
+
+    def read_frame(self):
+        """Zwraca (typ, numer aktualizacji, czas strumienia, zdekodowane dane)."""
+        magic, version, frame_type, sequence, timestamp, length = \
+            FRAME_HEADER.unpack(_receive_exactly(self.connection, FRAME_HEADER.size))
+        if magic != b'AA' or version != PROTOCOL_VERSION:
+            raise ValueError(f"Nieznany format ramki: {magic!r}, wersja {version}")
+        return frame_type, sequence, timestamp, decode_frame(frame_type, _receive_exactly(self.connection, length))
+
+    def close(self):
+        self.connection.close()
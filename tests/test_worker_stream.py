@@ -0,0 +1,69 @@
+"""
+Stan strumieniowy AnalysisWorker w nagrywaniu ciągłym: mierniki (RunningStats, LoudnessMeter, OnsetDetector)
+muszą zobaczyć cały strumień także wtedy, gdy widoki chwilowo nie zamawiają wyników.
+Uruchomienie: python -m pytest -q tests
+"""
+import numpy as np
+
+from threads.worker import AnalysisWorker, TIME_VIEW_OUTPUTS, SPECTRUM_VIEW_OUTPUTS
+
+FS = 44100
+HISTORY_SECONDS = 2.0
+TICK_SECONDS = 0.1
+
+
+def _bursts(seconds=20.0, silent=None):
+    """Krótkie paczki szumu co 0.5 s (wyraźne onsety); silent=(start, koniec) [s] - fragment ciszy cyfrowej."""
+    rng = np.random.default_rng(0)
+    signal = 0.01 * rng.standard_normal(int(seconds * FS)).astype(np.float32)
+    for start in np.arange(0.3, seconds, 0.5):
+        begin = int(start * FS)
+        signal[begin:begin + 2000] += 0.5 * rng.standard_normal(len(signal[begin:begin + 2000]))
+    if silent is not None:
+        signal[int(silent[0] * FS):int(silent[1] * FS)] = 0.0
+    return signal
+
+
+def _run(signal, on_tick=None):
+    """Symuluje ticki GUI: co TICK_SECONDS bufor ostatnich HISTORY_SECONDS i pozycja jego końca."""
+    worker = AnalysisWorker()
+    worker.set_subscription('przebieg', TIME_VIEW_OUTPUTS)
+    worker.set_subscription('widmo', SPECTRUM_VIEW_OUTPUTS)
+    history, tick = int(HISTORY_SECONDS * FS), int(TICK_SECONDS * FS)
+    results = {}
+    for position in range(tick, len(signal) + 1, tick):
+        if on_tick is not None and not on_tick(worker, position / FS):
+            continue
+        results = worker.analyze(signal[max(0, position - history):position], FS, position)
+    return worker, results
+
+
+def test_hidden_views_keep_stream_state():
+    signal = _bursts()
+    visible_worker, visible = _run(signal)
+
+    def hide_between_5_and_12(worker, now):
+        hidden = 5.0 <= now < 12.0
+        worker.set_subscription('przebieg', None if hidden else TIME_VIEW_OUTPUTS)
+        worker.set_subscription('widmo', None if hidden else SPECTRUM_VIEW_OUTPUTS)
+        return True
+
+    hidden_worker, hidden = _run(signal, hide_between_5_and_12)
+    assert hidden['stats']['samples'] == visible['stats']['samples'] == len(signal)
+    assert np.isclose(hidden['stats']['rms'], visible['stats']['rms'])
+    assert np.isclose(hidden['loudness']['lufs_integrated'], visible['loudness']['lufs_integrated'])
+    assert hidden_worker._onset_detector.onsets == visible_worker._onset_detector.onsets
+    assert hidden['onsets'] == visible['onsets'] and len(visible['onsets']) > 0
+
+
+def test_gated_silence_longer_than_history():
+    # -------------> Bramka ciszy: GUI nie zleca analizy przez 6 s ciszy (dłużej niż 2 s historii)
+    signal = _bursts(silent=(8.0, 14.0))
+    visible_worker, visible = _run(signal)
+    gated_worker, gated = _run(signal, lambda worker, now: not 8.5 <= now < 14.0)
+
+    assert gated['stats']['samples'] == visible['stats']['samples'] == len(signal)
+    assert np.isclose(gated['stats']['rms'], visible['stats']['rms'])
+    assert np.isclose(gated['loudness']['lufs_integrated'], visible['loudness']['lufs_integrated'], atol=0.01)
+    assert np.allclose(gated_worker._onset_detector.onsets, visible_worker._onset_detector.onsets)
+    assert gated['onsets'] == visible['onsets'] and len(visible['onsets']) > 0
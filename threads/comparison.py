@@ -0,0 +1,22 @@
+from PySide6.QtCore import QObject, Signal, Slot
+import traceback
+
+from audio.measurement import compare_files
+
+
+class ComparisonWorker(QObject):
+    """
+    Wyrównuje i porównuje dwa pliki (compare_files) w osobnym wątku - dekodowanie obu plików
+    i korelacja wzajemna długich nagrań trwają zbyt długo dla wątku GUI.
+    """
+    finished = Signal(object)  # -------------> Słownik compare_signals z nazwami plików
+    failed = Signal(str)
+
+    @Slot(object)
+    def run(self, request):
+        """request: (plik referencyjny, plik porównywany, zakres szukania przesunięcia w sekundach)."""
+        try:
+            self.finished.emit(compare_files(*request))
+        except Exception as e:
+            traceback.print_exc()
+            self.failed.emit(str(e))
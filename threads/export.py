@@ -0,0 +1,22 @@
+from PySide6.QtCore import QObject, Signal, Slot
+import traceback
+
+
+class ExportWorker(QObject):
+    """
+    Wykonuje zadania eksportu wykresów w osobnym wątku, aby zapis w wysokiej rozdzielczości
+    nie blokował GUI. Zadanie to funkcja przyjmująca callback postępu progress(done, total)
+    i zwracająca komunikat dla użytkownika.
+    """
+    progress = Signal(int, int)
+    finished = Signal(str)
+    failed = Signal(str)
+
+    @Slot(object)
+    def run_job(self, job):
+        try:
+            message = job(self.progress.emit)
+            self.finished.emit(message)
+        except Exception as e:
+            traceback.print_exc()
+            self.failed.emit(str(e))
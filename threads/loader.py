@@ -0,0 +1,122 @@
+from PySide6.QtCore import QObject, Signal, Slot
+from scipy.io.wavfile import read as wav_read
+import numpy as np
+import time
+import traceback
+
+from audio.loader import normalize_audio
+
+OVERVIEW_POINTS = 4096
+# -------------> Próbek czytanych na przedział w szybkim podglądzie (zanim plik zostanie zdekodowany)
+OVERVIEW_PROBE = 256
+
+
+def _to_mono(block):
+    block = normalize_audio(block)
+    return (block.mean(axis=1) if block.ndim > 1 else block).astype(np.float32)
+
+
+class FileLoadWorker(QObject):
+    """
+    Wczytuje plik WAV w tle. Najpierw (z mapowania pamięci, w milisekundach) wysyła zgrubny podgląd
+    obwiedni, potem dekoduje plik blokami, uściślając obwiednię w miarę postępu, a na końcu
+    oddaje pełne próbki mono. request() i cancel() można wywołać z dowolnego wątku.
+    Każde zlecenie ma numer (generation) odsyłany we wszystkich sygnałach - odbiorca odróżnia nim
+    sygnały anulowanego wczytywania od nowego zlecenia tego samego pliku. Zlecenie nowsze niż
+    zarejestrowane przez request() przerywa wczytywanie starszych, także tych jeszcze czekających w kolejce.
+    """
+    overview_ready = Signal(int, str, object, object, float)  # -------------> zlecenie, plik, env_min, env_max, część
+    loaded = Signal(int, str, np.ndarray, int)
+    failed = Signal(int, str, str)
+    cancelled = Signal(int, str)
+    spilled = Signal(object, str, str)  # -------------> próbki, plik .npy, błąd ('' - zapis udany)
+
+    def __init__(self, block_frames=1 << 20, update_interval=0.2, parent=None):
+        super().__init__(parent)
+        self.block_frames = block_frames
+        self.update_interval = update_interval
+        # -------------> Zwykłe przypisania int (atomowe) - wątek GUI ustawia je przed wysłaniem zlecenia
+        self._latest_generation = 0
+        self._cancelled_generation = 0
+
+    def request(self, generation):
+        """Rejestruje najnowsze zlecenie - wywoływane przed wysłaniem load, starsze zlecenia są porzucane."""
+        self._latest_generation = generation
+
+    def cancel(self):
+        """Przerywa bieżące (najnowsze) zlecenie."""
+        self._cancelled_generation = self._latest_generation
+
+    def _is_stale(self, generation):
+        return generation != self._latest_generation or generation == self._cancelled_generation
+
+    @Slot(int, str)
+    def load(self, generation, filepath):
+        if self._is_stale(generation):
+            # -------------> Zastąpione nowszym zleceniem, zanim wątek do niego doszedł - nie czytamy pliku
+            self.cancelled.emit(generation, filepath)
+            return
+        try:
+            samples, sample_rate = self._load(generation, filepath)
+        except Exception as e:
+            traceback.print_exc()
+            self.failed.emit(generation, filepath, str(e))
+            return
+        if samples is None:
+            print(f"Anulowano wczytywanie pliku {filepath}")
+            self.cancelled.emit(generation, filepath)
+        else:
+            self.loaded.emit(generation, filepath, samples, sample_rate)
+
+    @Slot(object, str)
+    def spill(self, samples, path):
+        """Zapisuje próbki do pliku .npy (przeniesienie na dysk przy przekroczeniu budżetu pamięci), poza GUI."""
+        try:
+            np.save(path, samples)
+        except Exception as e:
+            traceback.print_exc()
+            self.spilled.emit(samples, path, str(e))
+            return
+        self.spilled.emit(samples, path, "")
+
+    def _load(self, generation, filepath):
+        try:
+            sample_rate, data = wav_read(filepath, mmap=True)
+        except ValueError:
+            # -------------> Pliki 24-bit nie wspierają mmap - dekodujemy całość od razu (nadal poza GUI)
+            sample_rate, data = wav_read(filepath)
+        total = len(data)
+        points = max(1, min(OVERVIEW_POINTS, total))
+        edges = np.linspace(0, total, points + 1).astype(np.int64)
+
+        # -------------> Zgrubny podgląd: krótki fragment z początku każdego przedziału, bez czytania całości
+        probe = np.minimum(edges[:-1, np.newaxis] + np.arange(OVERVIEW_PROBE), max(total - 1, 0))
+        preview = _to_mono(data[probe.ravel()]).reshape(points, -1) if total else np.zeros((points, 1))
+        env_min, env_max = preview.min(axis=1), preview.max(axis=1)
+        self.overview_ready.emit(generation, filepath, env_min.copy(), env_max.copy(), 0.0)
+
+        samples = np.empty(total, dtype=np.float32)
+        exact_buckets = 0
+        last_update = time.perf_counter()
+        for start in range(0, total, self.block_frames):
+            if self._is_stale(generation):
+                return None, sample_rate
+            end = min(start + self.block_frames, total)
+            samples[start:end] = _to_mono(np.asarray(data[start:end]))
+
+            # -------------> Przedziały w całości zdekodowane dostają dokładne min/max
+            done_buckets = np.searchsorted(edges, end, side='right') - 1
+            if done_buckets > exact_buckets:
+                offsets = edges[exact_buckets:done_buckets + 1]
+                decoded = samples[offsets[0]:offsets[-1]]
+                relative = offsets[:-1] - offsets[0]
+                env_min[exact_buckets:done_buckets] = np.minimum.reduceat(decoded, relative)
+                env_max[exact_buckets:done_buckets] = np.maximum.reduceat(decoded, relative)
+                exact_buckets = done_buckets
+
+            now = time.perf_counter()
+            if now - last_update >= self.update_interval and end < total:
+                last_update = now
+                self.overview_ready.emit(generation, filepath, env_min.copy(), env_max.copy(), end / total)
+        return samples, sample_rate
+
@@ -0,0 +1,38 @@
+from PySide6.QtCore import QObject, Signal, Slot
+import traceback
+
+from audio.measurement import ThdMeasurement
+
+
+class MeasurementWorker(QObject):
+    """
+    Wykonuje pomiar THD+N (pojedynczy punkt lub sweep) w osobnym wątku - pomiar trwa tyle,
+    ile nagranie bodźca, więc nie może blokować GUI. cancel() można wywołać z dowolnego wątku.
+    """
+    progress = Signal(int, int)
+    finished = Signal(object)  # -------------> Lista wyników harmonic_analysis (po jednym na częstotliwość)
+    failed = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._measurement = None
+
+    def cancel(self):
+        measurement = self._measurement
+        if measurement is not None:
+            measurement.cancel()
+
+    @Slot(object)
+    def run(self, request):
+        """request: słownik z 'frequencies' i argumentami ThdMeasurement (backend, input_device, ...)."""
+        request = dict(request)
+        frequencies = request.pop('frequencies')
+        try:
+            self._measurement = ThdMeasurement(**request)
+            results = self._measurement.sweep(frequencies, self.progress.emit)
+            self.finished.emit(results)
+        except Exception as e:
+            traceback.print_exc()
+            self.failed.emit(str(e))
+        finally:
+            self._measurement = None
@@ -0,0 +1,98 @@
+from PySide6.QtCore import QObject, Signal
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import traceback
+
+from audio.loader import load_wav
+from storage.cache import analysis_cache_entry
+from threads.worker import AnalysisWorker
+
+# -------------> Kolejne stany pliku w kolejce
+STATUS_QUEUED = 'queued'
+STATUS_LOADING = 'loading'
+STATUS_ANALYZING = 'analyzing'
+STATUS_DONE = 'done'
+STATUS_CACHED = 'cached'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+STATUS_LABELS = {STATUS_QUEUED: "w kolejce", STATUS_LOADING: "wczytywanie", STATUS_ANALYZING: "analiza",
+                 STATUS_DONE: "gotowy", STATUS_CACHED: "gotowy (cache)", STATUS_FAILED: "błąd",
+                 STATUS_CANCELLED: "anulowano"}
+
+
+class FileQueue(QObject):
+    """
+    Kolejka plików WAV wczytywanych i analizowanych równolegle w ograniczonej puli wątków
+    (dekodowanie i FFT zwalniają GIL). Wyniki trafiają do AnalysisCache (albo do pamięci,
+    gdy cache jest niedostępny), więc przełączenie na przeanalizowany plik nie wymaga
+    ponownego wczytywania. Stan każdego pliku jest raportowany sygnałem status_changed.
+    """
+    status_changed = Signal(str, str, str)  # -------------> plik, status (STATUS_*), szczegóły
+
+    def __init__(self, cache=None, max_workers=None, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="file-queue")
+        self.statuses = {}
+        self._entries = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, filepath, params, settings):
+        """
+        Dodaje plik do kolejki. params to klucz wpisu w cache, settings - ustawienia AnalysisWorker.
+        Plik już czekający lub analizowany nie jest dodawany ponownie.
+        """
+        with self._lock:
+            future = self._futures.get(filepath)
+            if future is not None and not future.done():
+                return
+            self._futures[filepath] = self.executor.submit(self._process, filepath, params, dict(settings))
+        self._set_status(filepath, STATUS_QUEUED)
+
+    def get(self, filepath, params):
+        """Zwraca (tablice, info) przeanalizowanego pliku albo None."""
+        if self.cache:
+            return self.cache.get(filepath, params)
+        return self._entries.get((filepath, repr(sorted(params.items()))))
+
+    def cancel_pending(self):
+        """Anuluje pliki, których analiza jeszcze się nie zaczęła."""
+        with self._lock:
+            cancelled = [filepath for filepath, future in self._futures.items() if future.cancel()]
+        for filepath in cancelled:
+            self._set_status(filepath, STATUS_CANCELLED)
+
+    def shutdown(self):
+        self.cancel_pending()
+        self.executor.shutdown(wait=True)
+
+    def _set_status(self, filepath, status, detail=""):
+        self.statuses[filepath] = status
+        self.status_changed.emit(filepath, status, detail)
+
+    def _process(self, filepath, params, settings):
+        try:
+            if self.get(filepath, params):
+                self._set_status(filepath, STATUS_CACHED)
+                return
+            self._set_status(filepath, STATUS_LOADING)
+            samples, fs, metadata = load_wav(filepath)
+            self._set_status(filepath, STATUS_ANALYZING)
+            # -------------> Osobny worker na zadanie - stan strumieniowy nie jest współdzielony między plikami
+            worker = AnalysisWorker()
+            worker.update_settings(settings)
+            results = worker.analyze(samples, fs)
+            if not results:
+                raise ValueError("Plik nie zawiera próbek do analizy")
+            arrays, info = analysis_cache_entry(results, metadata)
+            if self.cache:
+                self.cache.put(filepath, params, arrays, info)
+            else:
+                self._entries[(filepath, repr(sorted(params.items())))] = (arrays, info)
+            self._set_status(filepath, STATUS_DONE, f"{results['dominant_freq']:.1f} Hz")
+        except Exception as e:
+            traceback.print_exc()
+            self._set_status(filepath, STATUS_FAILED, str(e))
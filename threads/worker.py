@@ -3,56 +3,271 @@ import numpy as np
 
 # -------------> Import funkcji do konwersji
 from plots.plot_utils import frequency_to_note
+from dsp.cqt import cqt_spectrum, DEFAULT_BINS_PER_OCTAVE, DEFAULT_FMIN
+from dsp.loudness import LoudnessMeter
+from dsp.stats import RunningStats
+from dsp.onsets import OnsetDetector
+from dsp.zoom import zoom_spectrum, interpolate_peak
+from dsp.welch import welch_psd, DEFAULT_SEGMENT_LENGTH, DEFAULT_OVERLAP
+from dsp.fft import magnitude_spectrum
+from dsp.gate import silent_regions, active_samples
+from dsp.pipeline import AnalysisPipeline, Stage
+from storage.memory import array_bytes
+
+# -------------> Wyniki potrzebne widokom: przebiegowi czasowemu i widmu (oraz wszystko, co worker umie policzyć)
+TIME_VIEW_OUTPUTS = ('rms', 'peak', 'loudness', 'stats', 'onsets', 'silent_regions')
+SPECTRUM_VIEW_OUTPUTS = ('xf', 'yf_db', 'spectrum_mode', 'freq_range', 'dominant_freq', 'note')
+ALL_OUTPUTS = TIME_VIEW_OUTPUTS + SPECTRUM_VIEW_OUTPUTS
+# -------------> Wyniki etapów ze stanem strumieniowym - liczone zawsze, także bez odbiorców, bo mierniki
+# -------------> muszą zobaczyć każdą próbkę (inaczej po przywróceniu okna statystyki i onsety są przesunięte)
+STREAM_OUTPUTS = ('rms', 'peak', 'loudness', 'stats', 'onsets')
 
 
 class AnalysisWorker(QObject):
     """
     Wykonuje ciężkie obliczenia analityczne w osobnym wątku,
     aby nie blokować głównego wątku GUI.
+    Analiza to potok etapów (dsp.pipeline) - uruchamiane są tylko etapy potrzebne odbiorcom
+    zapisanym przez set_subscription (widoczne wykresy, eksport, serwer strumieniowania).
     """
     # -------------> Sygnał emitowany po zakończeniu analizy
     results_ready = Signal(dict)
 
-    @Slot(np.ndarray, int)
-    def run_analysis(self, samples, fs):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # -------------> Ustawienia analizy zmieniane z GUI przez update_settings
+        self.settings = {
+            'spectrum_mode': 'fft',  # -------------> 'fft' (liniowe), 'cqt' (półtonowe), 'zoom' (pasmo) lub 'welch' (PSD)
+            'cqt_bins_per_octave': DEFAULT_BINS_PER_OCTAVE,
+            'cqt_fmin': DEFAULT_FMIN,
+            'zoom_center': 440.0,
+            'zoom_span': 100.0,
+            'welch_segment_length': DEFAULT_SEGMENT_LENGTH,
+            'welch_overlap': DEFAULT_OVERLAP,
+            'silence_threshold_db': None,  # -------------> Próg ciszy [dBFS]; None - bez wykrywania ciszy
+        }
+        # -------------> Stan strumieniowy: mierniki dostają tylko próbki, których jeszcze nie widziały
+        self._stream_offset = 0
+        self._stream_format = None  # -------------> (fs, kanały) - zmiana formatu zeruje mierniki
+        self._loudness_meter = None
+        self._running_stats = None
+        self._onset_detector = None
+        # -------------> Opcjonalny strumieniowy zapis wyników (storage.export.AnalysisExportWriter)
+        self._export_writer = None
+        # -------------> Opcjonalna publikacja wyników do zewnętrznych paneli (storage.stream.SpectrumServer)
+        self._stream_server = None
+        # -------------> Odbiorca -> potrzebne wyniki; None = nikt się nie zapisał, liczymy wszystko
+        self._subscriptions = None
+
+        self.pipeline = AnalysisPipeline([
+            Stage('nowe próbki', ('samples', 'fs', 'stream_position'), ('new_samples', 'stream_gap'),
+                  self._new_samples),
+            Stage('poziomy', ('new_samples', 'stream_gap', 'fs'), ('rms', 'peak', 'loudness', 'stats'), self._levels),
+            Stage('onsety', ('new_samples', 'stream_gap', 'samples', 'fs', 'stream_position'), ('onsets',),
+                  self._onsets),
+            Stage('mono', ('samples',), ('mono',), self._mono),
+            Stage('cisza', ('mono', 'fs'), ('silent_regions', 'active'), self._silence),
+            Stage('widmo', ('active', 'fs'), ('xf', 'yf', 'first_bin', 'spectrum_mode', 'freq_range'),
+                  self._spectrum),
+            Stage('dB', ('yf',), ('yf_db',), self._spectrum_db),
+            Stage('wysokość', ('xf', 'yf', 'first_bin', 'spectrum_mode'), ('dominant_freq', 'note'), self._pitch),
+            Stage('eksport', ('new_samples', 'stream_gap', 'stream_position', 'stats', 'loudness', 'xf', 'yf_db',
+                              'spectrum_mode'), ('exported',), self._export),
+        ])
+
+    @Slot(object)
+    def set_export_writer(self, writer):
+        """Podłącza (lub odłącza, writer=None) zapis wyników. Poprzedni writer jest zamykany."""
+        if self._export_writer is not None:
+            self._export_writer.close()
+        self._export_writer = writer
+        self.set_subscription('eksport', ('exported',) if writer is not None else None)
+
+    @Slot(object)
+    def set_stream_server(self, server):
+        """Podłącza (lub odłącza, server=None) serwer strumieniowania wyników. Serwer zamyka jego właściciel."""
+        self._stream_server = server
+        self.set_subscription('strumień', ('rms', 'peak', 'loudness') + SPECTRUM_VIEW_OUTPUTS
+                              if server is not None else None)
+
+    def buffered_bytes(self):
+        """Bajty buforów stanu strumieniowego (ramki czekające na STFT onsetów i wiersze czekające na zapis)."""
+        detector, writer = self._onset_detector, self._export_writer
+        buffers = [detector._buffer] if detector is not None else []
+        if writer is not None:
+            buffers += [writer._buffer, writer.stft._pending, writer.pitch._pending, writer.stats._pending]
+        return array_bytes(buffers)
+
+    @Slot(dict)
+    def update_settings(self, settings):
+        """Aktualizuje ustawienia analizy. Wywoływane w wątku workera."""
+        self.settings.update(settings)
+
+    @Slot(str, object)
+    def set_subscription(self, name, outputs):
+        """
+        Odbiorca name (widok, eksport, serwer) potrzebuje wyników outputs; None lub pusta lista - rezygnuje.
+        Dopóki nikt się nie zapisał, liczone są wszystkie wyniki (np. worker w puli kolejki plików).
+        """
+        if self._subscriptions is None:
+            if not outputs:
+                return
+            self._subscriptions = {}
+        if outputs:
+            self._subscriptions[name] = tuple(outputs)
+        else:
+            self._subscriptions.pop(name, None)
+
+    def requested_outputs(self):
+        if self._subscriptions is None:
+            return ALL_OUTPUTS
+        return tuple(sorted({output for outputs in self._subscriptions.values() for output in outputs}))
+
+    def stage_costs(self):
+        """Uśredniony koszt etapów potoku: {etap: {'last_ms', 'mean_ms', 'runs'}}."""
+        return {name: dict(cost) for name, cost in self.pipeline.costs.items()}
+
+    @Slot()
+    def reset_stream(self):
+        """Zeruje stan strumieniowy przy zmianie źródła (nowe nagranie, nowy plik)."""
+        self._stream_offset = 0
+        self._stream_format = None
+        self._loudness_meter = None
+        self._running_stats = None
+        self._onset_detector = None
+
+    def _new_samples(self, samples, fs, stream_position):
         """
-        Główna metoda robocza. Przyjmuje surowe próbki i wykonuje analizę.
+        Wybiera próbki dopisane od poprzedniego wywołania - mierniki dostają tylko je.
+        stream_position to bezwzględna pozycja końca bufora w strumieniu - w trybie ciągłym
+        bufor ma stałą długość, a przesuwa się tylko jego koniec.
+        stream_gap to liczba próbek, które wypadły z bufora, zanim trafiły do analizy (np. analiza
+        wstrzymana w ciszy dłużej niż historia) - mierniki traktują je jak ciszę, więc ich zegar
+        i statystyki całego nagrania zgadzają się z pozycją w strumieniu.
         """
-        if samples.size == 0:
-            self.results_ready.emit({})
-            return
+        stream_format = (fs, samples.shape[1] if samples.ndim > 1 else 1)
+        if stream_format != self._stream_format or stream_position < self._stream_offset:
+            self.reset_stream()
+            self._stream_format = stream_format
+        new_count = min(stream_position - self._stream_offset, len(samples))
+        gap = stream_position - self._stream_offset - new_count
+        self._stream_offset = stream_position
+        return {'new_samples': samples[len(samples) - new_count:], 'stream_gap': gap}
+
+    def _levels(self, new_samples, stream_gap, fs):
+        if self._loudness_meter is None:
+            self._loudness_meter = LoudnessMeter(fs, self._stream_format[1])
+            self._running_stats = RunningStats(fs)
+        if stream_gap:
+            self._loudness_meter.skip(stream_gap)
+            self._running_stats.skip(stream_gap)
+        self._loudness_meter.process(new_samples)
+        self._running_stats.update(new_samples)
+        stats = self._running_stats.get_results()
+        return {'loudness': self._loudness_meter.get_results(), 'stats': stats, 'rms': stats['rms'],
+                'peak': stats['peak']}
+
+    def _onsets(self, new_samples, stream_gap, samples, fs, stream_position):
+        if self._onset_detector is None:
+            self._onset_detector = OnsetDetector(fs)
+        if stream_gap:
+            self._onset_detector.skip(stream_gap)
+        self._onset_detector.process(new_samples)
+        # -------------> Onsety widoczne w buforze, w sekundach od początku strumienia
+        return {'onsets': self._onset_detector.onsets_between((stream_position - len(samples)) / fs,
+                                                              stream_position / fs)}
+
+    @staticmethod
+    def _mono(samples):
+        return {'mono': samples.mean(axis=1) if samples.ndim > 1 else samples}
 
-        # -------------> Analiza w dziedzinie czasu
-        mono_samples = samples.mean(axis=1) if samples.ndim > 1 else samples
-        rms = np.sqrt(np.mean(mono_samples ** 2))
-        peak = np.max(np.abs(mono_samples))
+    def _silence(self, mono, fs):
+        """Fragmenty ciszy bufora (zaznaczane na wykresie) i sygnał bez nich - widmo liczone jest z reszty."""
+        threshold_db = self.settings['silence_threshold_db']
+        if threshold_db is None:
+            return {'silent_regions': None, 'active': mono}
+        regions = silent_regions(mono, fs, threshold_db)
+        active = active_samples(mono, fs, regions)
+        # -------------> Sama cisza - widmo całego bufora zamiast pustego
+        return {'silent_regions': regions, 'active': active if len(active) >= 2 else mono}
 
-        # -------------> Analiza w dziedzinie częstotliwości
-        N = len(mono_samples)
-        if N < 2:
-            self.results_ready.emit({})
-            return
+    def _spectrum(self, active, fs):
+        spectrum_mode = self.settings['spectrum_mode']
+        if spectrum_mode == 'cqt':
+            # -------------> Widmo półtonowe: biny leżą dokładnie na nutach, także w basie
+            xf, yf = cqt_spectrum(active, fs, self.settings['cqt_bins_per_octave'], self.settings['cqt_fmin'])
+            first_bin = 0
+        elif spectrum_mode == 'zoom':
+            # -------------> Wąskie pasmo w wysokiej rozdzielczości zamiast ogromnej FFT całego zakresu
+            xf, yf = zoom_spectrum(active, fs, self.settings['zoom_center'], self.settings['zoom_span'])
+            first_bin = 0
+        elif spectrum_mode == 'welch':
+            # -------------> Uśrednione widmo segmentów - gładkie i tanie pamięciowo także dla długich plików
+            xf, psd = welch_psd(active, fs, self.settings['welch_segment_length'], self.settings['welch_overlap'])
+            # -------------> Pierwiastek, aby 20*log10 dało gęstość mocy w dB/Hz
+            yf = np.sqrt(psd)
+            first_bin = 1
+        else:
+            # -------------> Okno i oś z cache, FFT dopełnione do szybkiej długości, float32 na wielu wątkach
+            xf, yf = magnitude_spectrum(active, fs)
+            first_bin = 1  # -------------> Pomijamy składową stałą
+        return {'xf': xf, 'yf': yf, 'first_bin': first_bin, 'spectrum_mode': spectrum_mode,
+                'freq_range': (xf[0], xf[-1]) if spectrum_mode == 'zoom' and len(xf) else None}
 
-        windowed_samples = mono_samples * np.hanning(N)
-        yf = np.abs(np.fft.rfft(windowed_samples))
-        xf = np.fft.rfftfreq(N, 1 / fs)
-        yf_db = 20 * np.log10(yf + 1e-12)
+    @staticmethod
+    def _spectrum_db(yf):
+        return {'yf_db': 20 * np.log10(yf + 1e-12)}
 
+    @staticmethod
+    def _pitch(xf, yf, first_bin, spectrum_mode):
         dominant_freq = 0
         note = None
-        if len(yf) > 1:
-            dominant_freq_idx = np.argmax(yf[1:]) + 1
+        if len(yf) > first_bin:
+            dominant_freq_idx = np.argmax(yf[first_bin:]) + first_bin
             dominant_freq = xf[dominant_freq_idx]
+            if spectrum_mode == 'zoom':
+                dominant_freq = interpolate_peak(xf, yf, dominant_freq_idx)
             note = frequency_to_note(dominant_freq)
+        return {'dominant_freq': dominant_freq, 'note': note}
 
-        results = {
-            'samples': samples,  # -------------> Przekazujemy oryginalne próbki
-            'rms': rms,
-            'peak': peak,
-            'yf_db': yf_db,
-            'xf': xf,
-            'dominant_freq': dominant_freq,
-            'note': note
-        }
+    def _export(self, new_samples, stream_gap, stream_position, stats, loudness, xf, yf_db, spectrum_mode):
+        if stream_gap:
+            self._export_writer.skip(stream_gap)
+        self._export_writer.process(new_samples)
+        self._export_writer.add_stats(stream_position, stats, loudness)
+        self._export_writer.set_spectrum(xf, yf_db, spectrum_mode)
+        return {'exported': True}
+
+    @Slot(np.ndarray, int, object)
+    def run_analysis(self, samples, fs, stream_position=None):
+        """
+        Główna metoda robocza. Przyjmuje surowe próbki, wykonuje analizę i emituje results_ready.
+        stream_position domyślnie równa się długości bufora (bufor zaczyna się od początku strumienia).
+        """
+        self.results_ready.emit(self.analyze(samples, fs, stream_position))
+
+    def analyze(self, samples, fs, stream_position=None):
+        """
+        Analiza bez sygnałów Qt - zwraca słownik wyników (pusty, gdy nie ma czego analizować).
+        Pozwala używać workera także poza jego wątkiem, np. w puli analizującej kolejkę plików.
+        Liczone są tylko wyniki, których potrzebują zapisani odbiorcy (set_subscription),
+        oraz zawsze etapy ze stanem strumieniowym (STREAM_OUTPUTS).
+        """
+        if len(samples) < 2:
+            return {}
+        if stream_position is None:
+            stream_position = len(samples)
+
+        outputs = tuple(dict.fromkeys(self.requested_outputs() + STREAM_OUTPUTS))
+        context = self.pipeline.run({'samples': samples, 'fs': fs, 'stream_position': stream_position}, outputs)
+        results = {key: context[key] for key in ALL_OUTPUTS if key in context}
+        results['samples'] = samples  # -------------> Przekazujemy oryginalne próbki
+        results['stream_position'] = stream_position
+        # -------------> Lista par, nie słownik - QVariantMap w sygnale posortowałby etapy alfabetycznie
+        results['stage_costs'] = [(stage.name, self.pipeline.costs[stage.name]['mean_ms'])
+                                  for stage in self.pipeline.stages if stage.name in self.pipeline.costs]
+
+        if self._stream_server is not None:
+            self._stream_server.publish(results, fs)
 
-        self.results_ready.emit(results)
\ No newline at end of file
+        return results